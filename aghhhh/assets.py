@@ -0,0 +1,191 @@
+"""Manifest of the image assets in ``images/``.
+
+Catalog entries name images loosely: ``curling_leaves.jpg`` is
+``Curling_leaves.jpg`` on disk and ``potassium_deficiency.jpg`` is
+``potassium_deficiency.jpg.jpg``. The manifest lists the folder once, indexes
+every file by its normalized name (lower case, image extensions stripped) and
+resolves references to absolute paths next to this module, so the app works
+from any working directory and a lookup never costs a failed open.
+
+Dimensions and format are read from the file headers on first request and
+kept in ``assets.json`` in the cache directory, keyed by modification time and
+size. Check that every image the catalog refers to is present and readable::
+
+    python assets.py
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import namedtuple
+
+from paths import cache_dir
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".ppm")
+
+AssetInfo = namedtuple("AssetInfo", ["path", "width", "height", "format"])
+
+
+def normalize(name):
+    """``Curling_leaves.jpg`` -> curling_leaves; ``potassium_deficiency.jpg.jpg`` -> potassium_deficiency."""
+    name = os.path.basename(name)
+    while os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+        name = os.path.splitext(name)[0]
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def default_info_path():
+    return cache_dir("assets.json")
+
+
+def referenced_images():
+    """Every image name the loaded catalog refers to."""
+    from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, RULES
+
+    names = {question.image for question in QUESTIONS + DEFICIENCY_CHECKS if question.image}
+    names.update(rule.diagnosis.image for rule in RULES if rule.diagnosis.image)
+    return sorted(names)
+
+
+class AssetManifest:
+    def __init__(self, directory=IMAGE_DIR, info_path=None):
+        self.directory = directory
+        self.info_path = info_path or default_info_path()
+        self.files = {}  # normalized name -> absolute path
+        self.duplicates = {}  # normalized name -> every file that normalizes to it, when more than one does
+        self.resolved = {}  # name as referenced -> absolute path
+        self.infos = None  # file name -> [mtime_ns, size, width, height, format], loaded on first use
+        self.scanned = None
+        self.scan()
+
+    def scan(self):
+        try:
+            self.scanned = os.stat(self.directory).st_mtime_ns
+            entries = sorted(entry.name for entry in os.scandir(self.directory) if entry.is_file())
+        except FileNotFoundError:
+            entries = []
+        files, seen = {}, {}
+        for name in entries:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                key = normalize(name)
+                seen.setdefault(key, []).append(name)
+                files.setdefault(key, os.path.join(self.directory, name))
+        self.files = files
+        self.duplicates = {key: names for key, names in seen.items() if len(names) > 1}
+        self.resolved = {}
+
+    def path(self, name):
+        """Absolute path of the asset ``name`` refers to. Raises FileNotFoundError when there is none."""
+        path = self.resolved.get(name)
+        if path is not None:
+            return path
+        path = self.files.get(normalize(name))
+        if path is None and self.rescan_needed():
+            # Files were added to the folder since it was listed.
+            self.scan()
+            path = self.files.get(normalize(name))
+        if path is None:
+            raise FileNotFoundError(f"Image not found: {name}")
+        self.resolved[name] = path
+        return path
+
+    def rescan_needed(self):
+        try:
+            return os.stat(self.directory).st_mtime_ns != self.scanned
+        except FileNotFoundError:
+            return False
+
+    def info(self, name):
+        """AssetInfo with the image's pixel size and format, read from its header once per file version."""
+        from PIL import Image
+
+        path = self.path(name)
+        stat = os.stat(path)
+        if self.infos is None:
+            self.infos = self.load_infos()
+        file_name = os.path.basename(path)
+        cached = self.infos.get(file_name)
+        if cached is None or cached[:2] != [stat.st_mtime_ns, stat.st_size]:
+            with Image.open(path) as image:
+                cached = [stat.st_mtime_ns, stat.st_size, image.width, image.height, image.format]
+            self.infos[file_name] = cached
+            self.save_infos()
+        return AssetInfo(path, *cached[2:])
+
+    def load_infos(self):
+        try:
+            with open(self.info_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get(self.directory, {}) if isinstance(data, dict) else {}
+
+    def save_infos(self):
+        directory = os.path.dirname(self.info_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({self.directory: self.infos}, f)
+        os.replace(tmp, self.info_path)
+
+    def missing(self, names):
+        """The names in ``names`` that resolve to no file. Needs no image decoding."""
+        return [name for name in names if normalize(name) not in self.files]
+
+    def check(self, names=None, decode=True):
+        """Return a list of problems: missing or unreadable referenced images, and ambiguous file names."""
+        names = referenced_images() if names is None else names
+        problems = [f"missing: {name}" for name in self.missing(names)]
+        for key, duplicates in sorted(self.duplicates.items()):
+            problems.append(f"ambiguous: {', '.join(duplicates)} all match {key}")
+        if decode:
+            for name in names:
+                if normalize(name) in self.files:
+                    try:
+                        self.info(name)
+                    except Exception as e:
+                        problems.append(f"unreadable: {name} ({e})")
+        return problems
+
+
+_manifest = None
+
+
+def manifest():
+    """The manifest of ``images/`` next to this module, listed on first use."""
+    global _manifest
+    if _manifest is None:
+        _manifest = AssetManifest()
+    return _manifest
+
+
+def image_path(name):
+    return manifest().path(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the images the question catalog refers to.")
+    parser.add_argument("--list", action="store_true", help="also print each image's file, size and format")
+    args = parser.parse_args()
+
+    assets = manifest()
+    problems = assets.check()
+    if args.list:
+        for name in referenced_images():
+            try:
+                info = assets.info(name)
+            except Exception:
+                continue
+            print(f"{name:32} {os.path.basename(info.path):36} {info.width}x{info.height} {info.format}")
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    print(f"{len(referenced_images())} images referenced, {len(problems)} problems", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Diagnose survey answers in bulk from a CSV or JSONL file.
+
+Each row/record holds one plant. Columns are matched to question ids from
+diagnosis.QUESTIONS (``stage``, ``drooping``, ``pests``, ``temp_high``, ...),
+with a few spreadsheet-friendly aliases such as ``n``/``p``/``k`` and
+``water_ph``/``soil_ph``. Records are streamed in chunks to a process pool and
+results are written in input order as soon as each chunk is done, so memory
+stays flat regardless of file size. NPK/pH readings are parsed into numbers
+and range-checked for a whole chunk at once (vectorized, when NumPy is
+installed)::
+
+    python batch.py survey.csv -o results.jsonl
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnosis import QUESTION_IDS, INDEX, diagnose
+from readings import parse_npk_text, parse_ph_text, check_ranges_bulk
+
+DEFAULT_CHUNK_SIZE = 2000
+
+YES = {"yes", "y", "true", "t", "1", "x"}
+NO = {"no", "n", "false", "f", "0"}
+NOT_SURE = {"not_sure", "not sure", "unsure", "?", "dont_know", "don't know"}
+NOT_APPLICABLE = {"not_applicable", "n/a", "na"}
+
+COLUMN_ALIASES = {
+    "growth_stage": "stage",
+    "life_stage": "stage",
+    "fertilizer_npk": "npk",
+    "npk_n": "n",
+    "npk_p": "p",
+    "npk_k": "k",
+    "nitrogen": "n",
+    "phosphorus": "p",
+    "potassium": "k",
+    "ph_water": "water_ph",
+    "ph_soil": "soil_ph",
+    "temperature_above_85f": "temp_high",
+    "temperature_below_70f": "temp_low",
+    "humidity_above_60": "humidity_high",
+    "humidity_below_40": "humidity_low",
+    "ro": "ro_water",
+    "coco": "coco_coir",
+}
+ID_COLUMNS = ("id", "plant_id", "record_id")
+READINGS = ("npk", "ph")  # parsed into numbers rather than yes/no answers
+NAN = float("nan")
+
+
+def normalize_column(name):
+    column = re.sub(r"[^0-9a-z]+", "_", name.strip().lower()).strip("_")
+    return COLUMN_ALIASES.get(column, column)
+
+
+def normalize_answer(value):
+    value = str(value).strip().lower()
+    if value in YES:
+        return "yes"
+    if value in NO:
+        return "no"
+    if value in NOT_SURE:
+        return "not_sure"
+    if value in NOT_APPLICABLE:
+        return "not_applicable"
+    return value
+
+
+def normalize_record(record):
+    fields = {}
+    for column, value in record.items():
+        if column is None or value is None or value == "":
+            continue
+        fields[normalize_column(column)] = value
+    return fields
+
+
+def record_answers(fields, warnings=None):
+    """Turn one normalized record into the ``{question_id: answer}`` mapping the GUI would have produced.
+
+    Readings that do not parse are left out and their messages appended to ``warnings``.
+    """
+    answers = {}
+    for question_id in QUESTION_IDS:
+        if question_id in READINGS:
+            continue
+        if question_id in fields:
+            answers[question_id] = normalize_answer(fields[question_id])
+    for question_id, parse, parts in (("npk", parse_npk_text, ("n", "p", "k")),
+                                      ("ph", parse_ph_text, ("water_ph", "soil_ph"))):
+        if question_id in fields:
+            value = fields[question_id]
+        elif all(part in fields for part in parts):
+            value = [fields[part] for part in parts]
+        else:
+            continue
+        if isinstance(value, str) and normalize_answer(value) == "not_sure":
+            answers[question_id] = "not_sure"
+            continue
+        try:
+            answers[question_id] = parse(value)
+        except ValueError as e:
+            if warnings is not None:
+                warnings.append(f"{question_id}: {e}")
+    return answers
+
+
+def record_id(fields, row):
+    for column in ID_COLUMNS:
+        if column in fields:
+            return fields[column]
+    return row
+
+
+def reading_array(answers, question_id, width):
+    value = answers.get(question_id)
+    return value if isinstance(value, list) else [NAN] * width
+
+
+def fact_masks(parsed):
+    """Rule bits raised by the NPK/pH range checks, for every record of a chunk in one pass."""
+    facts = check_ranges_bulk(
+        [answers.get("stage") for _, answers, _ in parsed],
+        [reading_array(answers, "npk", 3) for _, answers, _ in parsed],
+        [reading_array(answers, "ph", 2) for _, answers, _ in parsed],
+        [answers.get("coco_coir") == "yes" for _, answers, _ in parsed],
+    )
+    masks = [0] * len(parsed)
+    for fact, hits in facts.items():
+        bit = INDEX.index.get((fact, "yes"), 0)
+        for position in hits.nonzero()[0]:
+            masks[position] |= bit
+    return masks
+
+
+def diagnose_chunk(chunk):
+    parsed = []
+    for row, record in chunk:
+        fields = normalize_record(record)
+        warnings = []
+        parsed.append((record_id(fields, row), record_answers(fields, warnings), warnings))
+    try:
+        masks = fact_masks(parsed)
+    except ImportError:
+        masks = None  # no NumPy: diagnose() runs the same range checks one record at a time
+    results = []
+    for position, (id, answers, warnings) in enumerate(parsed):
+        if masks is None:
+            diagnoses = diagnose(answers)
+        else:
+            diagnoses = INDEX.expand((INDEX.answer_mask(answers) | masks[position]) & INDEX.possible(answers))
+        result = {
+            "id": id,
+            "stage": answers.get("stage", ""),
+            "diagnoses": [diagnosis.name for diagnosis in diagnoses],
+        }
+        for reading in READINGS:
+            if reading in answers:
+                result[reading] = answers[reading]
+        if warnings:
+            result["warnings"] = warnings
+        results.append(result)
+    return results
+
+
+def read_records(path, fmt):
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(records, chunk_size):
+    chunk = []
+    for row, record in enumerate(records, start=1):
+        chunk.append((row, record))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(records, write, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Diagnose ``records`` and pass each result to ``write`` in input order. Returns the record count."""
+    count = 0
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunked(records, chunk_size):
+            for result in diagnose_chunk(chunk):
+                write(result)
+                count += 1
+        return count
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a couple of chunks per worker are ever in flight, which keeps memory constant.
+        max_in_flight = 2 * workers
+        in_flight = deque()
+        for chunk in chunked(records, chunk_size):
+            in_flight.append(executor.submit(diagnose_chunk, chunk))
+            if len(in_flight) >= max_in_flight:
+                for result in in_flight.popleft().result():
+                    write(result)
+                    count += 1
+        while in_flight:
+            for result in in_flight.popleft().result():
+                write(result)
+                count += 1
+    return count
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, result):
+        self.f.write(json.dumps(result) + "\n")
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(["id", "stage", "diagnoses"])
+
+    def __call__(self, result):
+        self.writer.writerow([result["id"], result["stage"], "; ".join(result["diagnoses"])])
+
+
+def detect_format(path, default="jsonl"):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    return default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnose grow-room survey answers in bulk.")
+    parser.add_argument("input", help="CSV or JSONL file with one plant per row")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 1 runs in-process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or (detect_format(args.output) if args.output else "jsonl")
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        write = CsvWriter(out) if output_format == "csv" else JsonlWriter(out)
+        count = run(read_records(args.input, input_format), write, args.workers, args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Diagnosed {count} records.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
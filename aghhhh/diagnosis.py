@@ -0,0 +1,240 @@
+"""Headless diagnosis engine.
+
+Questions and diagnosis rules are plain data, kept in ``catalog.json`` next to
+this file. They are validated and compiled once into an index from
+(question id, answer) to a bitmask of rules, so evaluating a set of answers
+costs one dict lookup per answer no matter how many rules exist. Rules limited
+to some growth stages are masked out for the others, and typed NPK/pH readings
+contribute the derived facts from ``readings.reading_facts``.
+
+The compiled catalog and index are pickled to the cache directory, so later
+starts skip parsing and validation entirely until the JSON file changes.
+``reload_if_changed`` swaps a changed catalog in place: every module that
+imported ``QUESTIONS``, ``RULES`` or ``INDEX`` sees the new entries.
+Nothing in here imports tkinter or PIL.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+from collections import namedtuple
+
+from paths import cache_dir
+from readings import FACT_SOURCES, reading_facts
+
+Question = namedtuple("Question", ["id", "text", "image", "input_type"])
+Diagnosis = namedtuple("Diagnosis", ["name", "solution", "image"])
+Rule = namedtuple("Rule", ["diagnosis", "when", "stages"], defaults=(None,))  # stages=None: every stage
+
+STAGES = ("seedling", "vegetative", "flowering")
+ANSWERS = ("yes", "no", "not_sure", "not_applicable")
+INPUT_TYPES = (None, "stage", "npk_input", "ph_input", "cal_mag", "input")
+
+CATALOG_PATH = os.environ.get("CANNABIS_DIAGNOSIS_CATALOG") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+CACHE_VERSION = 1  # bump when the compiled layout changes
+
+# Filled from the catalog below and updated in place on reload.
+QUESTIONS = []
+# Reference photos the user compares their leaves against ("image_check" flow).
+DEFICIENCY_CHECKS = []
+RULES = []
+# Questions that only make sense after another answer: asked only when the
+# named question was answered with one of the listed values.
+CONDITIONS = {}
+QUESTION_IDS = []
+
+# The step that walks through the reference photos in the GUI, offered once an uploaded leaf photo matches any.
+PHOTO_CHECK = Question("photo_check", "Does your leaf look like these reference photos?", None, "image_check")
+
+
+class DiagnosisIndex:
+    def __init__(self, rules, stages=STAGES):
+        self.diagnoses = [rule.diagnosis for rule in rules]
+        self.index = {}
+        self.question_masks = {}  # question id -> every rule bit any of its answers can set
+        self.all_rules = (1 << len(rules)) - 1
+        self.stage_masks = dict.fromkeys(stages, self.all_rules)  # stage -> rules that apply in it
+        for bit, rule in enumerate(rules):
+            for trigger in rule.when:
+                self.index[trigger] = self.index.get(trigger, 0) | (1 << bit)
+                question_id = FACT_SOURCES.get(trigger[0], trigger[0])
+                self.question_masks[question_id] = self.question_masks.get(question_id, 0) | (1 << bit)
+            if rule.stages is not None:
+                for stage in stages:
+                    if stage not in rule.stages:
+                        self.stage_masks[stage] &= ~(1 << bit)
+
+    def answer_mask(self, answers):
+        mask = 0
+        get = self.index.get
+        for item in answers.items():
+            if not isinstance(item[1], list):  # typed readings only count through their derived facts
+                mask |= get(item, 0)
+        return mask
+
+    def possible(self, answers):
+        """Rules that can apply at all given the answered stage (every rule while it is unknown)."""
+        return self.stage_masks.get(answers.get("stage"), self.all_rules)
+
+    def mask(self, answers):
+        return (self.answer_mask(answers) | self.answer_mask(reading_facts(answers))) & self.possible(answers)
+
+    def expand(self, mask):
+        # Walk the set bits only, lowest first, so results keep catalog order.
+        diagnoses = []
+        while mask:
+            low = mask & -mask
+            diagnoses.append(self.diagnoses[low.bit_length() - 1])
+            mask ^= low
+        return diagnoses
+
+    def diagnose(self, answers):
+        return self.expand(self.mask(answers))
+
+
+def parse_catalog(data):
+    """Validate a decoded catalog and return (questions, deficiency checks, rules, conditions).
+
+    Raises ValueError listing every problem found, so one edit session can fix them all.
+    """
+    problems = []
+
+    def questions(key, input_types):
+        parsed = []
+        for position, entry in enumerate(data.get(key) or []):
+            try:
+                question = Question(entry["id"], entry["text"], entry.get("image"), entry.get("input"))
+            except (KeyError, TypeError):
+                problems.append(f"{key}[{position}]: needs an id and a text")
+                continue
+            if question.input_type not in input_types:
+                problems.append(f"{key}[{position}] ({question.id}): unknown input {question.input_type!r}")
+            parsed.append(question)
+        return parsed
+
+    if not isinstance(data, dict):
+        raise ValueError("The catalog must be a JSON object.")
+    questions_list = questions("questions", INPUT_TYPES)
+    checks = [question._replace(input_type="image_check") for question in questions("deficiency_checks",
+                                                                                    (None, "image_check"))]
+    known = set()
+    for question in questions_list + checks:
+        if question.id in known:
+            problems.append(f"question id {question.id!r} is used more than once")
+        known.add(question.id)
+    if not questions_list or questions_list[0].input_type != "stage":
+        problems.append("the first question must be the growth stage (input \"stage\")")
+
+    rules = []
+    for position, entry in enumerate(data.get("rules") or []):
+        try:
+            diagnosis = Diagnosis(entry["diagnosis"], entry["solution"], entry.get("image"))
+            when = [(question_id, answer) for question_id, answer in entry["when"]]
+            stages = tuple(entry["stages"]) if entry.get("stages") else None
+        except (KeyError, TypeError, ValueError):
+            problems.append(f"rules[{position}]: needs a diagnosis, a solution and a list of [question, answer]")
+            continue
+        for question_id, answer in when:
+            if question_id not in known and question_id not in FACT_SOURCES:
+                problems.append(f"rules[{position}] ({diagnosis.name}): unknown question {question_id!r}")
+            if answer not in ANSWERS:
+                problems.append(f"rules[{position}] ({diagnosis.name}): unknown answer {answer!r}")
+        for stage in stages or ():
+            if stage not in STAGES:
+                problems.append(f"rules[{position}] ({diagnosis.name}): unknown stage {stage!r}")
+        rules.append(Rule(diagnosis, when, stages))
+
+    conditions = {}
+    for question_id, condition in (data.get("conditions") or {}).items():
+        try:
+            parent, allowed = condition
+            conditions[question_id] = (parent, tuple(allowed))
+        except (TypeError, ValueError):
+            problems.append(f"conditions[{question_id!r}]: needs [question, [answers...]]")
+            continue
+        for name in (question_id, parent):
+            if name not in known:
+                problems.append(f"conditions[{question_id!r}]: unknown question {name!r}")
+
+    if problems:
+        raise ValueError("Invalid catalog:\n" + "\n".join(problems))
+    return questions_list, checks, rules, conditions
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return CACHE_VERSION, os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def compile_catalog(path):
+    with open(path, encoding="utf-8") as f:
+        questions, checks, rules, conditions = parse_catalog(json.load(f))
+    return {"questions": questions, "deficiency_checks": checks, "rules": rules, "conditions": conditions,
+            "index": DiagnosisIndex(rules)}
+
+
+def load_compiled(path, cache_path=None):
+    """Return (stamp, compiled catalog), from the pickle cache when it matches the JSON file."""
+    cache_path = cache_path or cache_dir("catalog.pickle")
+    stamp = source_stamp(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached_stamp, compiled = pickle.load(f)
+        if cached_stamp == stamp:
+            return stamp, compiled
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+    compiled = compile_catalog(path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((stamp, compiled), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass  # a read-only cache only costs the next start a recompile
+    return stamp, compiled
+
+
+def install(compiled):
+    # In place, so modules that imported these names keep seeing the current catalog.
+    QUESTIONS[:] = compiled["questions"]
+    DEFICIENCY_CHECKS[:] = compiled["deficiency_checks"]
+    RULES[:] = compiled["rules"]
+    CONDITIONS.clear()
+    CONDITIONS.update(compiled["conditions"])
+    QUESTION_IDS[:] = [question.id for question in QUESTIONS]
+    vars(INDEX).update(vars(compiled["index"]))
+
+
+INDEX = DiagnosisIndex([])
+loaded_stamp, _compiled = load_compiled(CATALOG_PATH)
+install(_compiled)
+del _compiled
+
+
+def reload_if_changed(path=None):
+    """Reload the catalog if its file changed since it was loaded. Returns True when it did.
+
+    An invalid file raises ValueError once and leaves the current catalog in place.
+    """
+    global loaded_stamp
+    path = path or CATALOG_PATH
+    stamp = source_stamp(path)
+    if stamp == loaded_stamp:
+        return False
+    loaded_stamp = stamp
+    install(load_compiled(path)[1])
+    return True
+
+
+def diagnose(answers):
+    """Return the diagnoses for a ``{question_id: answer}`` mapping, in catalog order."""
+    return INDEX.diagnose(answers)
+
+
+def answers_from_responses(responses):
+    """Map a positional list of responses (one per entry in QUESTIONS) to question ids."""
+    return dict(zip(QUESTION_IDS, responses))
@@ -0,0 +1,201 @@
+"""SQLite store of completed diagnosis sessions.
+
+Each session keeps its stage, raw answers, typed NPK/pH readings, plant and
+room IDs and timestamp; each diagnosis it produced is a row in
+``session_diagnoses`` with the columns the common queries filter on copied in,
+so those queries are answered from covering indexes. Per-day, per-stage
+diagnosis counts are kept up to date on insert, so frequency reports never scan
+the raw rows.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+
+from paths import data_dir
+
+DAY = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    plant_id TEXT,
+    room_id TEXT,
+    stage TEXT,
+    answers TEXT NOT NULL,
+    npk_n REAL,
+    npk_p REAL,
+    npk_k REAL,
+    water_ph REAL,
+    soil_ph REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_plant_time ON sessions (plant_id, created_at, soil_ph, water_ph);
+CREATE INDEX IF NOT EXISTS sessions_room_time ON sessions (room_id, created_at);
+
+CREATE TABLE IF NOT EXISTS diagnosis_names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS session_diagnoses (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    diagnosis_id INTEGER NOT NULL REFERENCES diagnosis_names (id),
+    created_at REAL NOT NULL,
+    plant_id TEXT,
+    room_id TEXT,
+    stage TEXT
+);
+CREATE INDEX IF NOT EXISTS session_diagnoses_name_time
+    ON session_diagnoses (diagnosis_id, created_at, plant_id);
+CREATE INDEX IF NOT EXISTS session_diagnoses_room
+    ON session_diagnoses (room_id, diagnosis_id, created_at);
+CREATE INDEX IF NOT EXISTS session_diagnoses_session ON session_diagnoses (session_id);
+
+CREATE TABLE IF NOT EXISTS daily_counts (
+    day INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    diagnosis_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, stage, diagnosis_id)
+) WITHOUT ROWID;
+"""
+
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def default_history_path():
+    return data_dir("history.sqlite3")
+
+
+def parse_numbers(text, count):
+    """Return a typed reading as a tuple of floats; older sessions stored it as text."""
+    if isinstance(text, (list, tuple)):
+        return tuple(text) if len(text) == count else (None,) * count
+    if not isinstance(text, str):
+        return (None,) * count
+    numbers = [float(number) for number in NUMBER.findall(text)]
+    return tuple(numbers) if len(numbers) == count else (None,) * count
+
+
+class HistoryStore:
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.diagnosis_ids = dict(self.db.execute("SELECT name, id FROM diagnosis_names"))
+        self.diagnosis_names = {id: name for name, id in self.diagnosis_ids.items()}
+
+    def close(self):
+        self.db.close()
+
+    def diagnosis_id(self, name):
+        id = self.diagnosis_ids.get(name)
+        if id is None:
+            self.db.execute("INSERT OR IGNORE INTO diagnosis_names (name) VALUES (?)", (name,))
+            id = self.db.execute("SELECT id FROM diagnosis_names WHERE name = ?", (name,)).fetchone()[0]
+            self.diagnosis_ids[name] = id
+            self.diagnosis_names[id] = name
+        return id
+
+    def record_session(self, answers, diagnoses, plant_id=None, room_id=None, created_at=None):
+        """Store one completed session and return its id. ``diagnoses`` are Diagnosis tuples or names."""
+        with self.db:
+            return self._insert(answers, diagnoses, plant_id, room_id, created_at)
+
+    def record_many(self, sessions):
+        """Bulk insert (answers, diagnoses, plant_id, room_id, created_at) tuples in one transaction."""
+        with self.db:
+            return [self._insert(*session) for session in sessions]
+
+    def _insert(self, answers, diagnoses, plant_id, room_id, created_at):
+        created_at = time.time() if created_at is None else created_at
+        stage = answers.get("stage") or ""
+        npk = parse_numbers(answers.get("npk"), 3)
+        ph = parse_numbers(answers.get("ph"), 2)
+        session_id = self.db.execute(
+            "INSERT INTO sessions (created_at, plant_id, room_id, stage, answers, npk_n, npk_p, npk_k, water_ph, soil_ph)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (created_at, plant_id, room_id, stage, json.dumps(answers), *npk, *ph),
+        ).lastrowid
+        diagnosis_ids = [self.diagnosis_id(getattr(d, "name", d)) for d in diagnoses]
+        self.db.executemany(
+            "INSERT INTO session_diagnoses (session_id, diagnosis_id, created_at, plant_id, room_id, stage)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(session_id, id, created_at, plant_id, room_id, stage) for id in diagnosis_ids],
+        )
+        day = int(created_at // DAY)
+        self.db.executemany(
+            "INSERT INTO daily_counts (day, stage, diagnosis_id, count) VALUES (?, ?, ?, 1)"
+            " ON CONFLICT (day, stage, diagnosis_id) DO UPDATE SET count = count + 1",
+            [(day, stage, id) for id in diagnosis_ids],
+        )
+        return session_id
+
+    def session_count(self):
+        return self.db.execute("SELECT MAX(id) FROM sessions").fetchone()[0] or 0
+
+    def diagnosis_totals(self):
+        """Return {diagnosis: count} over all time, from the daily rollup."""
+        # Names are joined in rather than taken from diagnosis_names: another process may have added some.
+        return dict(self.db.execute(
+            "SELECT name, SUM(count) FROM daily_counts JOIN diagnosis_names ON id = diagnosis_id"
+            " GROUP BY diagnosis_id"))
+
+    def plants_with_diagnosis(self, name, since=None, until=None, room_id=None):
+        """Return (plant_id, sessions, last seen) for plants diagnosed with ``name``, most recent first."""
+        id = self.diagnosis_ids.get(name)
+        if id is None:
+            row = self.db.execute("SELECT id FROM diagnosis_names WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return []
+            id = row[0]
+        query = ("SELECT plant_id, COUNT(*), MAX(created_at) FROM session_diagnoses"
+                 " WHERE diagnosis_id = ? AND created_at >= ? AND created_at < ?")
+        params = [id, since or 0, until or float("inf")]
+        if room_id is not None:
+            query += " AND room_id = ?"
+            params.append(room_id)
+        query += " GROUP BY plant_id ORDER BY MAX(created_at) DESC"
+        return self.db.execute(query, params).fetchall()
+
+    def plants_with_diagnosis_in_last(self, name, days, room_id=None):
+        return self.plants_with_diagnosis(name, since=time.time() - days * DAY, room_id=room_id)
+
+    def diagnosis_frequency_by_stage(self, since=None, until=None):
+        """Return {stage: {diagnosis: count}} from the daily rollup (day granularity)."""
+        first_day = int(since // DAY) if since is not None else 0
+        last_day = int(until // DAY) if until is not None else 2 ** 62
+        rows = self.db.execute(
+            "SELECT stage, name, SUM(count) FROM daily_counts JOIN diagnosis_names ON id = diagnosis_id"
+            " WHERE day BETWEEN ? AND ? GROUP BY stage, diagnosis_id",
+            (first_day, last_day),
+        )
+        frequency = {}
+        for stage, name, count in rows:
+            frequency.setdefault(stage, {})[name] = count
+        return frequency
+
+    def reading_trend(self, plant_id, reading="soil_ph", since=None):
+        """Return [(created_at, value)] for one plant's ``soil_ph`` or ``water_ph`` readings, oldest first."""
+        if reading not in ("soil_ph", "water_ph"):
+            raise ValueError(f"Unknown reading: {reading}")
+        return self.db.execute(
+            f"SELECT created_at, {reading} FROM sessions WHERE plant_id = ? AND created_at >= ?"
+            f" AND {reading} IS NOT NULL ORDER BY created_at",
+            (plant_id, since or 0),
+        ).fetchall()
+
+    def sessions_for_plant(self, plant_id, limit=50):
+        rows = self.db.execute(
+            "SELECT id, created_at, stage, answers FROM sessions WHERE plant_id = ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (plant_id, limit),
+        )
+        return [(id, created_at, stage, json.loads(answers)) for id, created_at, stage, answers in rows]
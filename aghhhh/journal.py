@@ -0,0 +1,131 @@
+"""Append-only journal of the questionnaire in progress.
+
+Every answer is appended as one short JSON line together with the position it
+leaves the questionnaire in, so replaying the file restores the exact question,
+answers and deficiency-check position without re-running any UI steps. Lines
+are flushed to the OS immediately (a crash of the app loses nothing) and
+fsynced in batches (a power cut loses at most the last batch).
+
+Finished sessions are only marked, never kept: once the file grows past
+``compact_bytes`` it is rewritten to hold just the open session, so it stays
+small however many sessions run through it.
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from paths import data_dir
+
+START, END, SNAPSHOT = "#start", "#end", "#snap"
+
+JournalState = namedtuple("JournalState", ["answers", "current_question", "deficiency_index"])
+
+
+def default_journal_path():
+    return data_dir("session.journal")
+
+
+def encode(record):
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class SessionJournal:
+    def __init__(self, path=None, fsync_every=8, fsync_interval=1.0, compact_bytes=64 * 1024):
+        self.path = path or default_journal_path()
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.in_session = False
+        self.intact_bytes = None  # set by replay(): length of the file up to its last complete line
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file = open(self.path, "ab")
+
+    def replay(self):
+        """Return the JournalState of the unfinished session in the file, or None."""
+        state = None
+        self.intact_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last write from a crash; everything before it is intact
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.intact_bytes += len(line)
+                kind = record[0]
+                if kind == START:
+                    state = JournalState({}, 0, 0)
+                elif kind == END:
+                    state = None
+                elif kind == SNAPSHOT:
+                    state = JournalState(record[1], record[2], record[3])
+                elif state is not None:
+                    question_id, answer, current_question, deficiency_index = record
+                    state.answers[question_id] = answer
+                    state = state._replace(current_question=current_question, deficiency_index=deficiency_index)
+        return state
+
+    def resume(self):
+        """Replay the journal and keep appending to the open session, if there is one."""
+        state = self.replay()
+        self.in_session = state is not None
+        if state is not None:
+            self.compact(state)
+        elif self.intact_bytes < os.path.getsize(self.path):
+            # Cut off the torn tail so the next record does not land on the end of it.
+            self.file.flush()
+            os.truncate(self.path, self.intact_bytes)
+        return state
+
+    def record(self, question_id, answer, current_question, deficiency_index):
+        if not self.in_session:
+            self._append([START, time.time()])
+            self.in_session = True
+        self._append([question_id, answer, current_question, deficiency_index])
+
+    def finish(self):
+        if self.in_session:
+            self._append([END])
+            self.in_session = False
+        self.sync()
+        if self.file.tell() > self.compact_bytes:
+            self.compact(None)
+
+    def compact(self, state):
+        """Rewrite the journal as a single snapshot of ``state`` (or empty), atomically."""
+        data = b""
+        if state is not None:
+            data = encode([SNAPSHOT, state.answers, state.current_question, state.deficiency_index])
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open(self.path, "ab")
+        self.unsynced = 0
+
+    def _append(self, record):
+        self.file.write(encode(record))
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.file.close()
@@ -0,0 +1,185 @@
+"""Leaf photo color analysis.
+
+A photo is decoded straight to a small size (JPEG DCT scaling through
+``Image.draft``, then a cheap resize), converted to HSV with NumPy, and the
+leaf is segmented from background by saturation/brightness and plant-like hues.
+Within the leaf mask, pixels are classed as green, chlorotic (yellow),
+necrotic (brown) or anthocyanin (purple). Brown and purple only count where
+enough of the neighbourhood is green or yellow leaf, so soil, coir and pots
+around the plant are not read as dead or purpled tissue. The bands are
+calibrated against the reference photos in ``images/``: yellowing is bright and
+strongly saturated, dead edges are a paler tan, and purpling is a dark maroon
+that wraps round the red end of the hue circle. The fractions become confidence
+scores for the matching yes/no questions. A 12 MP JPEG takes a few tens of
+milliseconds, most of it in the reduced decode.
+
+Batch mode analyses a folder of photos across a process pool::
+
+    python leafcolor.py grow-cam/ -o leaves.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+ANALYSIS_SIZE = 256  # longest side, in pixels, the photo is reduced to before analysis
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+# Leaf pixels: saturated and bright enough to be tissue rather than soil, pot or shadow.
+MIN_SATURATION = 0.2
+MIN_VALUE = 0.15
+# Hue bands in degrees.
+GREEN = (70, 170)
+CHLOROTIC = (42, 70)  # bright and saturated only; dark olive is still green tissue in shade
+NECROTIC = (20, 55)  # what is left of tan to brown once yellowing is taken out
+PURPLE = (280, 35)  # wraps through 0: violet, maroon and red-brown veins
+CHLOROTIC_MIN_VALUE = 0.45
+CHLOROTIC_MIN_SATURATION = 0.5
+NECROTIC_MIN_VALUE = 0.4  # darker browns are soil and shadow
+PURPLE_MAX_VALUE = 0.5  # anthocyanin is dark; bright reds and pinks are flowers, pots and labels
+SPOT_RADIUS = 4  # pixels at ANALYSIS_SIZE; neighbourhood checked around brown and purple pixels
+SPOT_MIN_LEAF = 0.3  # share of that neighbourhood that must be green or yellow leaf
+
+LeafAnalysis = namedtuple("LeafAnalysis", ["leaf_fraction", "green", "chlorotic", "necrotic", "purple"])
+
+# Question id -> (analysis field, fraction where confidence starts rising, fraction where it reaches 1).
+CONFIDENCE_RAMPS = {
+    "yellowing_leaves": ("chlorotic", 0.05, 0.30),
+    "brown_spots": ("necrotic", 0.01, 0.10),
+    "purple_leaves": ("purple", 0.0005, 0.005),  # purpling shows in veins and stems, a small share of the leaf
+}
+
+
+def load_small(path, size=ANALYSIS_SIZE):
+    """Decode ``path`` to an RGB uint8 array whose longest side is at most ``size``."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        # JPEG decodes at 1/2, 1/4 or 1/8 scale here, before any pixel is touched.
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB")
+        image.thumbnail((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return np.asarray(image)
+
+
+def rgb_to_hsv(rgb):
+    """Vectorized RGB (uint8, ...x3) to hue in degrees, saturation and value in [0, 1]."""
+    import numpy as np
+
+    rgb = rgb.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    chroma = value - rgb.min(axis=-1)
+    saturation = np.divide(chroma, value, out=np.zeros_like(value), where=value > 0)
+    safe = np.where(chroma > 0, chroma, 1.0)
+    hue = np.where(value == r, (g - b) / safe % 6,
+                   np.where(value == g, (b - r) / safe + 2, (r - g) / safe + 4)) * 60.0
+    hue[chroma == 0] = 0.0
+    return hue, saturation, value
+
+
+def in_band(hue, band):
+    """Hue within [start, end) degrees; a band whose start is above its end wraps through 0."""
+    if band[0] <= band[1]:
+        return (hue >= band[0]) & (hue < band[1])
+    return (hue >= band[0]) | (hue < band[1])
+
+
+def box_mean(mask, radius):
+    """Mean of ``mask`` over a (2 * radius + 1)² box around every pixel, from an integral image."""
+    import numpy as np
+
+    padded = np.pad(mask.astype(np.float32), radius + 1, mode="constant")[:-1, :-1]
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    size = 2 * radius + 1
+    total = integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+    return total / (size * size)
+
+
+def analyse_pixels(rgb):
+    """Return the LeafAnalysis of an RGB array."""
+    hue, saturation, value = rgb_to_hsv(rgb)
+    tissue = (saturation >= MIN_SATURATION) & (value >= MIN_VALUE)
+    green = tissue & in_band(hue, GREEN)
+    chlorotic = (tissue & in_band(hue, CHLOROTIC) & (value >= CHLOROTIC_MIN_VALUE)
+                 & (saturation >= CHLOROTIC_MIN_SATURATION))
+    on_leaf = box_mean(green | chlorotic, SPOT_RADIUS) >= SPOT_MIN_LEAF
+    dark_red = tissue & in_band(hue, PURPLE) & (value < PURPLE_MAX_VALUE)
+    purple = dark_red & on_leaf
+    necrotic = (tissue & in_band(hue, NECROTIC) & ~chlorotic & ~dark_red
+                & (value >= NECROTIC_MIN_VALUE) & on_leaf)
+    counts = [int(mask.sum()) for mask in (green, chlorotic, necrotic, purple)]
+    leaf = sum(counts)
+    if not leaf:
+        return LeafAnalysis(0.0, 0.0, 0.0, 0.0, 0.0)
+    return LeafAnalysis(leaf / hue.size, *(count / leaf for count in counts))
+
+
+def analyse(path, size=ANALYSIS_SIZE):
+    return analyse_pixels(load_small(path, size))
+
+
+def confidences(analysis):
+    """Map a LeafAnalysis to {question_id: confidence in [0, 1] that the answer is "yes"}."""
+    scores = {}
+    for question_id, (field, start, full) in CONFIDENCE_RAMPS.items():
+        fraction = getattr(analysis, field)
+        scores[question_id] = min(1.0, max(0.0, (fraction - start) / (full - start)))
+    return scores
+
+
+def analyse_file(path):
+    """Batch worker: one JSON-ready result per photo, errors included rather than raised."""
+    try:
+        analysis = analyse(path)
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+    return {"path": path, **{field: round(value, 4) for field, value in analysis._asdict().items()},
+            "confidence": {question_id: round(score, 3) for question_id, score in confidences(analysis).items()}}
+
+
+def find_photos(folder):
+    for directory, _, names in os.walk(folder):
+        for name in sorted(names):
+            if name.lower().endswith(PHOTO_EXTENSIONS):
+                yield os.path.join(directory, name)
+
+
+def run(paths, write, workers=None, chunksize=16):
+    """Analyse ``paths`` across a process pool, passing results to ``write`` in input order."""
+    count = 0
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for result in map(analyse_file, paths):
+            write(result)
+            count += 1
+        return count
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(analyse_file, paths, chunksize=chunksize):
+            write(result)
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score leaf photos for yellowing, brown spots and purpling.")
+    parser.add_argument("folder", help="folder of photos (searched recursively)")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = run(find_photos(args.folder), lambda result: out.write(json.dumps(result) + "\n"), args.workers)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Analysed {count} photos.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
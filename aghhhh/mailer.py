@@ -0,0 +1,333 @@
+"""Background email delivery.
+
+Messages are written to a spool directory before ``Outbox.send`` returns, so
+queued mail survives a crash or restart. A single worker thread delivers them
+over one authenticated SMTP session that is kept open between messages,
+retrying transient failures with exponential backoff. Delivery progress is
+reported through a thread-safe status queue the UI can poll.
+
+Results emails are multipart/related HTML with a plain-text alternative, each
+thumbnail attached once and referenced by Content-ID. The base64 MIME part of
+every thumbnail is built once per process and kept, so composing a message is
+only string assembly.
+
+For local testing point ``SmtpSettings`` at a plain SMTP stand-in, e.g.
+``python -m aiosmtpd -n -l localhost:8025``, with ``starttls=False`` and no
+username.
+"""
+
+import base64
+import glob
+import heapq
+import html
+import os
+import queue
+import re
+import smtplib
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from email.parser import BytesHeaderParser
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate
+
+import metrics
+from paths import data_dir
+from report import EncodedImages, readings_text
+
+SmtpSettings = namedtuple("SmtpSettings",
+                          ["host", "port", "sender", "username", "password", "starttls", "timeout"])
+
+DEFAULT_SETTINGS = SmtpSettings(
+    host="smtp.example.com",  # Replace with your SMTP server
+    port=587,
+    sender="your-email@example.com",  # Replace with your email
+    username="your-email@example.com",
+    password="your-password",  # Replace with your password
+    starttls=True,
+    timeout=30,
+)
+
+QUEUED, SENT, RETRYING, FAILED = "queued", "sent", "retrying", "failed"
+CID_DOMAIN = "cannabis-diagnosis"
+
+
+def default_spool_dir():
+    return data_dir("outbox")
+
+
+def build_message(sender, recipient, subject, body):
+    message = MIMEMultipart()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.attach(MIMEText(body, "plain"))
+    return message.as_bytes()
+
+
+def encode_body(data):
+    return base64.encodebytes(data).replace(b"\n", b"\r\n")
+
+
+def header_value(value):
+    if "\r" in value or "\n" in value:
+        raise ValueError(f"Line break in email header: {value!r}")
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+class ImageParts:
+    """Base64 MIME parts of the result thumbnails, encoded once and reused by every message."""
+
+    def __init__(self, images=None):
+        self.images = images  # report.EncodedImages, created on first use
+        self.parts = {}  # image name -> (content id, part bytes), or None when the image is unavailable
+
+    def get(self, name):
+        if name not in self.parts:
+            if self.images is None:
+                self.images = EncodedImages()
+            data = self.images.jpeg(name)
+            if data is None:
+                self.parts[name] = None
+            else:
+                content_id = re.sub(r"[^0-9A-Za-z.-]+", "-", name) + "@" + CID_DOMAIN
+                self.parts[name] = content_id, (
+                    f'Content-Type: image/jpeg; name="{name}"\r\n'
+                    "Content-Transfer-Encoding: base64\r\n"
+                    f"Content-ID: <{content_id}>\r\n"
+                    f'Content-Disposition: inline; filename="{name}"\r\n\r\n'
+                ).encode("ascii") + encode_body(data)
+        return self.parts[name]
+
+
+_image_parts = None
+
+
+def default_image_parts():
+    global _image_parts
+    if _image_parts is None:
+        _image_parts = ImageParts()
+    return _image_parts
+
+
+def results_text(report):
+    lines = [f"Plant Stage: {report.stage.capitalize()}"]
+    lines += readings_text(report)
+    body = "\n".join(lines) + "\n\n"
+    return body + "".join(f"{diagnosis.name}:\n{diagnosis.solution}\n\n" for diagnosis in report.diagnoses)
+
+
+def results_html(report, content_ids):
+    rows = []
+    for diagnosis in report.diagnoses:
+        content_id = content_ids.get(diagnosis.image)
+        image = (f'<td><img src="cid:{content_id}" width="150" height="100" alt="{html.escape(diagnosis.name)}">'
+                 "</td>" if content_id else "<td></td>")
+        rows.append(f'<tr>{image}<td valign="top"><b>{html.escape(diagnosis.name)}</b><br>'
+                    f"{html.escape(diagnosis.solution)}</td></tr>")
+    readings = "".join(f"<p>{html.escape(line)}</p>" for line in readings_text(report))
+    return ("<!DOCTYPE html><html><body style=\"font-family: Helvetica, Arial, sans-serif\">"
+            f"<h2>Cannabis Plant Diagnosis Results</h2><p>Plant Stage: {html.escape(report.stage.capitalize())}</p>"
+            f"{readings}<table cellpadding=\"6\">{''.join(rows) or '<tr><td>No problems found.</td></tr>'}</table>"
+            "</body></html>")
+
+
+def build_results_message(sender, recipient, subject, report, image_parts=None):
+    """Format a report.PlantReport as a multipart/related HTML email with a plain-text alternative."""
+    image_parts = image_parts or default_image_parts()
+    content_ids, attached = {}, []
+    for diagnosis in report.diagnoses:
+        if diagnosis.image and diagnosis.image not in content_ids:
+            part = image_parts.get(diagnosis.image)
+            if part is not None:
+                content_ids[diagnosis.image] = part[0]
+                attached.append(part[1])
+    token = uuid.uuid4().hex
+    related, alternative = "=_related_" + token, "=_alternative_" + token
+    text = encode_body(results_text(report).encode("utf-8"))
+    body = encode_body(results_html(report, content_ids).encode("utf-8"))
+    head = (
+        f"From: {header_value(sender)}\r\nTo: {header_value(recipient)}\r\n"
+        f"Subject: {header_value(subject)}\r\nDate: {formatdate(localtime=True)}\r\nMIME-Version: 1.0\r\n"
+        f'Content-Type: multipart/related; type="multipart/alternative"; boundary="{related}"\r\n\r\n'
+        f"--{related}\r\n"
+        f'Content-Type: multipart/alternative; boundary="{alternative}"\r\n\r\n'
+        f"--{alternative}\r\n"
+        'Content-Type: text/plain; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+    ).encode("ascii")
+    middle = (f"--{alternative}\r\n"
+              'Content-Type: text/html; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n')
+    parts = [head, text, middle.encode("ascii"), body, f"--{alternative}--\r\n".encode("ascii")]
+    for part in attached:
+        parts += [f"--{related}\r\n".encode("ascii"), part]
+    parts.append(f"--{related}--\r\n".encode("ascii"))
+    return b"".join(parts)
+
+
+def is_permanent(error):
+    # 5xx replies (bad recipient, rejected content, auth refused) will not succeed on retry; 4xx ones may.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class Outbox:
+    def __init__(self, settings=DEFAULT_SETTINGS, spool_dir=None, max_attempts=5, backoff=2.0,
+                 max_backoff=300.0, idle_timeout=60.0):
+        self.settings = settings
+        self.spool_dir = spool_dir or default_spool_dir()
+        self.failed_dir = os.path.join(self.spool_dir, "failed")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self.statuses = queue.Queue()
+
+        self._incoming = queue.Queue()
+        self._retries = []  # heap of (due time, message id, attempts)
+        self._smtp = None
+        self._last_used = 0.0
+        self._stopping = threading.Event()
+        self._thread = None
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+    def start(self):
+        if self._thread is None:
+            # Anything left in the spool from a previous run is delivered first.
+            for message_id in self.spooled():
+                self._incoming.put((message_id, 0))
+            self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._incoming.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def spooled(self):
+        paths = sorted(glob.glob(os.path.join(self.spool_dir, "*.eml")))
+        return [os.path.basename(path)[:-4] for path in paths]
+
+    def send(self, recipient, subject, body):
+        return self.send_raw(recipient, build_message(self.settings.sender, recipient, subject, body))
+
+    def send_results(self, recipient, subject, report):
+        """Queue the rich HTML results email for a report.PlantReport."""
+        return self.send_raw(recipient, build_results_message(self.settings.sender, recipient, subject, report))
+
+    def send_raw(self, recipient, message_bytes):
+        """Spool an already formatted message for ``recipient`` and return its message id."""
+        message_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        fd, tmp = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(message_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._spool_path(message_id))
+        self._report(message_id, QUEUED, recipient)
+        self._incoming.put((message_id, 0))
+        return message_id
+
+    def poll_statuses(self):
+        """Return every (message id, state, detail) reported since the last call. Safe to call from the UI thread."""
+        statuses = []
+        while True:
+            try:
+                statuses.append(self.statuses.get_nowait())
+            except queue.Empty:
+                return statuses
+
+    def _spool_path(self, message_id):
+        return os.path.join(self.spool_dir, f"{message_id}.eml")
+
+    def _report(self, message_id, state, detail=""):
+        self.statuses.put((message_id, state, detail))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            timeout = self.idle_timeout
+            if self._retries:
+                timeout = min(timeout, max(0.0, self._retries[0][0] - time.monotonic()))
+            try:
+                item = self._incoming.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is None:
+                item = self._due_retry()
+            if item is None:
+                if self._smtp is not None and time.monotonic() - self._last_used >= self.idle_timeout:
+                    self._disconnect()
+                continue
+            self._deliver(*item)
+        self._disconnect()
+
+    def _due_retry(self):
+        if self._retries and self._retries[0][0] <= time.monotonic():
+            _, message_id, attempts = heapq.heappop(self._retries)
+            return message_id, attempts
+        return None
+
+    def _deliver(self, message_id, attempts):
+        path = self._spool_path(message_id)
+        try:
+            with open(path, "rb") as f:
+                message_bytes = f.read()
+        except FileNotFoundError:
+            return  # already delivered by an earlier attempt
+        recipient = BytesHeaderParser().parsebytes(message_bytes)["To"]
+        try:
+            self._sendmail(recipient, message_bytes)
+        except Exception as e:
+            self._disconnect()
+            attempts += 1
+            if is_permanent(e) or attempts >= self.max_attempts:
+                os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+                self._report(message_id, FAILED, str(e))
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                heapq.heappush(self._retries, (time.monotonic() + delay, message_id, attempts))
+                self._report(message_id, RETRYING, f"{e} (retrying in {delay:g}s)")
+            return
+        os.remove(path)
+        self._report(message_id, SENT, recipient)
+
+    @metrics.timed("smtp_send")
+    def _sendmail(self, recipient, message_bytes):
+        try:
+            self._connection().sendmail(self.settings.sender, [recipient], message_bytes)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped our idle session; reconnect once before counting a failed attempt.
+            self._disconnect()
+            self._connection().sendmail(self.settings.sender, [recipient], message_bytes)
+        self._last_used = time.monotonic()
+
+    def _connection(self):
+        if self._smtp is None:
+            settings = self.settings
+            smtp = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+            try:
+                if settings.starttls:
+                    smtp.starttls()
+                if settings.username:
+                    smtp.login(settings.username, settings.password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
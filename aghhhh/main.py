@@ -1,26 +1,119 @@
+import argparse
+import glob
+import os
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-from PIL import Image, ImageTk
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from tkinter import ttk, messagebox
+
+import metrics
+from assets import image_path
+from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, PHOTO_CHECK, diagnose, reload_if_changed
+from thumbnails import ThumbnailCache, QUESTION_SIZE, draft
+from prefetch import ImagePrefetcher, DEFAULT_BUDGET
+from paths import data_dir
+from views import ViewSwitcher
+from journal import SessionJournal
+from planner import QuestionPlanner, priors_from_history
+from readings import parse_npk, parse_ph
+
+# PIL is imported by the thumbnail cache on the first image that needs rendering, and
+# the SMTP/email and results window modules are imported when first used.
+
+BUTTON_PACK = {"side": tk.LEFT, "padx": 10, "pady": 10}
+ENTRY_PACK = {"side": tk.LEFT, "padx": 5}
+INPUT_VIEWS = {"stage": "stage", "npk_input": "npk", "ph_input": "ph", "cal_mag": "yes_no", "image_check": "yes_no"}
+PREFETCH_AHEAD = 3  # number of upcoming questions whose images are decoded in the background
+OUTBOX_POLL_MS = 500
+IMAGE_POLL_MS = 30  # how often a draft image checks whether its full rendition is ready
+CATALOG_POLL_MS = 2000  # how often catalog.json is checked for edits
+MATCH_DISTANCE = 0.35  # reference photos closer than this to an uploaded leaf photo are offered for comparison
 
 
 class CannabisDiagnosisApp:
-    def __init__(self, root):
+    def __init__(self, root, image_budget=DEFAULT_BUDGET, plant_id=None, room_id=None, adaptive=True,
+                 sensors=None, room=None):
         self.root = root
         self.root.title("Cannabis Plant Diagnosis Tool")
         self.root.configure(background="#0d0d0d")  # Set background color to #0d0d0d
 
         self.current_question = 0
-        self.responses = []
+        self.deficiency_index = 0
+        self.answers = {}
         self.diagnoses = []
-        self.email_list = []
         self.life_stage = ""
+        self.plant_id = plant_id
+        self.room_id = room_id or (room.room_id if room is not None else None)
+        self.sensors = sensors
+        self.room = room
+        self.room_report = None
+        self.history_priors = {}
+        self.photo_scores = {}
+        self.photo_matches = {}
+        self.questions = QUESTIONS + [PHOTO_CHECK]
+        self.deficiency_images = []  # filled with the references an uploaded photo matches, closest first
+        self.shown = None  # (question id, time it was put on screen), for dwell metrics
+        self.image_generation = 0  # bumped whenever the image area changes hands; stale swaps see a newer value
+        self.image_swap = None
+        self.planner = QuestionPlanner(self.questions, deficiency_checks=self.deficiency_images) if adaptive else None
+        self.thumbnails = ThumbnailCache()
+        self.prefetcher = ImagePrefetcher(self.thumbnails, budget_bytes=image_budget)
+        self.outbox = None
+        self.journal = SessionJournal()
+        self.restore_session()
+        if room is not None:
+            self.answers = dict(room.inherited(), **self.answers)
 
         self.setup_styles()
         self.create_widgets()
         self.load_question()
+        self.root.after(OUTBOX_POLL_MS, self.resume_outbox)
+        self.root.after(CATALOG_POLL_MS, self.poll_catalog)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after_idle(self.check_assets)
+        if self.planner is not None:
+            self.root.after_idle(self.load_priors)
+
+    def check_assets(self):
+        # Name images the catalog refers to but images/ lacks, before a question needs one.
+        from assets import manifest, referenced_images
+
+        missing = manifest().missing(referenced_images())
+        if missing:
+            messagebox.showwarning("Missing Images", "These images are not in the images folder:\n" +
+                                   "\n".join(missing))
+
+    def load_priors(self):
+        # Ask the questions we are least sure about first, based on past sessions.
+        from history import HistoryStore
+
+        history = HistoryStore()
+        try:
+            self.planner.priors = self.history_priors = priors_from_history(history)
+        finally:
+            history.close()
+
+    def restore_session(self):
+        # Pick up where an interrupted run left off, straight from the journal.
+        state = self.journal.resume()
+        if state is not None:
+            self.answers = state.answers
+            self.life_stage = self.answers.get("stage", "")
+            self.current_question = state.current_question
+            self.deficiency_index = state.deficiency_index
+            if self.questions[self.current_question:] == [PHOTO_CHECK]:
+                # Stopped in the photo comparison; the matches are not kept, so move on.
+                self.deficiency_index = 0
+                self.advance()
+
+    def close(self):
+        if metrics.enabled and self.current_question < len(self.questions):
+            question_id = self.shown[0] if self.shown else self.questions[self.current_question].id
+            metrics.abandoned.labels(question_id).inc()
+        if self.sensors is not None:
+            self.sensors.stop(timeout=1)
+        self.journal.close()
+        self.prefetcher.shutdown()
+        self.root.destroy()
 
     def setup_styles(self):
         style = ttk.Style()
@@ -39,6 +132,9 @@ class CannabisDiagnosisApp:
         self.main_frame = ttk.Frame(self.root, padding="20")
         self.main_frame.pack(fill="both", expand=True)
 
+        if self.room is not None:
+            self.build_room_bar()
+
         self.question_label = ttk.Label(self.main_frame, text="", wraplength=500)
         self.question_label.pack(pady=10)
 
@@ -46,370 +142,490 @@ class CannabisDiagnosisApp:
         self.image_label.pack(pady=10)
 
         self.entry = ttk.Entry(self.main_frame)
-        self.npk_entry = [ttk.Entry(self.main_frame) for _ in range(3)]
 
-        self.ph_frame = ttk.Frame(self.main_frame, style="TFrame")
+        self.views = ViewSwitcher(self.main_frame, {
+            "yes_no": self.build_yes_no,
+            "stage": self.build_stage,
+            "npk": self.build_npk,
+            "ph": self.build_ph,
+        })
+        self.views.frame.pack(pady=20)
+
+        self.photo_button = ttk.Button(self.main_frame, text="Analyse a Leaf Photo...", command=self.upload_leaf_photo)
+        self.photo_button.pack(pady=5)
+
+    def build_room_bar(self):
+        bar = ttk.Frame(self.main_frame)
+        bar.pack(fill="x")
+        ttk.Label(bar, text="Plant:", style="TLabel").pack(side=tk.LEFT)
+        self.plant_entry = ttk.Entry(bar, width=16, style="TEntry")
+        self.plant_entry.insert(0, self.plant_id or self.room.next_plant_id())
+        self.plant_entry.pack(**ENTRY_PACK)
+        ttk.Button(bar, text="Room Report", command=self.show_room_report).pack(**BUTTON_PACK)
+        self.room_status = ttk.Label(bar, text="", style="TLabel")
+        self.room_status.pack(side=tk.LEFT)
+
+    # Each input view is built into its own frame the first time a question needs it.
+    def build_yes_no(self, frame):
+        self.yes_button = ttk.Button(frame, text="Yes", command=lambda: self.record_response("yes"))
+        self.no_button = ttk.Button(frame, text="No", command=lambda: self.record_response("no"))
+        self.not_sure_button = ttk.Button(frame, text="Not Sure", command=lambda: self.record_response("not_sure"))
+        self.na_button = ttk.Button(frame, text="Not Applicable",
+                                    command=lambda: self.record_response("not_applicable"))
+        for button in (self.yes_button, self.no_button, self.not_sure_button):
+            button.pack(**BUTTON_PACK)
+
+    def build_stage(self, frame):
+        self.seedling_button = ttk.Button(frame, text="Seedling", command=lambda: self.record_response("seedling"))
+        self.veg_button = ttk.Button(frame, text="Vegetative", command=lambda: self.record_response("vegetative"))
+        self.flower_button = ttk.Button(frame, text="Flowering", command=lambda: self.record_response("flowering"))
+        for button in (self.seedling_button, self.veg_button, self.flower_button):
+            button.pack(**BUTTON_PACK)
+
+    def build_submit_buttons(self, frame):
+        ttk.Button(frame, text="Submit", command=self.submit_input).pack(**BUTTON_PACK)
+        ttk.Button(frame, text="Not Sure", command=lambda: self.record_response("not_sure")).pack(**BUTTON_PACK)
+
+    def build_npk(self, frame):
+        self.npk_entry = [ttk.Entry(frame) for _ in range(3)]
+        for entry in self.npk_entry:
+            entry.pack(**ENTRY_PACK)
+        self.build_submit_buttons(frame)
+
+    def build_ph(self, frame):
+        self.ph_frame = ttk.Frame(frame, style="TFrame")
+        self.ph_frame.pack()
         self.water_ph_label = ttk.Label(self.ph_frame, text="Water pH:", style="TLabel")
         self.water_ph_entry = ttk.Entry(self.ph_frame, style="TEntry")
         self.soil_ph_label = ttk.Label(self.ph_frame, text="Soil pH:", style="TLabel")
         self.soil_ph_entry = ttk.Entry(self.ph_frame, style="TEntry")
+        for widget in (self.water_ph_label, self.water_ph_entry, self.soil_ph_label, self.soil_ph_entry):
+            widget.pack(**ENTRY_PACK)
+        buttons = ttk.Frame(frame)
+        buttons.pack()
+        self.build_submit_buttons(buttons)
 
-        self.button_frame = ttk.Frame(self.main_frame)
-        self.button_frame.pack(pady=20)
-
-        self.create_buttons()
-
-        self.questions = [
-            ("What stage of growth is your plant in? (Seedling, Vegetative, Flowering)", None, "stage"),
-            ("Is your plant drooping?", "drooping.jpg"),
-            ("Are the leaves yellowing?", "yellowing_leaves.jpg"),
-            ("Are the leaves curling?", "curling_leaves.jpg"),
-            ("Are there brown spots on the leaves?", "brown_spots.jpg"),
-            ("Are the leaves turning purple?", "purple_leaves.jpg"),
-            ("Is the growth stunted?", "stunted_growth.jpg"),
-            ("Do you see pests on the plant?", "pests.jpg"),
-            ("Are there whiteflies on the plant?", "whiteflies.jpg"),
-            ("Are there spider mites on the plant?", "spider_mites.jpg"),
-            ("Are there aphids on the plant?", "aphids.jpg"),
-            ("Are there thrips on the plant?", "thrips.jpg"),
-            ("Do the leaves have powdery mildew?", "powdery_mildew.jpg"),
-            ("Is there bud rot (gray mold) on the plant?", "bud_rot.jpg"),
-            ("Are there signs of root rot?", "root_rot.jpg"),
-            ("What is your fertilizer NPK? (Enter N, P, and K values)", None, "npk_input"),
-            ("What is the pH of the water and soil? (Enter water pH and soil pH)", None, "ph_input"),
-            ("Is the temperature in the grow space above 85°F (30°C)?", None),
-            ("Is the temperature in the grow space below 70°F (20°C)?", None),
-            ("Is the relative humidity above 60%?", None),
-            ("Is the relative humidity below 40%?", None),
-            ("Are you using cannabis-specific nutrients?", "cannabis_nutrients.jpg"),
-            ("Are you using reverse osmosis (RO) water?", "ro_water.jpg", "cal_mag"),
-            ("Are you using coco coir as a growing medium?", "coco_coir.jpg", "cal_mag"),
-        ]
-
-        self.deficiency_images = [
-            ("Nitrogen deficiency", "nitrogen_deficiency.jpg"),
-            ("Potassium deficiency", "potassium_deficiency.jpg"),
-            ("Magnesium deficiency", "magnesium_deficiency.jpg"),
-            ("Phosphorus deficiency", "phosphorus_deficiency.jpg")
-        ]
-
-    def create_buttons(self):
-        self.yes_button = ttk.Button(self.button_frame, text="Yes", command=lambda: self.record_response("yes"))
-        self.no_button = ttk.Button(self.button_frame, text="No", command=lambda: self.record_response("no"))
-        self.not_sure_button = ttk.Button(self.button_frame, text="Not Sure",
-                                          command=lambda: self.record_response("not_sure"))
-        self.na_button = ttk.Button(self.button_frame, text="Not Applicable",
-                                    command=lambda: self.record_response("not_applicable"))
-
-        self.seedling_button = ttk.Button(self.button_frame, text="Seedling",
-                                          command=lambda: self.record_response("seedling"))
-        self.veg_button = ttk.Button(self.button_frame, text="Vegetative",
-                                     command=lambda: self.record_response("vegetative"))
-        self.flower_button = ttk.Button(self.button_frame, text="Flowering",
-                                        command=lambda: self.record_response("flowering"))
-
-        self.submit_button = ttk.Button(self.button_frame, text="Submit", command=self.submit_input)
-
+    @metrics.timed("load_question")
     def load_question(self):
-        self.hide_buttons()  # Hide all buttons initially
-        self.hide_inputs()  # Hide all input fields initially
+        self.cancel_image_swap()
         if self.current_question < len(self.questions):
-            question, image_path, *input_type = self.questions[self.current_question]
-            self.question_label.config(text=question)
-            if image_path:
-                self.load_image(image_path)
+            question = self.questions[self.current_question]
+            text = question.text
+            if question.id in self.photo_scores:
+                text += f"\n\nFrom your photo: {self.photo_scores[question.id]:.0%} likely"
+            self.question_label.config(text=text)
+            if question.input_type != "image_check":
+                self.mark_shown(question.id)
+            if question.image:
+                self.load_image(question.image)
                 self.show_buttons()
-            elif input_type:
+            elif question.input_type:
                 self.image_label.config(image='', text='')
-                if input_type[0] == "stage":
-                    self.seedling_button.pack(side=tk.LEFT, padx=10, pady=10)
-                    self.veg_button.pack(side=tk.LEFT, padx=10, pady=10)
-                    self.flower_button.pack(side=tk.LEFT, padx=10, pady=10)
-                elif input_type[0] == "npk_input":
-                    for entry in self.npk_entry:
-                        entry.pack(side=tk.LEFT, padx=5)
-                    self.submit_button.pack(side=tk.LEFT, padx=10, pady=10)
-                    self.not_sure_button.pack(side=tk.LEFT, padx=10, pady=10)
-                elif input_type[0] == "ph_input":
-                    self.ph_frame.pack()
-                    self.water_ph_label.pack(side=tk.LEFT, padx=5)
-                    self.water_ph_entry.pack(side=tk.LEFT, padx=5)
-                    self.soil_ph_label.pack(side=tk.LEFT, padx=5)
-                    self.soil_ph_entry.pack(side=tk.LEFT, padx=5)
-                    self.submit_button.pack(side=tk.LEFT, padx=10, pady=10)
-                    self.not_sure_button.pack(side=tk.LEFT, padx=10, pady=10)
-                elif input_type[0] == "image_check":
+                if question.input_type == "image_check":
                     self.show_deficiency_image()
-                elif input_type[0] == "cal_mag":
-                    self.show_cal_mag_buttons()
+                else:
+                    self.views.show(INPUT_VIEWS[question.input_type])
+                    if question.input_type == "ph_input" and self.room is not None:
+                        self.show_room_water_ph()
             else:
                 self.image_label.config(image='', text='')
                 self.show_buttons()
+            self.prefetch_upcoming()
         else:
+            self.hide_inputs()
+            if metrics.enabled:
+                metrics.completed.labels().inc()
+            self.journal.finish()
+            if self.room is not None:
+                self.plant_id = self.plant_entry.get().strip() or self.room.next_plant_id()
             self.evaluate_responses()
-            self.show_results()
+            self.save_history()
+            if self.room is None:
+                self.show_results()
+            else:
+                self.next_plant()
+
+    def prefetch_upcoming(self):
+        if self.planner is None:
+            upcoming = self.questions[self.current_question + 1:self.current_question + 1 + PREFETCH_AHEAD]
+        else:
+            answers = dict(self.answers, **{self.questions[self.current_question].id: "no"})
+            upcoming = [self.questions[position] for position in self.planner.likely_path(answers, PREFETCH_AHEAD)]
+        names = [question.image for question in upcoming if question.image]
+        if any(question.input_type == "image_check" for question in upcoming):
+            names += [deficiency.image for deficiency in self.deficiency_images]
+        self.prefetcher.prefetch(names, QUESTION_SIZE)
 
     def hide_inputs(self):
-        self.entry.pack_forget()
-        for entry in self.npk_entry:
-            entry.pack_forget()
-        self.ph_frame.pack_forget()
-        self.water_ph_label.pack_forget()
-        self.water_ph_entry.pack_forget()
-        self.soil_ph_label.pack_forget()
-        self.soil_ph_entry.pack_forget()
-        self.submit_button.pack_forget()
-        self.na_button.pack_forget()
-        self.seedling_button.pack_forget()
-        self.veg_button.pack_forget()
-        self.flower_button.pack_forget()
+        self.views.hide()
 
+    @metrics.timed("evaluate_responses")
     def evaluate_responses(self):
-        self.diagnoses.clear()
-        # Check each response and append corresponding diagnoses with solutions and images
-        if len(self.responses) > 1 and self.responses[1] == "yes":
-            self.diagnoses.append(("Drooping",
-                                   "Check for overwatering or underwatering. Adjust watering schedule accordingly.",
-                                   "drooping.jpg"))
-        if len(self.responses) > 2 and self.responses[2] == "yes":
-            self.diagnoses.append(("Yellowing Leaves",
-                                   "Possible nitrogen deficiency. Natural solution: Compost tea. Chemical solution: Nitrogen-rich fertilizer.",
-                                   "yellowing_leaves.jpg"))
-        if len(self.responses) > 3 and self.responses[3] == "yes":
-            self.diagnoses.append(("Curling Leaves",
-                                   "Check for heat stress or overfeeding. Adjust light distance and nutrient levels.",
-                                   "curling_leaves.jpg"))
-        if len(self.responses) > 4 and self.responses[4] == "yes":
-            self.diagnoses.append(("Brown Spots",
-                                   "Possible calcium or magnesium deficiency. Natural solution: Epsom salts. Chemical solution: Cal-Mag supplement.",
-                                   "brown_spots.jpg"))
-        if len(self.responses) > 5 and self.responses[5] == "yes":
-            self.diagnoses.append(("Purple Leaves",
-                                   "Could be due to genetics or phosphorus deficiency. Ensure proper phosphorus levels.",
-                                   "purple_leaves.jpg"))
-        if len(self.responses) > 6 and self.responses[6] == "yes":
-            self.diagnoses.append(("Stunted Growth",
-                                   "Check for root-bound plants or nutrient deficiencies. Repot if necessary, and adjust feeding schedule.",
-                                   "stunted_growth.jpg"))
-        if len(self.responses) > 7 and self.responses[7] == "yes":
-            self.diagnoses.append(("Pests",
-                                   "Identify the pest and treat accordingly. Natural solution: Neem oil. Chemical solution: Insecticidal soap.",
-                                   "pests.jpg"))
-        if len(self.responses) > 8 and self.responses[8] == "yes":
-            self.diagnoses.append(
-                ("Whiteflies", "Treat with yellow sticky traps and insecticidal soap.", "whiteflies.jpg"))
-        if len(self.responses) > 9 and self.responses[9] == "yes":
-            self.diagnoses.append(("Spider Mites",
-                                   "Increase humidity and treat with miticides. Natural solution: Neem oil.",
-                                   "spider_mites.jpg"))
-        if len(self.responses) > 10 and self.responses[10] == "yes":
-            self.diagnoses.append(
-                ("Aphids", "Natural solution: Ladybugs. Chemical solution: Insecticidal soap.", "aphids.jpg"))
-        if len(self.responses) > 11 and self.responses[11] == "yes":
-            self.diagnoses.append(("Thrips", "Use blue sticky traps and insecticidal soap.", "thrips.jpg"))
-        if len(self.responses) > 12 and self.responses[12] == "yes":
-            self.diagnoses.append(("Powdery Mildew",
-                                   "Increase air circulation and treat with fungicides. Natural solution: Milk spray.",
-                                   "powdery_mildew.jpg"))
-        if len(self.responses) > 13 and self.responses[13] == "yes":
-            self.diagnoses.append(("Bud Rot", "Remove affected buds and increase air circulation.", "bud_rot.jpg"))
-        if len(self.responses) > 14 and self.responses[14] == "yes":
-            self.diagnoses.append(("Root Rot",
-                                   "Check for overwatering and ensure proper drainage. Treat with beneficial bacteria.",
-                                   "root_rot.jpg"))
-
-    def load_image(self, image_path):
+        self.diagnoses = diagnose(self.answers)
+
+    def save_history(self):
+        from history import HistoryStore
+
+        history = HistoryStore()
         try:
-            image = Image.open(f"images/{image_path}")
-            image = image.resize((300, 200), Image.LANCZOS)  # Use LANCZOS instead of ANTIALIAS
-            photo = ImageTk.PhotoImage(image)
-            self.image_label.config(image=photo)
-            self.image_label.image = photo
+            history.record_session(self.answers, self.diagnoses, self.plant_id, self.room_id)
+        finally:
+            history.close()
+
+    def upload_leaf_photo(self):
+        from tkinter import filedialog
+        from leafcolor import analyse, confidences
+        from refindex import ReferenceIndex
+
+        path = filedialog.askopenfilename(title="Choose a leaf photo",
+                                          filetypes=[("Photos", "*.jpg *.jpeg *.png *.webp"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            self.photo_scores = confidences(analyse(path))
+            distances = ReferenceIndex.load().label_distances(path)
+            self.photo_matches = {label: distance for label, distance in distances.items()
+                                  if distance <= MATCH_DISTANCE}
+        except Exception as e:
+            messagebox.showerror("Photo Error", f"Could not analyse the photo: {e}")
+            return
+        if self.planner is not None:
+            # The photo stands in for the history-based "yes" rate of the questions it scores.
+            self.planner.priors = dict(self.planner.priors, **{
+                question_id: min(0.95, max(0.05, score)) for question_id, score in self.photo_scores.items()})
+        if self.deficiency_index == 0:
+            # Offer the closest deficiency references for comparison, nearest first.
+            self.deficiency_images[:] = sorted(
+                (check for check in DEFICIENCY_CHECKS
+                 if check.id in self.photo_matches and check.id not in self.answers),
+                key=lambda check: self.photo_matches[check.id])
+        if self.current_question < len(self.questions):
+            self.load_question()
+
+    @metrics.timed("load_image")
+    def load_image(self, image_name):
+        self.cancel_image_swap()
+        try:
+            data = self.prefetcher.cache.get((image_name, QUESTION_SIZE))
+            if data is None:
+                data = self.thumbnails.cached(image_path(image_name), QUESTION_SIZE)
+            if data is None:
+                # Not rendered yet: show a reduced decode now and swap in the full rendition once a worker has it.
+                data = draft(image_path(image_name), QUESTION_SIZE)
+                future = self.prefetcher.request(image_name, QUESTION_SIZE)
+                self.image_swap = self.root.after(IMAGE_POLL_MS, self.swap_image, self.image_generation, future)
+            self.show_image(data)
         except FileNotFoundError:
             self.image_label.config(image='', text='Image not found.')
         except Exception as e:
             self.image_label.config(image='', text=f'Error loading image: {e}')
 
+    def show_image(self, data):
+        photo = tk.PhotoImage(data=data)
+        self.image_label.config(image=photo)
+        self.image_label.image = photo
+
+    def cancel_image_swap(self):
+        self.image_generation += 1
+        if self.image_swap is not None:
+            self.root.after_cancel(self.image_swap)
+            self.image_swap = None
+
+    def swap_image(self, generation, future):
+        self.image_swap = None
+        if generation != self.image_generation:
+            return  # the user has moved on to another image or question
+        if not future.done():
+            self.image_swap = self.root.after(IMAGE_POLL_MS, self.swap_image, generation, future)
+            return
+        try:
+            data = future.result()
+        except Exception:
+            return  # the full render failed; the draft stays
+        self.show_image(data)
+
     def record_response(self, response):
+        self.mark_answered()
         if self.current_question == 0:
+            question_id = "stage"
             self.life_stage = response.lower()
-            self.responses.append(response)
-        elif self.current_question < len(self.questions) and len(self.questions[self.current_question]) > 2 and \
-                self.questions[self.current_question][2] == "image_check":
-            if response == "yes":
-                self.diagnoses.append(f"Possible {self.deficiency_images[self.deficiency_index][0]}")
+            self.answers[question_id] = self.life_stage
+        elif self.current_question < len(self.questions) and \
+                self.questions[self.current_question].input_type == "image_check":
+            question_id = self.deficiency_images[self.deficiency_index].id
+            self.answers[question_id] = response
             self.deficiency_index += 1
             if self.deficiency_index < len(self.deficiency_images):
+                self.journal_answer(question_id)
                 self.show_deficiency_image()
                 return
             else:
                 self.deficiency_index = 0  # Reset for future use
         else:
-            self.responses.append(response)
-        self.current_question += 1
+            question_id = self.questions[self.current_question].id
+            self.answers[question_id] = response
+        self.advance()
+        self.journal_answer(question_id)
         self.load_question()
 
+    def advance(self):
+        self.prefill_climate()
+        if self.planner is None:
+            self.current_question += 1
+            while self.current_question < len(self.questions) and self.skip(self.questions[self.current_question]):
+                self.current_question += 1
+            return
+        # The planner skips questions that can no longer change the diagnosis.
+        position = self.planner.next_question(self.answers)
+        self.current_question = len(self.questions) if position is None else position
+
+    def skip(self, question):
+        # Answered from the sensors, or a photo comparison with no matching reference photos.
+        if question.input_type == "image_check":
+            return not self.deficiency_images
+        return question.id in self.answers
+
+    def prefill_climate(self):
+        # Climate questions the sensor readings already settle are answered without asking.
+        if self.sensors is None:
+            return
+        for question_id, answer in self.sensors.climate_answers().items():
+            if question_id not in self.answers:
+                self.answers[question_id] = answer
+                self.journal_answer(question_id)
+
+    def mark_shown(self, question_id):
+        self.shown = (question_id, time.monotonic())
+
+    def mark_answered(self):
+        if metrics.enabled and self.shown is not None:
+            metrics.dwell.labels(self.shown[0]).observe(time.monotonic() - self.shown[1])
+
+    def journal_answer(self, question_id):
+        self.journal.record(question_id, self.answers[question_id], self.current_question, self.deficiency_index)
+
     def show_deficiency_image(self):
-        deficiency_name, image_path = self.deficiency_images[self.deficiency_index]
-        self.question_label.config(text=f"Does this photo look like your leaves? ({deficiency_name})")
-        self.load_image(image_path)
+        deficiency = self.deficiency_images[self.deficiency_index]
+        text = f"Does this photo look like your leaves? ({deficiency.text})"
+        if deficiency.id in self.photo_matches:
+            text += "\n\nThis reference is close to the photo you uploaded."
+        self.question_label.config(text=text)
+        self.mark_shown(deficiency.id)
+        self.load_image(deficiency.image)
         self.show_buttons()
-        self.entry.pack_forget()
-        for entry in self.npk_entry:
-            entry.pack_forget()
-        self.ph_frame.pack_forget()
-        self.submit_button.pack_forget()
 
     def handle_not_sure(self):
-        self.responses.append("not_sure")
-        self.current_question += 1
+        question_id = self.questions[self.current_question].id
+        self.mark_answered()
+        self.answers[question_id] = "not_sure"
+        self.advance()
+        self.journal_answer(question_id)
         self.load_question()
 
     def submit_input(self):
         if self.current_question < len(self.questions):
+            question = self.questions[self.current_question]
             if self.current_question == 0:
                 response = self.entry.get().lower()
                 if response in ["seedling", "vegetative", "flowering"]:
                     self.life_stage = response
-                    self.responses.append(response)
+                    self.answers[question.id] = response
                     self.entry.delete(0, tk.END)
                 else:
                     messagebox.showwarning("Input required",
                                            "Please enter a valid life stage: Seedling, Vegetative, or Flowering.")
                     return
-            elif len(self.questions[self.current_question]) > 2 and self.questions[self.current_question][
-                2] == "npk_input":
+            elif question.input_type == "npk_input":
                 npk_values = [entry.get() for entry in self.npk_entry]
                 if all(npk_values):
-                    self.responses.append(" ".join(npk_values))
+                    try:
+                        self.answers[question.id] = parse_npk(*npk_values)
+                    except ValueError as e:
+                        messagebox.showwarning("Invalid value", str(e))
+                        return
                     for entry in self.npk_entry:
                         entry.delete(0, tk.END)
                 else:
                     messagebox.showwarning("Input required", "Please enter all NPK values.")
                     return
-            elif len(self.questions[self.current_question]) > 2 and self.questions[self.current_question][
-                2] == "ph_input":
+            elif question.input_type == "ph_input":
                 water_ph = self.water_ph_entry.get()
                 soil_ph = self.soil_ph_entry.get()
                 if water_ph and soil_ph:
-                    self.responses.append(f"Water pH: {water_ph}, Soil pH: {soil_ph}")
+                    try:
+                        self.answers[question.id] = parse_ph(water_ph, soil_ph)
+                    except ValueError as e:
+                        messagebox.showwarning("Invalid value", str(e))
+                        return
                     self.water_ph_entry.delete(0, tk.END)
                     self.soil_ph_entry.delete(0, tk.END)
                 else:
                     messagebox.showwarning("Input required", "Please enter both water pH and soil pH values.")
                     return
-            elif len(self.questions[self.current_question]) > 2 and self.questions[self.current_question][2] == "input":
+            elif question.input_type == "input":
                 response = self.entry.get()
                 if response:
-                    self.responses.append(response)
+                    self.answers[question.id] = response
                     self.entry.delete(0, tk.END)
                 else:
                     messagebox.showwarning("Input required", "Please enter a value.")
                     return
             else:
-                response = None
-                self.responses.append(response)
-            self.current_question += 1
+                self.answers[question.id] = None
+            self.mark_answered()
+            self.advance()
+            self.journal_answer(question.id)
             self.load_question()
 
     def show_buttons(self):
-        self.yes_button.pack(side=tk.LEFT, padx=10, pady=10)
-        self.no_button.pack(side=tk.LEFT, padx=10, pady=10)
-        self.not_sure_button.pack(side=tk.LEFT, padx=10, pady=10)
-
-    def hide_buttons(self):
-        self.yes_button.pack_forget()
-        self.no_button.pack_forget()
-        self.not_sure_button.pack_forget()
-        self.na_button.pack_forget()
+        self.views.show("yes_no")
 
+    @metrics.timed("show_results")
     def show_results(self):
-        result_window = tk.Toplevel(self.root)
-        result_window.title("Diagnosis Results")
-        result_window.configure(background="#0d0d0d")
-
-        result_frame = ttk.Frame(result_window, padding=20)
-        result_frame.pack(fill=tk.BOTH, expand=True)
-
-        diagnosis_label = ttk.Label(result_frame, text="Diagnosis:", style="TLabel")
-        diagnosis_label.grid(row=0, column=0, sticky="w")
-
-        result_textbox = scrolledtext.ScrolledText(result_frame, wrap=tk.WORD, width=80, height=20)
-        result_textbox.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
-
-        for index, (diagnosis, solution, image_filename) in enumerate(self.diagnoses):
-            diagnosis_text = f"{diagnosis}:\n{solution}\n\n"
-            result_textbox.insert(tk.END, diagnosis_text)
-
-            image_path = f"images/{image_filename}"
-            try:
-                image = Image.open(image_path)
-                image = image.resize((150, 100), Image.LANCZOS)  # Use LANCZOS instead of ANTIALIAS
-                photo = ImageTk.PhotoImage(image)
-                image_label = ttk.Label(result_frame, image=photo)
-                image_label.image = photo  # Keep a reference to avoid garbage collection
-                result_textbox.window_create(tk.END, window=image_label)
-                result_textbox.insert(tk.END, "\n\n")
-            except FileNotFoundError:
-                result_textbox.insert(tk.END, "Image not found.\n\n")
-            except Exception as e:
-                result_textbox.insert(tk.END, f"Error loading image: {e}\n\n")
-
-        result_textbox.configure(state="disabled")
-
-        stage_label = ttk.Label(result_frame, text="Plant Stage:", style="TLabel")
-        stage_label.grid(row=2, column=0, sticky="w")
-
-        stage_value_label = ttk.Label(result_frame, text=self.life_stage.capitalize(), style="TLabel")
-        stage_value_label.grid(row=2, column=1, sticky="w")
-
-        self.email_var = tk.BooleanVar()
-        email_checkbox = ttk.Checkbutton(result_frame, text="Send results via email", variable=self.email_var,
-                                         command=self.toggle_email_input, style="TCheckbutton")
-        email_checkbox.grid(row=3, columnspan=2, pady=10)
-
-        self.email_entry_label = ttk.Label(result_frame, text="Email:", style="TLabel")
-        self.email_entry = ttk.Entry(result_frame, style="TEntry")
-
-        email_button = ttk.Button(result_frame, text="Send Email",
-                                  command=lambda: self.send_email(result_textbox.get("1.0", tk.END)))
-        email_button.grid(row=5, columnspan=2)
-
-    def toggle_email_input(self):
-        if self.email_var.get():
-            self.email_entry_label.grid(row=4, column=0, sticky="w")
-            self.email_entry.grid(row=4, column=1, sticky="w")
+        from results import ResultsWindow
+
+        self.results_window = ResultsWindow(self)
+
+    def show_room_water_ph(self):
+        # The room's water pH is fixed once the first plant gave it; only the soil pH is asked.
+        if self.room.water_ph is None:
+            return
+        self.water_ph_entry.config(state="normal")
+        self.water_ph_entry.delete(0, tk.END)
+        self.water_ph_entry.insert(0, f"{self.room.water_ph:g}")
+        self.water_ph_entry.config(state="readonly")
+
+    def next_plant(self):
+        # Keep the finished plant as a compact record and start the next one with the room answers filled in.
+        plant = self.room.add_plant(self.plant_id, self.answers)
+        self.answers = self.room.inherited()
+        self.diagnoses = []
+        self.life_stage = ""
+        self.plant_id = None
+        self.current_question = 0
+        self.deficiency_index = 0
+        self.deficiency_images[:] = []
+        self.photo_scores = {}
+        self.photo_matches = {}
+        if self.planner is not None:
+            self.planner.priors = self.history_priors
+        self.plant_entry.delete(0, tk.END)
+        self.plant_entry.insert(0, self.room.next_plant_id())
+        issues = len(self.room.own_diagnoses(plant))
+        self.room_status.config(text=f"{len(self.room.plants)} done; {plant.plant_id}: "
+                                     f"{issues} issue{'s' if issues != 1 else ''}")
+        if self.room_report is not None and self.room_report.window.winfo_exists():
+            self.room_report.refresh()
+        self.load_question()
+
+    def show_room_report(self):
+        from roomreport import RoomReportWindow
+
+        if self.room_report is not None and self.room_report.window.winfo_exists():
+            self.room_report.refresh()
+            self.room_report.window.lift()
         else:
-            self.email_entry_label.grid_forget()
-            self.email_entry.grid_forget()
+            self.room_report = RoomReportWindow(self.root, self.room)
 
-    def send_email(self, diagnosis_text):
-        email_address = self.email_entry.get()
-        if not email_address:
-            messagebox.showwarning("Email Error", "Please provide an email address.")
+    def poll_catalog(self):
+        # Edits to catalog.json show up without restarting; a broken edit is reported once and ignored.
+        try:
+            if reload_if_changed():
+                self.apply_catalog()
+                self.check_assets()
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Catalog Not Reloaded", str(e))
+        self.root.after(CATALOG_POLL_MS, self.poll_catalog)
+
+    def apply_catalog(self):
+        if self.room is not None:
+            self.room.reindex()
+        if self.current_question >= len(self.questions):
+            self.questions[:] = QUESTIONS + [PHOTO_CHECK]
             return
+        current = self.questions[self.current_question].id
+        self.questions[:] = QUESTIONS + [PHOTO_CHECK]  # in place: the planner holds the same list
+        if self.planner is not None:
+            self.planner.refresh()
+        ids = [question.id for question in self.questions]
+        if current in ids:
+            self.current_question = ids.index(current)
+        else:
+            # The question on screen was removed; move on to whatever comes next.
+            self.current_question -= 1
+            self.advance()
+        self.load_question()
 
-        sender_email = "your-email@example.com"  # Replace with your email
-        sender_password = "your-password"  # Replace with your password
+    def get_outbox(self):
+        if self.outbox is None:
+            from mailer import Outbox
 
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = email_address
-        message["Subject"] = "Cannabis Plant Diagnosis Results"
+            self.outbox = Outbox().start()
+            self.root.after(OUTBOX_POLL_MS, self.poll_outbox)
+        return self.outbox
 
-        message.attach(MIMEText(diagnosis_text, "plain"))
+    def resume_outbox(self):
+        # Mail spooled by an earlier run is delivered without waiting for a new send.
+        if glob.glob(os.path.join(data_dir("outbox"), "*.eml")):
+            self.get_outbox()
 
-        try:
-            with smtplib.SMTP("smtp.example.com", 587) as server:  # Replace with your SMTP server
-                server.starttls()
-                server.login(sender_email, sender_password)
-                server.sendmail(sender_email, email_address, message.as_string())
-                messagebox.showinfo("Email Sent", "Diagnosis results sent successfully.")
-        except Exception as e:
-            messagebox.showerror("Email Error", f"An error occurred while sending the email: {str(e)}")
+    def poll_outbox(self):
+        from mailer import SENT, FAILED
+
+        for message_id, state, detail in self.outbox.poll_statuses():
+            if state == SENT:
+                messagebox.showinfo("Email Sent", f"Diagnosis results sent successfully to {detail}.")
+            elif state == FAILED:
+                messagebox.showerror("Email Error", f"An error occurred while sending the email: {detail}")
+        self.root.after(OUTBOX_POLL_MS, self.poll_outbox)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cannabis Plant Diagnosis Tool")
+    parser.add_argument("--plant", help="plant ID the diagnosis history is saved under")
+    parser.add_argument("--room", help="grow room ID the diagnosis history is saved under")
+    parser.add_argument("--all-questions", action="store_true",
+                        help="ask every question in order instead of only the ones that matter")
+    parser.add_argument("--sensor-csv", action="append", default=[], metavar="PATH",
+                        help="answer the climate questions from a temperature/humidity CSV log")
+    parser.add_argument("--sensor-serial", metavar="PORT", help="read live sensor lines from a serial port")
+    parser.add_argument("--sensor-udp", type=int, metavar="PORT", help="read live sensor lines sent to a UDP port")
+    parser.add_argument("--room-session", action="store_true",
+                        help="diagnose a room's plants one after another, asking the room questions only once")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="collect timings and serve them for Prometheus on localhost:PORT/metrics")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="collect timings and write them to PATH for node_exporter's textfile collector")
+    args = parser.parse_args()
+
+    if args.metrics_port or args.metrics_file:
+        metrics.enable()
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+        if args.metrics_file:
+            metrics.start_textfile(args.metrics_file)
+
+    hub = None
+    if args.sensor_csv or args.sensor_serial or args.sensor_udp:
+        from sensors import SensorHub, LineSource, UdpSource, read_csv_log
+
+        hub = SensorHub().start([read_csv_log(path) for path in args.sensor_csv], logged=True)
+        sources = []
+        if args.sensor_serial:
+            sources.append(LineSource(args.sensor_serial))
+        if args.sensor_udp:
+            sources.append(UdpSource(args.sensor_udp))
+        hub.start(sources)
+
+    room = None
+    if args.room_session:
+        from room import RoomSession
+
+        room = RoomSession(args.room)
+
     root = tk.Tk()
-    app = CannabisDiagnosisApp(root)
+    app = CannabisDiagnosisApp(root, plant_id=args.plant, room_id=args.room, adaptive=not args.all_questions,
+                               sensors=hub, room=room)
     root.mainloop()
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file)
@@ -0,0 +1,13 @@
+import os
+
+APP_NAME = "cannabis-diagnosis"
+
+
+def cache_dir(*parts):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, APP_NAME, *parts)
+
+
+def data_dir(*parts):
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, APP_NAME, *parts)
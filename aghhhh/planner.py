@@ -0,0 +1,267 @@
+"""Adaptive question ordering.
+
+Instead of walking QUESTIONS in order, the planner picks the unanswered
+question with the highest expected information gain over the diagnosis
+catalog. Every rule in ``INDEX`` that is still unsettled (not yet triggered,
+and possible at the answered stage) is treated as a yes/no unknown whose
+probability comes from its triggers: each unanswered question's "yes" rate
+(``priors``, e.g. from the history store, else one half), times the chance
+the question is asked at all under ``CONDITIONS`` and the chance the rule
+applies at a stage not yet given. A question's gain is how much it is
+expected to lower the summed entropy of those rules, so:
+
+* a question whose answers cannot set any unsettled rule gains nothing and
+  is never asked;
+* a question whose condition is not met (pest follow-ups after "no pests",
+  bud rot outside flowering) is skipped, and so is one whose rules do not
+  apply at the answered growth stage;
+* a question that gates others (pests, the growth stage) is worth what
+  answering it tells about its dependants' rules as well as its own, so
+  gates come first;
+* the growing medium is asked whenever it decides how a pH reading reads
+  (5.8 is low in soil but fine in coco), even once nothing else depends on it.
+
+Ties keep catalog order. Planning stops as soon as no question left can
+change the diagnosis set.
+"""
+
+import itertools
+import math
+
+from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, CONDITIONS, INDEX, STAGES
+from readings import FACT_SOURCES, MEDIUM_QUESTION, reading_facts
+
+DEFAULT_PRIOR = 0.5
+GAIN_EPSILON = 1e-9  # below this a question is taken to tell nothing (rounding in the entropy sums)
+
+
+def entropy(probabilities):
+    return -sum(p * math.log2(p) for p in probabilities if p > 0)
+
+
+def binary_entropy(p):
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p) if 0 < p < 1 else 0.0
+
+
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class QuestionPlanner:
+    def __init__(self, questions=QUESTIONS, index=INDEX, conditions=CONDITIONS, priors=None,
+                 deficiency_checks=DEFICIENCY_CHECKS):
+        self.questions = questions
+        self.deficiency_checks = deficiency_checks
+        self.index = index
+        self.conditions = conditions
+        self.priors = priors or {}
+        self.refresh()
+
+    def refresh(self):
+        # Called again after the catalog is reloaded.
+        self.dependants = {}
+        for question_id, (parent, _) in self.conditions.items():
+            self.dependants.setdefault(parent, []).append(question_id)
+        self.triggers = {}  # rule bit -> its (question or fact id, answer) triggers
+        for trigger, mask in self.index.index.items():
+            for bit in bits(mask):
+                self.triggers.setdefault(bit, []).append(trigger)
+        self.facts = {}  # reading question id -> the facts derived from it
+        for fact, source in FACT_SOURCES.items():
+            self.facts.setdefault(source, []).append(fact)
+        self.own_masks = dict(self.index.question_masks)  # question id -> rules its own answer can set
+        for (question_id, _), mask in self.index.index.items():
+            if question_id in FACT_SOURCES:
+                # The medium moves the pH targets, so it can set or clear the reading rules too.
+                self.own_masks[MEDIUM_QUESTION] = self.own_masks.get(MEDIUM_QUESTION, 0) | mask
+        stage_masks = self.index.stage_masks.values()
+        staged = 0
+        for mask in stage_masks:
+            staged |= self.index.all_rules & ~mask
+        # rule bit -> share of the stages it applies in, for while the stage is unknown
+        self.stage_share = {bit: sum(mask >> bit & 1 for mask in stage_masks) / max(len(stage_masks), 1)
+                            for bit in bits(self.index.all_rules)}
+        self.affected = {}  # question id -> rules its answer can change the probability of
+
+        def affected(question_id):
+            if question_id not in self.affected:
+                mask = self.own_masks.get(question_id, 0)
+                if question_id == "stage":
+                    mask |= staged
+                for child in self.dependants.get(question_id, ()):
+                    mask |= affected(child)
+                self.affected[question_id] = mask
+            return self.affected[question_id]
+
+        for question in list(self.questions) + list(self.deficiency_checks):
+            affected(question.id)
+
+    def prior(self, question_id):
+        return self.priors.get(question_id, DEFAULT_PRIOR)
+
+    def answer_probability(self, question_id, answer):
+        if question_id == "stage":
+            return 1 / len(STAGES) if answer in STAGES else 0.0
+        p = self.prior(question_id)
+        return p if answer == "yes" else 1 - p if answer == "no" else 0.0
+
+    def reach(self, question_id, answers):
+        """Probability that ``question_id`` gets asked, given its condition and the answers so far."""
+        condition = self.conditions.get(question_id)
+        if condition is None:
+            return 1.0
+        parent, allowed = condition
+        if parent in answers:
+            return 1.0 if answers[parent] in allowed else 0.0
+        return self.reach(parent, answers) * sum(self.answer_probability(parent, answer) for answer in allowed)
+
+    def trigger_probability(self, trigger, answers, facts):
+        question_id, answer = trigger
+        source = FACT_SOURCES.get(question_id)
+        if source is not None:
+            if source in answers:
+                value = facts.get(question_id, "no")
+                if isinstance(value, float):  # still depends on the medium
+                    return value if answer == "yes" else 1 - value
+                return 1.0 if value == answer else 0.0
+            question_id = source  # a fact is as likely as a "yes" to the reading it comes from
+        elif question_id in answers:
+            return 1.0 if answers[question_id] == answer else 0.0
+        return self.reach(question_id, answers) * self.answer_probability(question_id, answer)
+
+    def rule_entropy(self, mask, answers, facts):
+        """Summed entropy of the rules in ``mask``, each an independent yes/no given ``answers``."""
+        stage_mask = self.index.stage_masks.get(answers.get("stage"))
+        total = 0.0
+        for bit in bits(mask):
+            if stage_mask is not None:
+                applies = 1.0 if stage_mask >> bit & 1 else 0.0
+            else:
+                applies = self.stage_share[bit]
+            miss = 1.0
+            for trigger in self.triggers.get(bit, ()):
+                miss *= 1 - self.trigger_probability(trigger, answers, facts)
+            total += binary_entropy(applies * (1 - miss))
+        return total
+
+    def fact_probabilities(self, answers):
+        """reading_facts(answers), with the chance of each fact that the unanswered medium would still change."""
+        facts = reading_facts(answers)
+        if MEDIUM_QUESTION in answers or not any(source in answers for source in self.facts):
+            return facts
+        coco = reading_facts(dict(answers, **{MEDIUM_QUESTION: "yes"}))
+        p = self.prior(MEDIUM_QUESTION)
+        for fact in FACT_SOURCES:
+            if facts.get(fact) != coco.get(fact):
+                facts[fact] = p if coco.get(fact) == "yes" else 1 - p
+        return facts
+
+    def unsettled(self, answers, facts):
+        """Rules possible at the answered stage and not yet set. Facts that hang on the medium set nothing."""
+        possible = self.index.possible(answers)
+        settled = {fact: value for fact, value in facts.items() if value == "yes"}
+        return possible & ~(self.index.answer_mask(answers) | self.index.answer_mask(settled))
+
+    def outcomes(self, question):
+        """[(probability, hypothetical answers, hypothetical derived facts)] for answering ``question``."""
+        if question.input_type == "stage":
+            return [(1 / len(STAGES), {question.id: stage}, {}) for stage in STAGES]
+        facts = self.facts.get(question.id)
+        if facts:
+            p = self.prior(question.id)
+            return [(math.prod(p if value == "yes" else 1 - p for value in values), {question.id: "reading"},
+                     dict(zip(facts, values)))
+                    for values in itertools.product(("yes", "no"), repeat=len(facts))]
+        p = self.prior(question.id)
+        return [(p, {question.id: "yes"}, {}), (1 - p, {question.id: "no"}, {})]
+
+    def eligible(self, question_id, answers):
+        condition = self.conditions.get(question_id)
+        if condition is None:
+            return True
+        parent, allowed = condition
+        return answers.get(parent) in allowed
+
+    def relevant(self, question_id, unsettled, answers):
+        if self.own_masks.get(question_id, 0) & unsettled:
+            return True
+        return any(child not in answers and self.relevant(child, unsettled, answers)
+                   for child in self.dependants.get(question_id, ()))
+
+    def answered(self, question, answers):
+        if question.input_type == "image_check":
+            # An image check is one step in the flow but answers every reference photo.
+            return all(check.id in answers for check in self.deficiency_checks)
+        return question.id in answers
+
+    def gain(self, question, unsettled, answers, facts=None):
+        """Expected drop in the entropy of the unsettled rules from asking ``question``."""
+        if question.input_type == "image_check":
+            # One step in the flow that answers every reference photo; the photos are independent.
+            return sum(self.gain(check, unsettled, answers, facts) for check in self.deficiency_checks
+                       if check.id not in answers)
+        if not self.relevant(question.id, unsettled, answers):
+            return 0.0
+        facts = self.fact_probabilities(answers) if facts is None else facts
+        mask = unsettled & self.affected.get(question.id, 0)
+        before = self.rule_entropy(mask, answers, facts)
+        after = 0.0
+        for probability, answer, derived in self.outcomes(question):
+            hypothetical = dict(answers, **answer)
+            if question.id == MEDIUM_QUESTION:
+                derived = reading_facts(hypothetical)  # the readings already given, re-read for this medium
+            after += probability * self.rule_entropy(mask, hypothetical, dict(facts, **derived))
+        return before - after
+
+    def next_question(self, answers):
+        """Return the position in ``questions`` to ask next, or None when the diagnosis set is settled."""
+        facts = self.fact_probabilities(answers)
+        unsettled = self.unsettled(answers, facts)
+        best, best_gain = None, GAIN_EPSILON
+        for position, question in enumerate(self.questions):
+            if self.answered(question, answers) or not self.eligible(question.id, answers):
+                continue
+            gain = self.gain(question, unsettled, answers, facts)
+            if gain > best_gain:
+                best, best_gain = position, gain
+        return best
+
+    def likely_path(self, answers, count):
+        """Predict the next ``count`` positions, assuming each question gets its most likely answer."""
+        answers = dict(answers)
+        path = []
+        while len(path) < count:
+            position = self.next_question(answers)
+            if position is None:
+                break
+            path.append(position)
+            question = self.questions[position]
+            if question.input_type == "image_check":
+                answers.update((check.id, "no") for check in self.deficiency_checks)
+            else:
+                likely = "yes" if self.priors.get(question.id, DEFAULT_PRIOR) > 0.5 else "no"
+                answers[question.id] = STAGES[-1] if question.input_type == "stage" else likely
+        return path
+
+
+def priors_from_history(history, index=INDEX):
+    """Estimate each question's "yes" rate from how often its diagnoses appear in the history store."""
+    sessions = history.session_count()
+    if not sessions:
+        return {}
+    totals = history.diagnosis_totals()
+    masks = {}
+    for (question_id, answer), mask in index.index.items():
+        if answer == "yes":
+            # Derived reading facts ("ph_low", ...) count towards the question they come from.
+            question_id = FACT_SOURCES.get(question_id, question_id)
+            masks[question_id] = masks.get(question_id, 0) | mask
+    priors = {}
+    for question_id, mask in masks.items():
+        count = sum(totals.get(diagnosis.name, 0) for diagnosis in index.expand(mask))
+        # Laplace smoothing keeps never-seen symptoms askable.
+        priors[question_id] = min(count + 1, sessions + 1) / (sessions + 2)
+    return priors
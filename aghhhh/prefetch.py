@@ -0,0 +1,140 @@
+"""Background decoding of upcoming question images.
+
+Worker threads render (or read from the thumbnail cache) the PPM bytes for the
+next few images while the user is still reading the current question. The
+bytes are kept in a size-bounded LRU; the Tk main thread only has to turn them
+into a ``tk.PhotoImage(data=...)``.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import image_path
+
+DEFAULT_BUDGET = 16 * 1024 * 1024  # bytes of decoded image data kept in memory
+DEFAULT_WORKERS = 2
+
+
+def file_signature(name):
+    """(mtime, size) of the image ``name`` refers to, or None when there is no such file."""
+    try:
+        stat = os.stat(image_path(name))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ImageLRU:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.size_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size_bytes -= len(old)
+            self._items[key] = data
+            self.size_bytes += len(data)
+            while self.size_bytes > self.budget_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size_bytes -= len(evicted)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ImagePrefetcher:
+    def __init__(self, thumbnails, max_workers=DEFAULT_WORKERS, budget_bytes=DEFAULT_BUDGET):
+        self.thumbnails = thumbnails
+        self.cache = ImageLRU(budget_bytes)
+        self._pending = {}
+        self._failed = {}  # key -> (error, file signature when it failed)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    def _load(self, key):
+        name, size = key
+        try:
+            data = self.thumbnails.read(image_path(name), size)
+            self.cache.put(key, data)
+            with self._lock:
+                self._failed.pop(key, None)
+            return data
+        except Exception as e:
+            signature = file_signature(name)
+            with self._lock:
+                self._failed[key] = (e, signature)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def prefetch(self, names, size):
+        for name in names:
+            if (name, size) not in self.cache:
+                self.request(name, size)
+
+    def request(self, name, size):
+        """Future for the bytes of ``name`` at ``size``, shared with a load already in flight.
+
+        Its result is the data even when it is too large for the cache to keep.
+        """
+        key = (name, size)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._executor.submit(self._load, key)
+        return future
+
+    def get(self, name, size):
+        """Return the PPM bytes for ``name`` at ``size``; waits for an in-flight prefetch rather than redoing it."""
+        key = (name, size)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            return future.result()
+        return self._load(key)
+
+    def peek(self, name, size):
+        """Return the bytes if they are ready, else start loading them and return None. Never blocks.
+
+        Re-raises the error if an earlier load of this image failed and the file has not changed since.
+        """
+        key = (name, size)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            failed = self._failed.get(key)
+        if failed is not None:
+            error, signature = failed
+            if file_signature(name) == signature:
+                raise error
+            with self._lock:
+                self._failed.pop(key, None)  # replaced, fixed or added since: try again
+        self.prefetch([name], size)
+        return None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,139 @@
+"""Typed NPK/pH readings and stage-aware range checks.
+
+NPK and pH answers are parsed into floats when they are entered. The checks
+compare them against per-stage target tables and turn the result into derived
+facts (``ph_low``, ``ph_high``, ``npk_mismatch``) that the diagnosis index
+treats like any other answer.
+
+``check_ranges_bulk`` runs the same checks over whole columns at once with
+NumPy, for batch jobs. NumPy is imported there, on first use, so the GUI and
+server never load it.
+"""
+
+import math
+import re
+
+NPK_RANGE = (0.0, 100.0)  # percent by weight, as printed on fertilizer labels
+PH_RANGE = (0.0, 14.0)
+
+# Target pH (min, max) for feed water and root zone, per growing medium and stage.
+PH_TARGETS = {
+    "soil": {"seedling": (6.0, 7.0), "vegetative": (6.0, 7.0), "flowering": (6.2, 6.8)},
+    "coco": {"seedling": (5.5, 6.5), "vegetative": (5.5, 6.3), "flowering": (5.8, 6.5)},
+}
+# Nitrogen's share of N+P+K that suits each stage, and the strongest total feed a stage tolerates.
+N_SHARE_TARGETS = {"seedling": (0.0, 1.0), "vegetative": (0.4, 1.0), "flowering": (0.0, 0.3)}
+MAX_NPK_TOTAL = {"seedling": 15.0, "vegetative": 60.0, "flowering": 60.0}
+
+# Which question each derived fact comes from.
+FACT_SOURCES = {"ph_low": "ph", "ph_high": "ph", "npk_mismatch": "npk"}
+# The question that picks the growing medium, and with it the pH targets.
+MEDIUM_QUESTION = "coco_coir"
+
+# A minus sign only counts when it does not follow a digit, so "10-5-5" reads as three numbers.
+NUMBER = re.compile(r"(?<![\d.])-?\d+(?:\.\d+)?")
+
+
+def parse_number(text, name, valid_range):
+    try:
+        value = float(str(text).strip())
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+    if math.isnan(value) or not valid_range[0] <= value <= valid_range[1]:
+        raise ValueError(f"{name} must be between {valid_range[0]:g} and {valid_range[1]:g}.")
+    return value
+
+
+def parse_npk(n, p, k):
+    """Return [n, p, k] as floats, or raise ValueError with a message fit for the user."""
+    return [parse_number(value, name, NPK_RANGE) for value, name in ((n, "N"), (p, "P"), (k, "K"))]
+
+
+def parse_ph(water_ph, soil_ph):
+    """Return [water_ph, soil_ph] as floats, or raise ValueError with a message fit for the user."""
+    return [parse_number(water_ph, "Water pH", PH_RANGE), parse_number(soil_ph, "Soil pH", PH_RANGE)]
+
+
+def numbers_in(text, count, what):
+    if isinstance(text, (list, tuple)):
+        numbers = list(text)
+    else:
+        numbers = NUMBER.findall(str(text))
+    if len(numbers) != count:
+        raise ValueError(f"Enter {what}.")
+    return numbers
+
+
+def parse_npk_text(text):
+    """Parse free-form NPK such as "10-5-5" or "10 5 5"."""
+    return parse_npk(*numbers_in(text, 3, "N, P and K as three numbers"))
+
+
+def parse_ph_text(text):
+    """Parse free-form pH such as "Water pH: 6.5, Soil pH: 6.8"."""
+    return parse_ph(*numbers_in(text, 2, "water pH and soil pH as two numbers"))
+
+
+def medium(answers):
+    return "coco" if answers.get(MEDIUM_QUESTION) == "yes" else "soil"
+
+
+def reading_facts(answers):
+    """Derive range-check facts from typed ``npk``/``ph`` answers for one session."""
+    facts = {}
+    stage = answers.get("stage")
+    if stage not in N_SHARE_TARGETS:
+        return facts
+    ph = answers.get("ph")
+    if isinstance(ph, (list, tuple)):
+        low, high = PH_TARGETS[medium(answers)][stage]
+        if min(ph) < low:
+            facts["ph_low"] = "yes"
+        if max(ph) > high:
+            facts["ph_high"] = "yes"
+    npk = answers.get("npk")
+    if isinstance(npk, (list, tuple)):
+        total = sum(npk)
+        share_low, share_high = N_SHARE_TARGETS[stage]
+        share = npk[0] / total if total else 0.0
+        if total > MAX_NPK_TOTAL[stage] or (total and not share_low <= share <= share_high):
+            facts["npk_mismatch"] = "yes"
+    return facts
+
+
+def check_ranges_bulk(stages, npk, ph, coco):
+    """Vectorized reading_facts over many records.
+
+    ``stages`` is a sequence of stage names, ``npk`` an (N, 3) and ``ph`` an (N, 2) float array with
+    NaN for missing readings, ``coco`` a boolean array. Returns {fact: boolean array}. Raises ImportError
+    without NumPy; reading_facts gives the same answers one record at a time.
+    """
+    import numpy as np
+
+    stages = np.asarray(stages, dtype=object)
+    npk = np.asarray(npk, dtype=float).reshape(-1, 3)
+    ph = np.asarray(ph, dtype=float).reshape(-1, 2)
+    coco = np.asarray(coco, dtype=bool)
+
+    # Per-row targets, looked up once per stage rather than once per row.
+    ph_low = np.full(len(stages), np.nan)
+    ph_high = np.full(len(stages), np.nan)
+    share_low = np.full(len(stages), np.nan)
+    share_high = np.full(len(stages), np.nan)
+    max_total = np.full(len(stages), np.nan)
+    for stage in N_SHARE_TARGETS:
+        rows = stages == stage
+        for medium_name, is_medium in (("coco", coco), ("soil", ~coco)):
+            ph_low[rows & is_medium], ph_high[rows & is_medium] = PH_TARGETS[medium_name][stage]
+        share_low[rows], share_high[rows] = N_SHARE_TARGETS[stage]
+        max_total[rows] = MAX_NPK_TOTAL[stage]
+
+    # Comparisons against NaN are False, so missing readings or unknown stages never raise a fact.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = npk.sum(axis=1)
+        share = np.where(total > 0, npk[:, 0] / total, 0.0)
+        return {
+            "ph_low": np.nanmin(np.where(np.isnan(ph), np.inf, ph), axis=1) < ph_low,
+            "ph_high": np.nanmax(np.where(np.isnan(ph), -np.inf, ph), axis=1) > ph_high,
+            "npk_mismatch": (total > max_total) | ((total > 0) & ((share < share_low) | (share > share_high))),
+        }
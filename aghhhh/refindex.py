@@ -0,0 +1,270 @@
+"""Similarity index over the labelled reference photos.
+
+Every reference image gets a 64-bit difference hash (structure) and a 48-bin
+HSV histogram (color), 58 bytes in all. The index lives in a cache directory
+as two ``.npy`` files that are memory-mapped on load, plus a small JSON file
+of labels and source paths:
+
+* ``records.npy``: one (hash, histogram, label) record per image;
+* ``bands.npy``: the hash split into four 16-bit bands, each band's values
+  sorted with the row they came from (multi-index hashing).
+
+Two hashes within Hamming distance ``4r + 3`` differ in at most ``r`` bits of
+at least one band, so probing every band with each key up to ``r`` bit flips
+away finds every reference that close: 68 band keys reach distance 7, 2788
+reach distance 15. A query for the nearest references widens ``r`` until
+enough turn up and only scans every record past distance 15; matching an
+uploaded photo asks for references within distance 15 and never does.
+Candidates are ranked by a blend of hash and histogram distance.
+
+Labels come from the file name (``nitrogen_deficiency.jpg``) or, for larger
+libraries, from the folder an image sits in (``refs/nitrogen_deficiency/*.jpg``)::
+
+    python refindex.py build images/ more-refs/
+    python refindex.py match my-leaf.jpg
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+from assets import IMAGE_DIR
+from paths import cache_dir
+
+HASH_SIZE = 8  # hash is HASH_SIZE x HASH_SIZE bits
+BANDS = 4
+BAND_BITS = 64 // BANDS
+HUE_BINS, SATURATION_BINS, VALUE_BINS = 12, 2, 2
+HIST_BINS = HUE_BINS * SATURATION_BINS * VALUE_BINS
+HIST_TOTAL = 255  # histograms are scaled to sum to about this, so every bin fits in a byte
+FEATURE_SIZE = 64  # longest side the photo is decoded to before hashing
+HASH_WEIGHT = 0.5  # share of the ranking distance that comes from the hash (the rest from color)
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+MAX_PROBE_RADIUS = 3  # bit flips probed per band key; beyond that a full scan is cheaper
+MATCH_BITS = BANDS * (MAX_PROBE_RADIUS + 1) - 1  # hash distance within which a reference counts as a match
+
+
+def default_index_dir():
+    return cache_dir("refindex")
+
+
+def record_dtype():
+    import numpy as np
+
+    return np.dtype([("hash", "<u8"), ("hist", "u1", (HIST_BINS,)), ("label", "<u2")])
+
+
+def band_dtype():
+    import numpy as np
+
+    return np.dtype([("value", "<u2"), ("row", "<u4")])
+
+
+def label_for(path, root):
+    """``refs/potassium_deficiency/01.jpg`` -> potassium_deficiency; ``images/Curling_leaves.jpg`` -> curling_leaves."""
+    parent = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(root))
+    name = os.path.basename(path) if parent == "." else parent.split(os.sep)[0]
+    while os.path.splitext(name)[1].lower() in PHOTO_EXTENSIONS:
+        name = os.path.splitext(name)[0]
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def find_references(roots):
+    """Yield (path, label) for every photo under ``roots``."""
+    for root in roots:
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.lower().endswith(PHOTO_EXTENSIONS):
+                    path = os.path.join(directory, name)
+                    yield path, label_for(path, root)
+
+
+def image_features(path):
+    """Return (64-bit difference hash, uint8 HSV histogram) for a photo."""
+    import numpy as np
+    from PIL import Image
+    from leafcolor import load_small, rgb_to_hsv
+
+    rgb = load_small(path, FEATURE_SIZE)
+    gray = Image.fromarray(rgb).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    image_hash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    hue, saturation, value = rgb_to_hsv(rgb)
+    bins = ((np.minimum(hue / 360 * HUE_BINS, HUE_BINS - 1).astype(np.intp) * SATURATION_BINS
+             + (saturation >= 0.5)) * VALUE_BINS + (value >= 0.5))
+    counts = np.bincount(bins.ravel(), minlength=HIST_BINS)
+    hist = np.round(counts * (HIST_TOTAL / max(1, counts.sum()))).astype(np.uint8)
+    return image_hash, hist
+
+
+def band_values(image_hash):
+    return [(image_hash >> (band * BAND_BITS)) & 0xFFFF for band in range(BANDS)]
+
+
+@lru_cache(maxsize=None)
+def flip_masks(radius):
+    """Every band mask with at most ``radius`` bits set, as a uint16 array."""
+    import numpy as np
+
+    masks = [sum(1 << bit for bit in bits) for flips in range(radius + 1)
+             for bits in itertools.combinations(range(BAND_BITS), flips)]
+    return np.array(masks, dtype=np.uint16)
+
+
+def write_array(path, array):
+    import numpy as np
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+class ReferenceIndex:
+    def __init__(self, directory=None):
+        import numpy as np
+
+        self.directory = directory or default_index_dir()
+        with open(os.path.join(self.directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.records = np.load(os.path.join(self.directory, "records.npy"), mmap_mode="r")
+        self.bands = np.load(os.path.join(self.directory, "bands.npy"), mmap_mode="r")
+        if len(self.records) != len(self.meta["paths"]) or self.bands.shape != (BANDS, len(self.records)):
+            raise ValueError(f"Reference index in {self.directory} is incomplete; rebuild it.")
+        self.labels = self.meta["labels"]
+        self.paths = self.meta["paths"]
+        self.rows_scanned = 0  # records whose hash distance was computed, since the last query began
+
+    @classmethod
+    def build(cls, roots=(IMAGE_DIR,), directory=None):
+        """Index every photo under ``roots``; the roots are kept so load() rebuilds over the same folders."""
+        import numpy as np
+
+        directory = directory or default_index_dir()
+        os.makedirs(directory, exist_ok=True)
+        references = list(find_references(roots))
+        labels = sorted({label for _, label in references})
+        label_ids = {label: position for position, label in enumerate(labels)}
+        records = np.zeros(len(references), dtype=record_dtype())
+        for row, (path, label) in enumerate(references):
+            image_hash, hist = image_features(path)
+            records[row] = (image_hash, hist, label_ids[label])
+        bands = np.zeros((BANDS, len(references)), dtype=band_dtype())
+        for band in range(BANDS):
+            values = ((records["hash"] >> np.uint64(band * BAND_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+            order = np.argsort(values, kind="stable")
+            bands[band]["value"] = values[order]
+            bands[band]["row"] = order
+        write_array(os.path.join(directory, "records.npy"), records)
+        write_array(os.path.join(directory, "bands.npy"), bands)
+        meta = {
+            "roots": [os.path.abspath(root) for root in roots],
+            "labels": labels,
+            "paths": [os.path.abspath(path) for path, _ in references],
+            "sources": {os.path.abspath(path): os.stat(path).st_mtime_ns for path, _ in references},
+        }
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))  # written last: marks the index complete
+        return cls(directory)
+
+    @classmethod
+    def load(cls, roots=None, directory=None):
+        """Open the index, (re)building it when missing or when a reference photo was added or changed.
+
+        ``roots`` defaults to the folders the index was built from (``images/`` for a new index).
+        """
+        try:
+            index = cls(directory)
+        except (OSError, ValueError):
+            return cls.build(roots or (IMAGE_DIR,), directory)
+        if roots is None:
+            roots = index.meta.get("roots") or (IMAGE_DIR,)
+        sources = {os.path.abspath(path): os.stat(path).st_mtime_ns for path, _ in find_references(roots)}
+        return index if sources == index.meta["sources"] else cls.build(roots, directory)
+
+    def candidates(self, image_hash, max_distance):
+        """Return (rows, hash distances) of the references within Hamming distance ``max_distance``."""
+        import numpy as np
+
+        radius = max_distance // BANDS
+        if radius > MAX_PROBE_RADIUS:
+            rows = np.arange(len(self.records))
+        else:
+            rows = []
+            for band, value in enumerate(band_values(image_hash)):
+                keys = np.sort(flip_masks(radius) ^ np.uint16(value))
+                column = self.bands[band]
+                starts = np.searchsorted(column["value"], keys, side="left")
+                ends = np.searchsorted(column["value"], keys, side="right")
+                rows.extend(column["row"][start:end] for start, end in zip(starts, ends) if end > start)
+            rows = np.unique(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.intp)
+        xor = self.records["hash"][rows] ^ np.uint64(image_hash)
+        hamming = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        self.rows_scanned += len(rows)
+        close = hamming <= max_distance
+        return rows[close], hamming[close]
+
+    def nearest(self, image_hash, hist, k=5, max_distance=None):
+        """Return [(distance, label, path)] for the ``k`` closest references, closest first.
+
+        With ``max_distance``, only references within that hash distance are considered. Otherwise the
+        probe widens until ``k`` turn up, scanning every record only if they are not within ``MATCH_BITS``.
+        """
+        import numpy as np
+
+        self.rows_scanned = 0
+        if max_distance is not None:
+            rows, hamming = self.candidates(image_hash, max_distance)
+        else:
+            for radius in range(MAX_PROBE_RADIUS + 1):
+                rows, hamming = self.candidates(image_hash, BANDS * (radius + 1) - 1)
+                if len(rows) >= k:
+                    break
+            else:
+                rows, hamming = self.candidates(image_hash, HASH_SIZE * HASH_SIZE)
+        records = self.records[rows]
+        color = np.abs(records["hist"].astype(np.int16) - hist.astype(np.int16)).sum(axis=1) / (2 * HIST_TOTAL)
+        distance = HASH_WEIGHT * hamming / 64 + (1 - HASH_WEIGHT) * color
+        best = np.argsort(distance, kind="stable")[:k]
+        return [(float(distance[i]), self.labels[records["label"][i]], self.paths[rows[i]]) for i in best]
+
+    def match(self, path, k=5, max_distance=None):
+        return self.nearest(*image_features(path), k=k, max_distance=max_distance)
+
+    def label_distances(self, path, k=10):
+        """Return {label: distance of its closest reference} among the ``k`` nearest within ``MATCH_BITS``."""
+        distances = {}
+        for distance, label, _ in self.match(path, k, MATCH_BITS):
+            distances.setdefault(label, distance)
+        return distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the reference photo similarity index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index every photo under the given folders")
+    build.add_argument("folders", nargs="*", default=[IMAGE_DIR])
+    match = commands.add_parser("match", help="list the references closest to a photo")
+    match.add_argument("photo")
+    match.add_argument("-k", type=int, default=5)
+    match.add_argument("--folders", nargs="*", help="rebuild over these folders (default: those the index has)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = ReferenceIndex.build(args.folders)
+        print(f"Indexed {len(index.records)} photos ({len(index.labels)} labels) in {index.directory}")
+    else:
+        for distance, label, path in ReferenceIndex.load(args.folders or None).match(args.photo, args.k):
+            print(f"{distance:.3f}  {label:<24} {path}")
+
+
+if __name__ == "__main__":
+    main()
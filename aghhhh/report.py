@@ -0,0 +1,407 @@
+"""HTML and PDF diagnosis reports with embedded thumbnails.
+
+A report lists each plant's stage, NPK and pH readings and its diagnoses with
+their solutions and reference thumbnails. Writers stream: every plant is
+written out as soon as it is added, so a report of thousands of plants never
+sits in memory. Inside one document each thumbnail is stored once (a CSS
+class in HTML, one image object in PDF) however many plants show it, and the
+encoded JPEG and base64 forms are kept in an ``EncodedImages`` store that every
+report written by the process shares. The JPEG renditions themselves live in
+the thumbnail cache, so even a fresh process does not re-encode them.
+
+The PDF writer is self-contained: Helvetica text and the JPEG thumbnails
+embedded as-is (DCTDecode), no PDF library needed. From batch.py output::
+
+    python report.py results.jsonl -o nightly.pdf
+    python report.py results.jsonl --split reports/ --format html
+"""
+
+import argparse
+import base64
+import functools
+import html
+import json
+import os
+import re
+import sys
+import tempfile
+import zlib
+from collections import namedtuple
+
+from assets import image_path
+from diagnosis import RULES, Diagnosis
+from thumbnails import ThumbnailCache, RESULT_SIZE
+
+PlantReport = namedtuple("PlantReport", ["plant_id", "stage", "npk", "ph", "diagnoses"])
+
+TITLE = "Cannabis Plant Diagnosis Report"
+FORMATS = ("html", "pdf")
+
+# PDF page geometry in points (US Letter).
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 54
+THUMB_WIDTH, THUMB_HEIGHT = 112, 75  # RESULT_SIZE at 72 dpi x 0.75
+TEXT_X = MARGIN + THUMB_WIDTH + 14
+# Helvetica advance widths (1/1000 em) for WinAnsi 32-126; anything else counts as 556.
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+BOLD_FACTOR = 1.06  # Helvetica-Bold runs about this much wider
+
+
+def diagnoses_by_name():
+    return {rule.diagnosis.name: rule.diagnosis for rule in RULES}
+
+
+def report_from_result(result, catalog=None):
+    """Build a PlantReport from one batch.py result record."""
+    catalog = catalog if catalog is not None else diagnoses_by_name()
+    diagnoses = [catalog.get(name) or Diagnosis(name, "", None) for name in result.get("diagnoses", [])]
+    return PlantReport(str(result.get("id", "")), result.get("stage", ""), result.get("npk"), result.get("ph"),
+                       diagnoses)
+
+
+def readings_text(report):
+    """One line per reading; an answer that is not a reading (``not_sure``) is shown as given."""
+    lines = []
+    if isinstance(report.npk, (list, tuple)):
+        lines.append("NPK: " + "-".join(f"{value:g}" for value in report.npk))
+    elif report.npk:
+        lines.append(f"NPK: {answer_text(report.npk)}")
+    if isinstance(report.ph, (list, tuple)):
+        lines.append(f"Water pH: {report.ph[0]:g}, soil pH: {report.ph[1]:g}")
+    elif report.ph:
+        lines.append(f"pH: {answer_text(report.ph)}")
+    return lines
+
+
+def answer_text(answer):
+    """``not_sure`` -> not sure."""
+    return str(answer).replace("_", " ")
+
+
+class EncodedImages:
+    """Report thumbnails, encoded once per process and shared by every report written."""
+
+    def __init__(self, thumbnails=None, size=RESULT_SIZE):
+        self.thumbnails = thumbnails or ThumbnailCache(fmt="jpg")
+        self.size = size
+        self.jpegs = {}  # image name -> JPEG bytes, or None when the image is missing or unreadable
+        self.data_uris = {}
+        self.pdf_objects = {}
+
+    def jpeg(self, name):
+        if name not in self.jpegs:
+            try:
+                self.jpegs[name] = self.thumbnails.read(image_path(name), self.size, "jpg")
+            except (OSError, ValueError):
+                self.jpegs[name] = None  # the report goes out without this thumbnail
+        return self.jpegs[name]
+
+    def data_uri(self, name):
+        if name not in self.data_uris:
+            data = self.jpeg(name)
+            self.data_uris[name] = data and "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+        return self.data_uris[name]
+
+    def pdf_object(self, name):
+        """The body of a PDF image XObject for ``name`` (without the "N 0 obj" wrapper), or None."""
+        if name not in self.pdf_objects:
+            data = self.jpeg(name)
+            self.pdf_objects[name] = data and (
+                f"<< /Type /XObject /Subtype /Image /Width {self.size[0]} /Height {self.size[1]} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>\nstream\n"
+            ).encode("ascii") + data + b"\nendstream"
+        return self.pdf_objects[name]
+
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; background: #0d0d0d; color: #ffffff; margin: 2em; }}
+section {{ border-top: 1px solid #444444; padding: 1em 0; page-break-inside: avoid; }}
+.readings {{ color: #bbbbbb; }}
+.diagnosis {{ display: flex; gap: 1em; margin: 1em 0; }}
+.thumb {{ flex: none; width: {width}px; height: {height}px; background-size: cover; }}
+h3 {{ margin: 0 0 0.3em; }}
+p {{ margin: 0; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+
+class HtmlReportWriter:
+    def __init__(self, f, images, title=TITLE):
+        self.f = f
+        self.images = images
+        self.classes = {}  # image name -> CSS class already defined in this document
+        f.write(HTML_HEAD.format(title=html.escape(title), width=images.size[0], height=images.size[1]))
+
+    def thumbnail(self, name, alt):
+        uri = self.images.data_uri(name) if name else None
+        if uri is None:
+            return ""
+        css_class = self.classes.get(name)
+        style = ""
+        if css_class is None:
+            # First use in this document: define the image once; later plants reuse the class.
+            css_class = self.classes[name] = f"img{len(self.classes)}"
+            style = f"<style>.{css_class} {{ background-image: url({uri}); }}</style>\n"
+        return f'{style}<div class="thumb {css_class}" role="img" aria-label="{html.escape(alt)}"></div>'
+
+    def add(self, report):
+        parts = ["<section>\n", f"<h2>Plant {html.escape(report.plant_id)}</h2>\n" if report.plant_id else "",
+                 f"<p>Stage: {html.escape(report.stage.capitalize() or 'Unknown')}</p>\n"]
+        parts += [f'<p class="readings">{html.escape(line)}</p>\n' for line in readings_text(report)]
+        for diagnosis in report.diagnoses:
+            parts.append(f'<div class="diagnosis">{self.thumbnail(diagnosis.image, diagnosis.name)}<div>'
+                         f"<h3>{html.escape(diagnosis.name)}</h3><p>{html.escape(diagnosis.solution)}</p>"
+                         f"</div></div>\n")
+        if not report.diagnoses:
+            parts.append("<p>No problems found.</p>\n")
+        parts.append("</section>\n")
+        self.f.write("".join(parts))
+
+    def close(self):
+        self.f.write("</body>\n</html>\n")
+
+
+def text_width(text, size, bold=False):
+    units = sum(HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) < 127 else 556 for c in text)
+    return units * size / 1000 * (BOLD_FACTOR if bold else 1)
+
+
+@functools.lru_cache(maxsize=1024)
+def wrap(text, size, width, bold=False):
+    # Cached: a nightly batch wraps the same few dozen solutions thousands of times.
+    space = text_width(" ", size, bold)
+    lines, line, used = [], [], 0.0
+    for word in text.split():
+        word_width = text_width(word, size, bold)
+        if line and used + space + word_width > width:
+            lines.append(" ".join(line))
+            line, used = [], 0.0
+        used += word_width + (space if line else 0.0)
+        line.append(word)
+    if line:
+        lines.append(" ".join(line))
+    return tuple(lines)
+
+
+def pdf_string(text):
+    data = text.encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfPage:
+    def __init__(self):
+        self.ops = []
+        self.images = {}  # resource name -> image name
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, x, text, size, bold=False, leading=None):
+        self.y -= leading or size * 1.25
+        self.ops.append(b"BT /%s %g Tf %g %g Td %s Tj ET" % (b"F2" if bold else b"F1", size, x, self.y,
+                                                             pdf_string(text)))
+
+    def image(self, resource, name, x, top):
+        self.images[resource] = name
+        self.ops.append(b"q %d 0 0 %d %g %g cm /%s Do Q" % (THUMB_WIDTH, THUMB_HEIGHT, x, top - THUMB_HEIGHT,
+                                                            resource.encode("ascii")))
+
+
+class PdfReportWriter:
+    """Writes PDF objects as it goes; only the byte offsets and page ids are kept until close()."""
+
+    def __init__(self, f, images, title=TITLE):
+        self.f = f
+        self.images = images
+        self.title = title
+        self.offsets = [0, 0, 0]  # objects 1 (catalog) and 2 (page tree) are written last
+        self.pages = []
+        self.image_ids = {}  # image name -> (object number, resource name) in this document
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.fonts = [self.write_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                                        % font) for font in (b"Helvetica", b"Helvetica-Bold")]
+        self.first_page = True
+
+    def write_object(self, body, number=None):
+        if number is None:
+            number = len(self.offsets)
+            self.offsets.append(0)
+        self.offsets[number] = self.f.tell()
+        self.f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return number
+
+    def image_resource(self, name):
+        if name not in self.image_ids:
+            body = self.images.pdf_object(name) if name else None
+            self.image_ids[name] = body and (self.write_object(body), f"Im{len(self.image_ids)}")
+        return self.image_ids[name]
+
+    def finish_page(self, page):
+        content = zlib.compress(b"\n".join(page.ops))
+        stream = self.write_object(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                                   % (len(content), content))
+        xobjects = b" ".join(b"/%s %d 0 R" % (resource.encode("ascii"), self.image_ids[name][0])
+                             for resource, name in page.images.items())
+        self.pages.append(self.write_object(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> /XObject << %s >> >> >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, stream, self.fonts[0], self.fonts[1], xobjects)))
+
+    def add(self, report):
+        name = f"Plant {report.plant_id}" if report.plant_id else "Diagnosis"
+        page = PdfPage()
+        if self.first_page:
+            page.text(MARGIN, self.title, 20, bold=True)
+            page.y -= 8
+            self.first_page = False
+        page.text(MARGIN, name, 16, bold=True)
+        page.text(MARGIN, f"Stage: {report.stage.capitalize() or 'Unknown'}", 11)
+        for line in readings_text(report):
+            page.text(MARGIN, line, 11)
+        page.y -= 10
+        text_width_available = PAGE_WIDTH - MARGIN - TEXT_X
+        for diagnosis in report.diagnoses:
+            heading = wrap(diagnosis.name, 12, text_width_available, bold=True)
+            body = wrap(diagnosis.solution, 10, text_width_available)
+            height = max(THUMB_HEIGHT, len(heading) * 15 + len(body) * 12.5) + 14
+            if page.y - height < MARGIN:
+                self.finish_page(page)
+                page = PdfPage()
+                page.text(MARGIN, f"{name} (continued)", 12, bold=True)
+                page.y -= 10
+            top = page.y
+            image = self.image_resource(diagnosis.image)
+            if image is not None:
+                page.image(image[1], diagnosis.image, MARGIN, top)
+            for line in heading:
+                page.text(TEXT_X, line, 12, bold=True, leading=15)
+            for line in body:
+                page.text(TEXT_X, line, 10, leading=12.5)
+            page.y = min(page.y, top - THUMB_HEIGHT) - 14
+        if not report.diagnoses:
+            page.text(MARGIN, "No problems found.", 11)
+        self.finish_page(page)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % number for number in self.pages)
+        self.write_object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)), 2)
+        self.write_object(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+        xref = self.f.tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+        self.f.write(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets[1:]))
+        self.f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets), xref))
+
+
+WRITERS = {"html": HtmlReportWriter, "pdf": PdfReportWriter}
+
+
+def format_for(path, default="pdf"):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in FORMATS else default
+
+
+def write_report(path, reports, fmt=None, images=None, title=TITLE):
+    """Stream ``reports`` (any iterable of PlantReport) into one HTML or PDF file. Returns the count written."""
+    fmt = fmt or format_for(path)
+    images = images or EncodedImages()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") if fmt == "pdf" else open(fd, "w", encoding="utf-8") as f:
+            writer = WRITERS[fmt](f, images, title)
+            for report in reports:
+                writer.add(report)
+                count += 1
+            writer.close()
+        os.chmod(tmp, output_mode(path))  # mkstemp creates the file private to the user
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return count
+
+
+def output_mode(path):
+    """The mode of the file being replaced, else what a plain open() would create under the umask."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def file_name(plant_id):
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", plant_id).strip("._") or "plant"
+
+
+def unique_file_name(plant_id, used):
+    """file_name(plant_id), numbered -2, -3, ... if it is already in ``used`` (ignoring case); adds it there."""
+    base = name = file_name(plant_id)
+    number = 1
+    while name.lower() in used:
+        number += 1
+        name = f"{base}-{number}"
+    used.add(name.lower())
+    return name
+
+
+def write_split(directory, reports, fmt="pdf", images=None):
+    """Write one file per plant into ``directory``, sharing the encoded thumbnails. Returns the count written.
+
+    Plants whose IDs map to the same file name (repeated IDs, or IDs differing only in punctuation or case)
+    get numbered files rather than overwriting each other.
+    """
+    images = images or EncodedImages()
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    used = set()
+    for report in reports:
+        name = unique_file_name(report.plant_id, used)
+        count += write_report(os.path.join(directory, f"{name}.{fmt}"), [report], fmt,
+                              images, f"{TITLE}: {report.plant_id}")
+    return count
+
+
+def read_results(path):
+    catalog = diagnoses_by_name()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield report_from_result(json.loads(line), catalog)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write HTML or PDF reports from batch.py results.")
+    parser.add_argument("results", help="JSONL results written by batch.py")
+    parser.add_argument("-o", "--output", help="one report file holding every plant (.html or .pdf)")
+    parser.add_argument("--split", metavar="DIR", help="write one report file per plant into DIR instead")
+    parser.add_argument("--format", choices=FORMATS, help="report format (default: from the output file name)")
+    args = parser.parse_args(argv)
+    if bool(args.output) == bool(args.split):
+        parser.error("give either -o/--output or --split")
+
+    if args.output:
+        count = write_report(args.output, read_results(args.results), args.format)
+        print(f"Wrote {count} plants to {args.output}", file=sys.stderr)
+    else:
+        count = write_split(args.split, read_results(args.results), args.format or "pdf")
+        print(f"Wrote {count} reports to {args.split}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
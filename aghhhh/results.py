@@ -0,0 +1,172 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+
+import metrics
+from thumbnails import RESULT_SIZE
+
+POLL_MS = 50  # how often rows waiting on a background decode are re-checked
+OVERSCAN_ROWS = 1  # rows above/below the viewport that also keep a live image
+
+
+class ResultsWindow:
+    """Diagnosis results with thumbnails filled in lazily.
+
+    All text goes in first. Every thumbnail slot starts as one shared blank placeholder; only rows
+    in (or next to) the viewport get a real PhotoImage, decoded off-thread by the app's prefetcher,
+    and rows scrolled out of view drop theirs again.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.rows = []  # (text line of the thumbnail, image filename), in display order
+        self.live = {}  # row index -> PhotoImage currently shown
+        self.failed = set()
+        self.refresh_pending = None
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Diagnosis Results")
+        self.window.configure(background="#0d0d0d")
+
+        result_frame = ttk.Frame(self.window, padding=20)
+        result_frame.pack(fill=tk.BOTH, expand=True)
+
+        diagnosis_label = ttk.Label(result_frame, text="Diagnosis:", style="TLabel")
+        diagnosis_label.grid(row=0, column=0, sticky="w")
+
+        result_textbox = scrolledtext.ScrolledText(result_frame, wrap=tk.WORD, width=80, height=20)
+        result_textbox.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+        self.textbox = result_textbox
+
+        self.placeholder = tk.PhotoImage(width=RESULT_SIZE[0], height=RESULT_SIZE[1])
+        for diagnosis, solution, image_filename in app.diagnoses:
+            diagnosis_text = f"{diagnosis}:\n{solution}\n\n"
+            result_textbox.insert(tk.END, diagnosis_text)
+            if not image_filename:
+                continue  # rules without a reference image get no thumbnail slot
+
+            line = int(result_textbox.index("end-1c").split(".")[0])
+            result_textbox.image_create(tk.END, image=self.placeholder, name=f"row{len(self.rows)}")
+            result_textbox.insert(tk.END, "\n\n")
+            self.rows.append((line, image_filename))
+        self.row_lines = [line for line, _ in self.rows]
+
+        result_textbox.configure(state="disabled")
+        # Re-check which rows are visible whenever the view scrolls or resizes.
+        result_textbox.configure(yscrollcommand=self.on_scroll)
+        result_textbox.bind("<Configure>", lambda event: self.schedule_refresh())
+
+        stage_label = ttk.Label(result_frame, text="Plant Stage:", style="TLabel")
+        stage_label.grid(row=2, column=0, sticky="w")
+
+        stage_value_label = ttk.Label(result_frame, text=app.life_stage.capitalize(), style="TLabel")
+        stage_value_label.grid(row=2, column=1, sticky="w")
+
+        self.email_var = tk.BooleanVar()
+        email_checkbox = ttk.Checkbutton(result_frame, text="Send results via email", variable=self.email_var,
+                                         command=self.toggle_email_input, style="TCheckbutton")
+        email_checkbox.grid(row=3, columnspan=2, pady=10)
+
+        self.email_entry_label = ttk.Label(result_frame, text="Email:", style="TLabel")
+        self.email_entry = ttk.Entry(result_frame, style="TEntry")
+
+        email_button = ttk.Button(result_frame, text="Send Email", command=self.send_email)
+        email_button.grid(row=5, columnspan=2)
+
+        report_button = ttk.Button(result_frame, text="Save Report...", command=self.save_report)
+        report_button.grid(row=6, columnspan=2, pady=(10, 0))
+
+        self.schedule_refresh()
+
+    def on_scroll(self, first, last):
+        self.textbox.vbar.set(first, last)
+        self.schedule_refresh()
+
+    def schedule_refresh(self, delay=0):
+        if self.refresh_pending is None:
+            self.refresh_pending = self.window.after(delay, self.refresh)
+
+    def visible_rows(self):
+        top = int(self.textbox.index("@0,0").split(".")[0])
+        bottom = int(self.textbox.index(f"@0,{self.textbox.winfo_height()}").split(".")[0])
+        first = max(0, bisect.bisect_left(self.row_lines, top) - OVERSCAN_ROWS)
+        last = min(len(self.rows), bisect.bisect_right(self.row_lines, bottom) + OVERSCAN_ROWS)
+        return range(first, last)
+
+    def refresh(self):
+        self.refresh_pending = None
+        if not self.window.winfo_exists():
+            return
+        visible = self.visible_rows()
+        for index in [index for index in self.live if index not in visible]:
+            self.textbox.image_configure(f"row{index}", image=self.placeholder)
+            del self.live[index]
+
+        waiting = False
+        for index in visible:
+            if index in self.live or index in self.failed:
+                continue
+            image_filename = self.rows[index][1]
+            try:
+                data = self.app.prefetcher.peek(image_filename, RESULT_SIZE)
+            except Exception as e:
+                self.show_error(index, "Image not found." if isinstance(e, FileNotFoundError)
+                                else f"Error loading image: {e}")
+                continue
+            if data is None:
+                waiting = True
+                continue
+            photo = tk.PhotoImage(data=data)
+            self.textbox.image_configure(f"row{index}", image=photo)
+            self.live[index] = photo  # Keep a reference to avoid garbage collection
+        if waiting:
+            self.schedule_refresh(POLL_MS)
+
+    def show_error(self, index, message):
+        self.failed.add(index)
+        self.textbox.configure(state="normal")
+        position = self.textbox.index(f"row{index}")
+        self.textbox.delete(position)
+        self.textbox.insert(position, message)
+        self.textbox.configure(state="disabled")
+
+    def toggle_email_input(self):
+        if self.email_var.get():
+            self.email_entry_label.grid(row=4, column=0, sticky="w")
+            self.email_entry.grid(row=4, column=1, sticky="w")
+        else:
+            self.email_entry_label.grid_forget()
+            self.email_entry.grid_forget()
+
+    def save_report(self):
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".pdf",
+                                            filetypes=[("PDF", "*.pdf"), ("HTML", "*.html")])
+        if not path:
+            return
+        from report import write_report
+
+        try:
+            write_report(path, [self.plant_report()])
+        except OSError as e:
+            messagebox.showerror("Report Error", f"Could not save the report: {e}")
+
+    def plant_report(self):
+        from report import PlantReport
+
+        app = self.app
+        return PlantReport(app.plant_id or "", app.life_stage, app.answers.get("npk"), app.answers.get("ph"),
+                           app.diagnoses)
+
+    @metrics.timed("send_email")
+    def send_email(self):
+        email_address = self.email_entry.get()
+        if not email_address:
+            messagebox.showwarning("Email Error", "Please provide an email address.")
+            return
+
+        # Delivery happens on the outbox thread; the app's poll_outbox reports the outcome.
+        try:
+            self.app.get_outbox().send_results(email_address, "Cannabis Plant Diagnosis Results", self.plant_report())
+        except ValueError as e:
+            messagebox.showwarning("Email Error", str(e))
+            return
+        messagebox.showinfo("Email Queued", "Diagnosis results will be sent in the background.")
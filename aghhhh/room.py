@@ -0,0 +1,154 @@
+"""Room sessions: diagnose many plants that share one grow room.
+
+Questions about the room rather than the plant (temperature, humidity, RO
+water, coco coir, cannabis nutrients, water pH) are answered once, the first
+time any plant needs them, and every later plant starts with those answers
+filled in, so only its own symptom questions are asked.
+
+Each finished plant is kept as a few integers: its yes/no answers packed at
+three bits per question, its NPK and soil pH, and the rule bitmask from the
+diagnosis index. A 500-plant room holds a few hundred kilobytes and sorting its
+report never re-runs a diagnosis.
+"""
+
+from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, ANSWERS, STAGES, INDEX
+
+ROOM_QUESTIONS = ("temp_high", "temp_low", "humidity_high", "humidity_low", "ro_water", "coco_coir",
+                  "cannabis_nutrients")
+READING_INPUTS = ("stage", "npk_input", "ph_input")
+ANSWER_BITS = 3  # per question: 0 unanswered, else 1 + position in ANSWERS
+ANSWER_CODES = {answer: code for code, answer in enumerate(ANSWERS, 1)}
+SORT_COLUMNS = ("plant", "stage", "count", "diagnoses")
+
+
+class PlantState:
+    __slots__ = ("plant_id", "stage", "codes", "npk", "soil_ph", "mask")
+
+    def __init__(self, plant_id, stage, codes, npk, soil_ph, mask):
+        self.plant_id = plant_id
+        self.stage = stage
+        self.codes = codes
+        self.npk = npk
+        self.soil_ph = soil_ph
+        self.mask = mask
+
+
+class RoomSession:
+    def __init__(self, room_id=None, index=INDEX):
+        self.room_id = room_id
+        self.index = index
+        self.environment = {}  # room question id -> answer
+        self.water_ph = None
+        self.plants = []
+        self.layout()
+
+    def layout(self):
+        # Per-plant yes/no questions, in the order their answers are packed.
+        self.coded = [question.id for question in QUESTIONS + DEFICIENCY_CHECKS
+                      if question.input_type not in READING_INPUTS and question.id not in ROOM_QUESTIONS]
+        self.positions = {question_id: position for position, question_id in enumerate(self.coded)}
+        room_rules = 0
+        for question_id in ROOM_QUESTIONS:
+            room_rules |= self.index.question_masks.get(question_id, 0)
+        self.room_rules = room_rules
+
+    def reindex(self):
+        """Re-pack every plant for a reloaded catalog, whose questions and rule bits may have moved."""
+        answers = [self.answers(plant) for plant in self.plants]
+        self.layout()
+        for plant, plant_answers in zip(self.plants, answers):
+            plant.codes = self.encode(plant_answers)
+            plant.mask = self.index.mask(plant_answers)
+
+    def inherited(self):
+        """Answers a new plant in this room starts with."""
+        return dict(self.environment)
+
+    def learn_environment(self, answers):
+        for question_id in ROOM_QUESTIONS:
+            if question_id in answers:
+                self.environment.setdefault(question_id, answers[question_id])
+        ph = answers.get("ph")
+        if self.water_ph is None and isinstance(ph, (list, tuple)):
+            self.water_ph = ph[0]
+
+    def encode(self, answers):
+        codes = 0
+        for question_id, answer in answers.items():
+            position = self.positions.get(question_id)
+            code = ANSWER_CODES.get(answer) if position is not None else None
+            if code:
+                codes |= code << (position * ANSWER_BITS)
+        return codes
+
+    def add_plant(self, plant_id, answers):
+        """Record a finished plant and return its PlantState. Its room answers become the room's."""
+        self.learn_environment(answers)
+        npk = answers.get("npk")
+        ph = answers.get("ph")
+        plant = PlantState(
+            plant_id, answers.get("stage") or "", self.encode(answers),
+            tuple(npk) if isinstance(npk, (list, tuple)) else None,
+            ph[1] if isinstance(ph, (list, tuple)) else None,
+            self.index.mask(answers),
+        )
+        self.plants.append(plant)
+        return plant
+
+    def answers(self, plant):
+        """Rebuild the full {question_id: answer} mapping of a recorded plant."""
+        answers = dict(self.environment)
+        codes = plant.codes
+        position = 0
+        while codes:
+            code = codes & ((1 << ANSWER_BITS) - 1)
+            if code:
+                answers[self.coded[position]] = ANSWERS[code - 1]
+            codes >>= ANSWER_BITS
+            position += 1
+        if plant.stage:
+            answers["stage"] = plant.stage
+        if plant.npk is not None:
+            answers["npk"] = list(plant.npk)
+        if plant.soil_ph is not None and self.water_ph is not None:
+            answers["ph"] = [self.water_ph, plant.soil_ph]
+        return answers
+
+    def diagnoses(self, plant):
+        return self.index.expand(plant.mask)
+
+    def own_mask(self, plant):
+        """The plant's diagnoses that do not come from the room answers every plant shares."""
+        return plant.mask & ~self.room_rules
+
+    def own_diagnoses(self, plant):
+        return self.index.expand(self.own_mask(plant))
+
+    def room_summary(self):
+        """Return [(diagnosis, plants affected)] for the diagnoses that come from room answers."""
+        counts = {}
+        for plant in self.plants:
+            mask = plant.mask & self.room_rules
+            while mask:
+                low = mask & -mask
+                counts[low] = counts.get(low, 0) + 1
+                mask ^= low
+        return [(self.index.expand(bit)[0], count) for bit, count in sorted(counts.items())]
+
+    def sorted_plants(self, column="plant", reverse=False):
+        """Plants ordered by one of SORT_COLUMNS; "count" and "diagnoses" look at each plant's own diagnoses."""
+        if column == "plant":
+            key = lambda plant: plant.plant_id
+        elif column == "stage":
+            key = lambda plant: STAGES.index(plant.stage) if plant.stage in STAGES else len(STAGES)
+        elif column == "count":
+            key = lambda plant: bin(self.own_mask(plant)).count("1")
+        elif column == "diagnoses":
+            # Lowest rule bit first: plants sharing their first diagnosis end up together.
+            key = lambda plant: (self.own_mask(plant) & -self.own_mask(plant)) or self.index.all_rules + 1
+        else:
+            raise ValueError(f"Unknown column: {column}")
+        return sorted(self.plants, key=key, reverse=reverse)
+
+    def next_plant_id(self):
+        return f"plant-{len(self.plants) + 1:03d}"
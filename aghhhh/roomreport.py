@@ -0,0 +1,68 @@
+import tkinter as tk
+from tkinter import ttk
+
+COLUMNS = (("plant", "Plant", 110), ("stage", "Stage", 100), ("count", "Issues", 60), ("diagnoses", "Diagnoses", 460))
+
+
+class RoomReportWindow:
+    """Every plant of a room session in one sortable table.
+
+    Diagnoses that come from the shared room answers (climate, water, medium) are listed once
+    above the table with the number of plants they affect; each row lists only the plant's own.
+    Clicking a heading sorts by that column, clicking it again reverses the order. Sorting moves
+    the existing rows instead of rebuilding them.
+    """
+
+    def __init__(self, root, room):
+        self.room = room
+        self.sort_column = "plant"
+        self.reverse = False
+        self.items = {}  # id(PlantState) -> Treeview item
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Room Report: {room.room_id}" if room.room_id else "Room Report")
+        self.window.configure(background="#0d0d0d")
+
+        frame = ttk.Frame(self.window, padding=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.grid_rowconfigure(1, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+
+        self.summary_label = ttk.Label(frame, text="", style="TLabel", wraplength=700, justify=tk.LEFT)
+        self.summary_label.grid(row=0, column=0, columnspan=2, sticky="w")
+
+        self.tree = ttk.Treeview(frame, columns=[name for name, _, _ in COLUMNS], show="headings", height=20)
+        for name, heading, width in COLUMNS:
+            self.tree.heading(name, text=heading, command=lambda name=name: self.sort(name))
+            self.tree.column(name, width=width, stretch=name == "diagnoses")
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.refresh()
+
+    def refresh(self):
+        """Add rows for plants recorded since the last refresh and update the room summary."""
+        room = self.room
+        summary = ", ".join(f"{diagnosis.name} ({count} of {len(room.plants)})"
+                            for diagnosis, count in room.room_summary())
+        self.summary_label.config(text=f"{len(room.plants)} plants. Room-wide: {summary or 'nothing found'}")
+        for plant in room.plants:
+            if id(plant) not in self.items:
+                own = room.own_diagnoses(plant)
+                values = (plant.plant_id, plant.stage.capitalize(), len(own),
+                          ", ".join(diagnosis.name for diagnosis in own) or "Healthy")
+                self.items[id(plant)] = self.tree.insert("", tk.END, values=values)
+        self.apply_sort()
+
+    def sort(self, column):
+        self.reverse = not self.reverse if column == self.sort_column else False
+        self.sort_column = column
+        self.apply_sort()
+
+    def apply_sort(self):
+        for position, plant in enumerate(self.room.sorted_plants(self.sort_column, self.reverse)):
+            self.tree.move(self.items[id(plant)], "", position)
+        for name, heading, _ in COLUMNS:
+            arrow = (" ▼" if self.reverse else " ▲") if name == self.sort_column else ""
+            self.tree.heading(name, text=heading + arrow)
@@ -0,0 +1,470 @@
+"""Temperature and humidity sensor ingestion.
+
+Readings arrive as text lines ``sensor,timestamp,temperature_c,humidity`` (an
+empty timestamp means "now", an empty value means "not measured") from any of:
+
+* a CSV log with a header row (``read_csv_log``),
+* a serial port, or anything else that yields lines, such as a pty or FIFO
+  standing in for one (``LineSource``),
+* a local UDP socket that any number of sensors send datagrams to
+  (``UdpSource``).
+
+Each sensor and quantity gets a fixed-size ring buffer holding one slot per
+``resolution`` seconds of the window, so memory is set when a sensor first
+reports and never grows after that. A silence counts as a dropout once it is
+several times longer than the sensor's own sampling interval, so a logger that
+records once a minute is covered as fully as one that reports every second.
+``SensorHub.climate_answers`` turns the windowed time-above/below-threshold
+figures into answers for the four climate questions: live sensors over the last
+hour, CSV logs over the last hour they recorded. For a local test feed::
+
+    python sensors.py --listen 9999 &
+    python sensors.py --synthetic 50 --send 9999
+"""
+
+import argparse
+import csv
+import math
+import random
+import socket
+import threading
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+TEMPERATURE, HUMIDITY = "temperature", "humidity"
+
+DEFAULT_WINDOW = 60 * 60  # seconds of history kept per sensor
+DEFAULT_RESOLUTION = 1.0  # seconds per ring-buffer slot
+MAX_SENSORS = 64
+MAX_GAP = 5  # sampling intervals; a longer silence is a dropout and does not count towards time above/below
+MIN_EXPOSURE = 10 * 60  # seconds past a threshold before a question is answered "yes"
+MIN_COVERAGE = 30 * 60  # seconds of readings needed before a question is answered "no"
+
+# Question id -> (quantity, direction, threshold). Temperatures are in °C.
+CLIMATE_THRESHOLDS = {
+    "temp_high": (TEMPERATURE, "above", (85 - 32) / 1.8),
+    "temp_low": (TEMPERATURE, "below", (70 - 32) / 1.8),
+    "humidity_high": (HUMIDITY, "above", 60.0),
+    "humidity_low": (HUMIDITY, "below", 40.0),
+}
+
+WindowStats = namedtuple("WindowStats", ["min", "max", "mean", "count", "covered"])
+
+CSV_COLUMNS = {
+    "sensor": ("sensor", "sensor_id", "id"),
+    "timestamp": ("timestamp", "time", "date"),
+    TEMPERATURE: ("temperature_c", "temperature", "temp_c", "temp"),
+    "temperature_f": ("temperature_f", "temp_f"),
+    HUMIDITY: ("humidity", "rh", "relative_humidity"),
+}
+
+
+class RingBuffer:
+    """Fixed-capacity series of (timestamp, value) slots, one per ``resolution`` seconds.
+
+    Samples that land in the newest slot are averaged into it, so faster sensors do not
+    shorten the window. Time spent past each of ``thresholds`` ((threshold, above) pairs) is
+    kept as a running total, updated when a slot closes or falls out of the buffer, so
+    ``totals`` does not walk the window. ``interval`` follows how often samples actually arrive.
+    """
+
+    def __init__(self, capacity, resolution=DEFAULT_RESOLUTION, thresholds=()):
+        self.resolution = resolution
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("f", bytes(4 * capacity))
+        self.spans = array("f", bytes(4 * capacity))  # seconds each closed slot stands for
+        self.capacity = capacity
+        self.head = -1  # index of the newest slot
+        self.count = 0
+        self.slot_sum = 0.0
+        self.slot_samples = 0
+        self.thresholds = list(thresholds)
+        self.closed_covered = 0.0
+        self.closed_beyond = [0.0] * len(self.thresholds)
+        self.interval = resolution  # typical seconds between samples, learned from the gaps
+        self.gaps = 0
+
+    def append(self, timestamp, value):
+        if self.count and timestamp < self.times[self.head] + self.resolution:
+            if timestamp < self.times[self.head]:
+                return  # out of order; the slot it belonged to is already closed
+            self.slot_sum += value
+            self.slot_samples += 1
+            self.values[self.head] = self.slot_sum / self.slot_samples
+            return
+        if self.count:
+            next_index = (self.head + 1) % self.capacity
+            if self.count == self.capacity:
+                self.account(next_index, -self.spans[next_index])
+            gap = timestamp - self.times[self.head]
+            self.learn(gap)
+            self.spans[self.head] = self.span(gap)
+            self.account(self.head, self.spans[self.head])
+        self.head = (self.head + 1) % self.capacity
+        self.times[self.head] = timestamp
+        self.values[self.head] = value
+        self.slot_sum = value
+        self.slot_samples = 1
+        self.count = min(self.count + 1, self.capacity)
+
+    def learn(self, gap):
+        if not self.gaps:
+            self.interval = gap
+        elif gap <= MAX_GAP * self.interval:
+            self.interval += (gap - self.interval) / 8  # dropouts do not stretch the interval
+        self.gaps += 1
+
+    def span(self, gap):
+        # A sample stands for the time until the next one, unless the gap is a dropout.
+        return gap if gap <= MAX_GAP * self.interval else self.interval
+
+    def account(self, index, span):
+        self.closed_covered += span
+        value = self.values[index]
+        for position, (threshold, above) in enumerate(self.thresholds):
+            if (value > threshold) if above else (value < threshold):
+                self.closed_beyond[position] += span
+
+    def totals(self, since, until):
+        """Return (seconds covered, [seconds past each threshold]) in [since, until]."""
+        covered = self.closed_covered
+        beyond = list(self.closed_beyond)
+        # Take back the closed slots older than ``since``, oldest first; usually none or a few.
+        index = (self.head - self.count + 1) % self.capacity
+        for _ in range(self.count - 1):
+            if self.times[index] >= since:
+                break
+            span = self.spans[index]
+            covered -= span
+            value = self.values[index]
+            for position, (threshold, above) in enumerate(self.thresholds):
+                if (value > threshold) if above else (value < threshold):
+                    beyond[position] -= span
+            index = (index + 1) % self.capacity
+        if self.count and since <= self.times[self.head] <= until:
+            # The newest slot stays open until the next sample arrives.
+            span = self.span(until - self.times[self.head])
+            covered += span
+            value = self.values[self.head]
+            for position, (threshold, above) in enumerate(self.thresholds):
+                if (value > threshold) if above else (value < threshold):
+                    beyond[position] += span
+        return covered, beyond
+
+    def latest(self):
+        return (self.times[self.head], self.values[self.head]) if self.count else None
+
+    def window(self, since):
+        """Yield (timestamp, value) newest first, back to ``since``."""
+        index = self.head
+        for _ in range(self.count):
+            timestamp = self.times[index]
+            if timestamp < since:
+                return
+            yield timestamp, self.values[index]
+            index = (index - 1) % self.capacity
+
+    def stats(self, since, until):
+        low, high, total, count, covered = math.inf, -math.inf, 0.0, 0, 0.0
+        newer = until
+        for timestamp, value in self.window(since):
+            low = min(low, value)
+            high = max(high, value)
+            total += value
+            count += 1
+            covered += self.span(newer - timestamp)
+            newer = timestamp
+        if not count:
+            return WindowStats(None, None, None, 0, 0.0)
+        return WindowStats(low, high, total / count, count, covered)
+
+    def time_beyond(self, since, until, threshold, above=True):
+        """Seconds in [since, until] the value spent above (or below) ``threshold``, for ad-hoc thresholds."""
+        seconds = 0.0
+        newer = until
+        for timestamp, value in self.window(since):
+            if (value > threshold) if above else (value < threshold):
+                seconds += self.span(newer - timestamp)
+            newer = timestamp
+        return seconds
+
+
+class SensorHub:
+    """Ring buffers for every (sensor, quantity), fed by source threads and read from the UI."""
+
+    def __init__(self, window=DEFAULT_WINDOW, resolution=DEFAULT_RESOLUTION, max_sensors=MAX_SENSORS):
+        self.window = window
+        self.resolution = resolution
+        self.capacity = int(math.ceil(window / resolution)) + 1
+        self.thresholds = {}  # quantity -> [(question id, threshold, above)], tracked by every buffer
+        for question_id, (quantity, direction, threshold) in CLIMATE_THRESHOLDS.items():
+            self.thresholds.setdefault(quantity, []).append((question_id, threshold, direction == "above"))
+        self.max_sensors = max_sensors
+        self.buffers = {}
+        self.sensors = set()
+        self.logged = set()  # sensors read from logs, judged over the window ending at their last reading
+        self.dropped = 0  # readings from sensors beyond max_sensors, or unparseable lines
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._sources = []
+
+    def add(self, sensor, timestamp, temperature=None, humidity=None, logged=False):
+        with self._lock:
+            if sensor not in self.sensors:
+                if len(self.sensors) >= self.max_sensors:
+                    self.dropped += 1
+                    return
+                self.sensors.add(sensor)
+                if logged:
+                    self.logged.add(sensor)
+            for quantity, value in ((TEMPERATURE, temperature), (HUMIDITY, humidity)):
+                if value is None:
+                    continue
+                buffer = self.buffers.get((sensor, quantity))
+                if buffer is None:
+                    buffer = self.buffers[(sensor, quantity)] = RingBuffer(
+                        self.capacity, self.resolution,
+                        [(threshold, above) for _, threshold, above in self.thresholds[quantity]])
+                buffer.append(timestamp, value)
+
+    def add_line(self, line, logged=False):
+        try:
+            self.add(*parse_line(line), logged=logged)
+        except ValueError:
+            with self._lock:
+                self.dropped += 1
+
+    def stats(self, sensor, quantity, window=None, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            buffer = self.buffers.get((sensor, quantity))
+            if buffer is None:
+                return WindowStats(None, None, None, 0, 0.0)
+            return buffer.stats(now - (window or self.window), now)
+
+    def time_beyond(self, sensor, quantity, threshold, above=True, window=None, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            buffer = self.buffers.get((sensor, quantity))
+            if buffer is None:
+                return 0.0
+            return buffer.time_beyond(now - (window or self.window), now, threshold, above)
+
+    def climate_answers(self, window=None, now=None, min_exposure=MIN_EXPOSURE, min_coverage=MIN_COVERAGE):
+        """Answer the climate questions the sensors can settle: {question_id: "yes"/"no"}.
+
+        "yes" once any sensor spent ``min_exposure`` seconds past the threshold; "no" once at least one
+        sensor has ``min_coverage`` seconds of readings and none did. Otherwise the question is left for
+        the grower. Logged sensors are judged over the window ending at their last reading, not ``now``.
+        """
+        now = time.time() if now is None else now
+        window = window or self.window
+        exposure = {}
+        covered = {}
+        with self._lock:
+            for (sensor, quantity), buffer in self.buffers.items():
+                until = buffer.latest()[0] if sensor in self.logged else now
+                seconds, beyond = buffer.totals(until - window, until)
+                covered[quantity] = max(covered.get(quantity, 0.0), seconds)
+                for (question_id, _, _), question_seconds in zip(self.thresholds[quantity], beyond):
+                    exposure[question_id] = max(exposure.get(question_id, 0.0), question_seconds)
+        answers = {}
+        for question_id, (quantity, _, _) in CLIMATE_THRESHOLDS.items():
+            if exposure.get(question_id, 0.0) >= min_exposure:
+                answers[question_id] = "yes"
+            elif covered.get(quantity, 0.0) >= min_coverage:
+                answers[question_id] = "no"
+        return answers
+
+    def start(self, sources, logged=False):
+        """Feed the hub from each source (an iterable of reading tuples or lines) on its own thread.
+
+        ``logged`` marks the sources as recorded logs rather than live feeds.
+        """
+        for source in sources:
+            self._sources.append(source)
+            thread = threading.Thread(target=self._consume, args=(source, logged), name="sensors", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        for source in self._sources:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._sources = []
+
+    def _consume(self, source, logged):
+        for item in source:
+            if self._stopping.is_set():
+                break
+            if isinstance(item, str):
+                self.add_line(item, logged)
+            else:
+                self.add(*item, logged=logged)
+        close = getattr(source, "close", None)
+        if close is not None:
+            close()
+
+
+def parse_number(text):
+    text = text.strip()
+    return float(text) if text else None
+
+
+def parse_timestamp(text):
+    text = text.strip()
+    if not text:
+        return time.time()
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def parse_line(line):
+    """Parse ``sensor,timestamp,temperature_c,humidity`` into a reading tuple. Raises ValueError."""
+    fields = line.strip().split(",")
+    if len(fields) != 4 or not fields[0].strip():
+        raise ValueError(f"Bad sensor line: {line!r}")
+    sensor, timestamp, temperature, humidity = fields
+    return sensor.strip(), parse_timestamp(timestamp), parse_number(temperature), parse_number(humidity)
+
+
+def read_csv_log(path):
+    """Yield reading tuples from a logger's CSV export, matching columns by common names."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        columns = {key: next((header[alias] for alias in aliases if alias in header), None)
+                   for key, aliases in CSV_COLUMNS.items()}
+        for row in reader:
+            try:
+                temperature = parse_number(row[columns[TEMPERATURE]]) if columns[TEMPERATURE] else None
+                if temperature is None and columns["temperature_f"]:
+                    fahrenheit = parse_number(row[columns["temperature_f"]])
+                    temperature = None if fahrenheit is None else (fahrenheit - 32) / 1.8
+                yield (row[columns["sensor"]] if columns["sensor"] else path,
+                       parse_timestamp(row[columns["timestamp"]] if columns["timestamp"] else ""),
+                       temperature,
+                       parse_number(row[columns[HUMIDITY]]) if columns[HUMIDITY] else None)
+            except (ValueError, TypeError):
+                continue
+
+
+class LineSource:
+    """Lines from a serial port or a stand-in for one (pty, FIFO, file)."""
+
+    def __init__(self, port, baudrate=9600):
+        try:
+            import serial  # pyserial, when installed, handles real ports' line settings
+        except ImportError:
+            self.stream = open(port, "rb", buffering=0)
+            self.timeouts = False  # an empty read is end of file
+        else:
+            self.stream = serial.Serial(port, baudrate, timeout=1)
+            self.timeouts = True  # an empty read is a quiet second on the line
+        self.closed = False
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                line = self.stream.readline()
+            except (OSError, ValueError):
+                return  # closed from another thread
+            if not line:
+                if self.timeouts:
+                    continue
+                return
+            yield line.decode("ascii", "replace")
+
+    def close(self):
+        self.closed = True
+        self.stream.close()
+
+
+class UdpSource:
+    """Datagrams of one or more reading lines sent to a local UDP port."""
+
+    def __init__(self, port, host="127.0.0.1", timeout=0.5):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.settimeout(timeout)
+        self.closed = False
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                data = self.socket.recv(65535)
+            except socket.timeout:
+                continue  # wakes up regularly so close() from another thread is noticed
+            except OSError:
+                return
+            yield from data.decode("ascii", "replace").splitlines()
+
+    def close(self):
+        self.closed = True
+        self.socket.close()
+
+
+def synthetic_feed(sensors, start=None, seconds=None, step=1.0, seed=None):
+    """Yield reading lines for ``sensors`` simulated sensors: a day/night cycle plus noise."""
+    rng = random.Random(seed)
+    now = time.time() if start is None else start
+    offsets = [rng.uniform(-2, 2) for _ in range(sensors)]
+    elapsed = 0.0
+    while seconds is None or elapsed < seconds:
+        phase = math.sin(2 * math.pi * (now % 86400) / 86400)
+        for sensor, offset in enumerate(offsets):
+            temperature = 25 + 5 * phase + offset + rng.gauss(0, 0.3)
+            humidity = 55 - 10 * phase + rng.gauss(0, 1)
+            yield f"sensor-{sensor},{now:.3f},{temperature:.2f},{humidity:.1f}"
+        now += step
+        elapsed += step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest grow-room sensor readings or generate a test feed.")
+    parser.add_argument("--listen", type=int, metavar="PORT", help="collect readings sent to this UDP port")
+    parser.add_argument("--serial", metavar="PORT", help="collect readings from a serial port (or pty/FIFO)")
+    parser.add_argument("--csv", action="append", default=[], help="load readings from a CSV log")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="generate readings for N sensors")
+    parser.add_argument("--send", type=int, metavar="PORT", help="send the synthetic feed to this UDP port")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for line in synthetic_feed(args.synthetic):
+            if args.send:
+                sender.sendto(line.encode("ascii"), ("127.0.0.1", args.send))
+            else:
+                print(line, flush=True)
+            if line.startswith(f"sensor-{args.synthetic - 1},"):
+                time.sleep(1.0)
+        return
+
+    hub = SensorHub().start([read_csv_log(path) for path in args.csv], logged=True)
+    sources = []
+    if args.serial:
+        sources.append(LineSource(args.serial))
+    if args.listen:
+        sources.append(UdpSource(args.listen))
+    hub.start(sources)
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(hub.sensors)} sensors, {hub.dropped} dropped:", hub.climate_answers(), flush=True)
+    except KeyboardInterrupt:
+        hub.stop(1)
+
+
+if __name__ == "__main__":
+    main()
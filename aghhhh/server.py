@@ -0,0 +1,340 @@
+"""Asyncio HTTP service for running the questionnaire remotely.
+
+Endpoints (JSON unless noted)::
+
+    POST /sessions                     start a session, returns the first question
+    GET  /sessions/<id>                current question
+    POST /sessions/<id>/answers        {"answer": "yes"} / {"n": 10, "p": 5, "k": 5} /
+                                       {"water_ph": 6.5, "soil_ph": 6.8}
+    GET  /sessions/<id>/results        stage and diagnoses
+    GET  /images/<name>?size=300x200   pre-sized JPEG (also 150x100)
+
+Image variants are rendered once at startup on a worker thread and served from
+memory with ETag/Cache-Control headers, so no request handler ever touches PIL.
+Only the standard library is used::
+
+    python server.py --port 8080
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import secrets
+import time
+import traceback
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from assets import image_path, referenced_images
+from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, STAGES, ANSWERS, diagnose
+from session import DiagnosisSession
+from thumbnails import ThumbnailCache, SIZES, QUESTION_SIZE, RESULT_SIZE
+from planner import QuestionPlanner
+from readings import parse_npk, parse_ph
+
+SESSION_TTL = 30 * 60  # seconds of inactivity before a session is dropped
+MAX_BODY = 16 * 1024
+MAX_HEADERS = 100
+KEEP_ALIVE_TIMEOUT = 15
+IMAGE_MAX_AGE = 24 * 60 * 60
+
+PLANNER = QuestionPlanner()
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or REASONS[status])
+        self.status = status
+
+
+class Session(DiagnosisSession):
+    __slots__ = ("last_seen",)
+
+    def __init__(self, layout=None):
+        super().__init__(layout)
+        self.last_seen = time.monotonic()
+
+    @property
+    def done(self):
+        return self.current >= len(QUESTIONS)
+
+    def question(self):
+        if self.done:
+            return None
+        question = QUESTIONS[self.current]
+        if question.input_type == "image_check":
+            deficiency = DEFICIENCY_CHECKS[self.deficiency_index]
+            return question_payload(deficiency, f"Does this photo look like your leaves? ({deficiency.text})")
+        return question_payload(question)
+
+    def answer(self, body):
+        """Apply one answer, mirroring record_response/submit_input in the GUI."""
+        if self.done:
+            raise HttpError(400, "The questionnaire is already complete.")
+        question = QUESTIONS[self.current]
+        if question.input_type == "stage":
+            stage = str(body.get("answer", "")).lower()
+            if stage not in STAGES:
+                raise HttpError(400, "Please enter a valid life stage: Seedling, Vegetative, or Flowering.")
+            self.set(question.id, stage)
+        elif question.input_type == "npk_input":
+            if body.get("answer") == "not_sure":
+                self.set(question.id, "not_sure")
+            elif all(body.get(part) not in (None, "") for part in ("n", "p", "k")):
+                self.set(question.id, typed(parse_npk, body["n"], body["p"], body["k"]))
+            else:
+                raise HttpError(400, "Please enter all NPK values.")
+        elif question.input_type == "ph_input":
+            if body.get("answer") == "not_sure":
+                self.set(question.id, "not_sure")
+            elif body.get("water_ph") not in (None, "") and body.get("soil_ph") not in (None, ""):
+                self.set(question.id, typed(parse_ph, body["water_ph"], body["soil_ph"]))
+            else:
+                raise HttpError(400, "Please enter both water pH and soil pH values.")
+        else:
+            answer = body.get("answer")
+            if answer not in ANSWERS:
+                raise HttpError(400, f"Answer must be one of: {', '.join(ANSWERS)}.")
+            if question.input_type == "image_check":
+                self.set(DEFICIENCY_CHECKS[self.deficiency_index].id, answer)
+                self.deficiency_index += 1
+                if self.deficiency_index < len(DEFICIENCY_CHECKS):
+                    return
+                self.deficiency_index = 0
+            else:
+                self.set(question.id, answer)
+        # Same adaptive ordering as the GUI: only questions that can still change the diagnosis.
+        position = PLANNER.next_question(self.answers())
+        self.current = len(QUESTIONS) if position is None else position
+
+    def results(self):
+        answers = self.answers()
+        return {
+            "stage": answers.get("stage", ""),
+            "complete": self.done,
+            "diagnoses": [
+                {"name": d.name, "solution": d.solution, "image": image_url(d.image, RESULT_SIZE)}
+                for d in diagnose(answers)
+            ],
+        }
+
+
+def typed(parse, *values):
+    try:
+        return parse(*values)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+def image_url(name, size):
+    if not name:
+        return None
+    return f"/images/{name}?size={size[0]}x{size[1]}"
+
+
+def question_payload(question, text=None):
+    if question.input_type == "stage":
+        choices = list(STAGES)
+    elif question.input_type in ("npk_input", "ph_input"):
+        choices = ["not_sure"]
+    else:
+        choices = ["yes", "no", "not_sure"]
+    return {
+        "id": question.id,
+        "text": text or question.text,
+        "input": question.input_type or "yes_no",
+        "choices": choices,
+        "image": image_url(question.image, QUESTION_SIZE),
+    }
+
+
+def render_variants(thumbnails):
+    """Render every referenced image at every served size. Runs on a worker thread at startup."""
+    variants = {}
+    for name in referenced_images():
+        for size in SIZES:
+            try:
+                data = thumbnails.read(image_path(name), size, "jpg")
+            except FileNotFoundError:
+                continue
+            etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+            variants[(name, f"{size[0]}x{size[1]}")] = (data, etag)
+    return variants
+
+
+class DiagnosisServer:
+    def __init__(self, thumbnails=None, session_ttl=SESSION_TTL):
+        self.thumbnails = thumbnails or ThumbnailCache()
+        self.session_ttl = session_ttl
+        self.sessions = {}
+        self.variants = {}
+
+    async def start(self, host, port):
+        loop = asyncio.get_running_loop()
+        self.variants = await loop.run_in_executor(None, render_variants, self.thumbnails)
+        self._sweeper = asyncio.create_task(self.expire_sessions())
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id in [sid for sid, s in self.sessions.items() if s.last_seen < cutoff]:
+                del self.sessions[session_id]
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(json_response(e.status, {"error": str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(self.respond(method, target, headers, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, method, target, headers, body, keep_alive):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        try:
+            if parts[0] == "images" and len(parts) == 2:
+                if method != "GET":
+                    raise HttpError(405)
+                return self.serve_image(parts[1], parse_qs(url.query), headers, keep_alive)
+            if parts[0] == "sessions":
+                status, payload = self.route_session(method, parts[1:], body)
+                return json_response(status, payload, keep_alive)
+            raise HttpError(404)
+        except HttpError as e:
+            return json_response(e.status, {"error": str(e)}, keep_alive)
+        except Exception:
+            traceback.print_exc()
+            return json_response(500, {"error": REASONS[500]}, keep_alive)
+
+    def route_session(self, method, parts, body):
+        if not parts:
+            if method != "POST":
+                raise HttpError(405)
+            session_id = secrets.token_urlsafe(12)
+            session = self.sessions[session_id] = Session()
+            return 201, {"session": session_id, "question": session.question()}
+
+        session = self.sessions.get(parts[0])
+        if session is None:
+            raise HttpError(404, "Unknown or expired session.")
+        session.last_seen = time.monotonic()
+        action = parts[1] if len(parts) > 1 else ""
+        if action == "" and method == "GET":
+            return 200, {"question": session.question(), "done": session.done}
+        if action == "answers" and method == "POST":
+            session.answer(parse_json(body))
+            return 200, {"question": session.question(), "done": session.done}
+        if action == "results" and method == "GET":
+            return 200, session.results()
+        raise HttpError(404 if action not in ("", "answers", "results") else 405)
+
+    def serve_image(self, name, query, headers, keep_alive):
+        size = query.get("size", [f"{QUESTION_SIZE[0]}x{QUESTION_SIZE[1]}"])[0]
+        variant = self.variants.get((name, size))
+        if variant is None:
+            raise HttpError(404)
+        data, etag = variant
+        extra = [("ETag", etag), ("Cache-Control", f"public, max-age={IMAGE_MAX_AGE}, immutable")]
+        if headers.get("if-none-match") == etag:
+            return response(304, b"", None, keep_alive, extra)
+        return response(200, data, "image/jpeg", keep_alive, extra)
+
+
+async def read_line(reader, status, message):
+    try:
+        return await reader.readline()
+    except ValueError:  # longer than the reader's buffer limit
+        raise HttpError(status, message)
+
+
+async def read_request(reader):
+    line = await read_line(reader, 400, "Request line too long.")
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400)
+    headers = {}
+    while True:
+        line = await read_line(reader, 431, None)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(400)
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length.")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length.")
+    if length > MAX_BODY:
+        raise HttpError(413)
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def parse_json(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HttpError(400, "Request body must be JSON.")
+    if not isinstance(data, dict):
+        raise HttpError(400, "Request body must be a JSON object.")
+    return data
+
+
+def response(status, body, content_type, keep_alive, extra_headers=()):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Length: {len(body)}",
+             "Connection: keep-alive" if keep_alive else "Connection: close"]
+    if content_type:
+        lines.append(f"Content-Type: {content_type}")
+    lines.extend(f"{name}: {value}" for name, value in extra_headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def json_response(status, payload, keep_alive=True):
+    return response(status, json.dumps(payload).encode("utf-8"), "application/json", keep_alive)
+
+
+async def serve(host, port):
+    server = await DiagnosisServer().start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the diagnosis questionnaire as an HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Persistent cache of ready-to-display image renditions.
+
+Entries are keyed by source path, source mtime and target size. A cached PPM
+can be handed straight to ``tk.PhotoImage(file=...)`` without touching PIL, so
+only the first view of an image (or the pre-warm command) pays for the decode
+and LANCZOS resize. Until then ``draft`` gives a rough rendition in a few
+milliseconds to show in its place.
+
+Pre-warm the cache with::
+
+    python thumbnails.py
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import os
+import tempfile
+
+from assets import IMAGE_DIR
+from paths import cache_dir
+
+QUESTION_SIZE = (300, 200)
+RESULT_SIZE = (150, 100)
+SIZES = (QUESTION_SIZE, RESULT_SIZE)
+
+PIL_FORMATS = {"ppm": "PPM", "png": "PNG", "jpg": "JPEG"}
+
+
+def draft(source, size):
+    """Quick low-quality PPM of ``source`` at ``size``, not cached.
+
+    JPEGs are decoded at a reduced DCT scale (PIL's draft mode), so even a ten
+    megapixel photo takes a few milliseconds; other formats are decoded in full
+    and resized with a cheap filter.
+    """
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.draft("RGB", size)
+        image = image.convert("RGB").resize(size, Image.BILINEAR, reducing_gap=2.0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PPM")
+    return buffer.getvalue()
+
+
+def default_cache_dir():
+    return cache_dir("thumbnails")
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, fmt="ppm"):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.fmt = fmt
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _prefix(self, source, size):
+        digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:16]
+        return f"{digest}-{size[0]}x{size[1]}"
+
+    def path_for(self, source, size, fmt=None):
+        # os.stat raises FileNotFoundError for a missing source, same as Image.open would.
+        mtime = os.stat(source).st_mtime_ns
+        return os.path.join(self.cache_dir, f"{self._prefix(source, size)}-{mtime}.{fmt or self.fmt}")
+
+    def get(self, source, size, fmt=None):
+        """Return the path of a cached rendition of ``source`` at ``size``, rendering it if needed."""
+        fmt = fmt or self.fmt
+        target = self.path_for(source, size, fmt)
+        if not os.path.exists(target):
+            self.render(source, size, target, fmt)
+            self.remove_stale(source, size, target, fmt)
+        return target
+
+    def cached(self, source, size, fmt=None):
+        """Return the bytes of an already rendered rendition, or None; never renders."""
+        try:
+            with open(self.path_for(source, size, fmt), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def read(self, source, size, fmt=None):
+        with open(self.get(source, size, fmt), "rb") as f:
+            return f.read()
+
+    def render(self, source, size, target, fmt):
+        from PIL import Image
+
+        with Image.open(source) as image:
+            image = image.convert("RGB").resize(size, Image.LANCZOS)
+        # Write to a temp file and rename so readers never see a half-written rendition.
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format=PIL_FORMATS[fmt])
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def remove_stale(self, source, size, current, fmt):
+        pattern = os.path.join(self.cache_dir, f"{self._prefix(source, size)}-*.{fmt}")
+        for path in glob.glob(pattern):
+            if path != current:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def warm(self, sources, sizes=SIZES, fmt=None):
+        rendered = 0
+        for source in sources:
+            for size in sizes:
+                if not os.path.exists(self.path_for(source, size, fmt)):
+                    self.get(source, size, fmt)
+                    rendered += 1
+        return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the thumbnail cache.")
+    parser.add_argument("images", nargs="*", help="source images (default: everything in images/)")
+    parser.add_argument("--cache-dir", help="cache directory (default: %(default)s)", default=default_cache_dir())
+    parser.add_argument("--format", choices=sorted(PIL_FORMATS), default="ppm")
+    args = parser.parse_args()
+
+    sources = args.images or sorted(glob.glob(os.path.join(IMAGE_DIR, "*")))
+    cache = ThumbnailCache(args.cache_dir, args.format)
+    rendered = cache.warm(sources)
+    print(f"{rendered} renditions written, {len(sources) * len(SIZES) - rendered} already cached in {cache.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Stacked input views for the question window.
+
+Every input kind (yes/no buttons, stage buttons, NPK entries, pH entries) gets
+its own frame, built the first time it is needed and gridded once into the same
+cell. Switching between questions is then a single ``tkraise`` instead of
+forgetting and re-packing a dozen widgets. ``layout_calls`` counts every
+geometry/stacking call the switcher makes so the cost per transition can be
+checked.
+"""
+
+from tkinter import ttk
+
+BLANK = "blank"
+
+
+class ViewSwitcher:
+    def __init__(self, parent, builders):
+        self.frame = ttk.Frame(parent)
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.builders = dict(builders)
+        self.builders.setdefault(BLANK, lambda frame: None)
+        self.views = {}
+        self.current = None
+        self.layout_calls = 0
+        self.last_transition_calls = 0
+
+    def view(self, name):
+        view = self.views.get(name)
+        if view is None:
+            view = self.views[name] = ttk.Frame(self.frame)
+            self.builders[name](view)
+            view.grid(row=0, column=0, sticky="nsew")
+            self.layout_calls += 1
+        return view
+
+    def show(self, name):
+        before = self.layout_calls
+        if name != self.current:
+            self.view(name).tkraise()
+            self.layout_calls += 1
+            self.current = name
+        self.last_transition_calls = self.layout_calls - before
+
+    def hide(self):
+        self.show(BLANK)
@@ -0,0 +1,53 @@
+"""Per-event cost of the metrics.timed wrapper, with collection switched off and on.
+
+Each figure is the wrapped call minus a bare call, best of several rounds, so
+it is the overhead the instrumentation adds to load_question, load_image and
+the other hot paths. Exits non-zero if a budget is exceeded.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh"))
+
+CALLS = 200_000
+ROUNDS = 7
+DISABLED_BUDGET_NS = 500
+ENABLED_BUDGET_NS = 5000
+
+
+def per_call_ns(function):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e9 / CALLS
+
+
+def main():
+    import metrics
+
+    def bare():
+        pass
+
+    wrapped = metrics.timed("benchmark")(bare)
+    baseline = per_call_ns(bare)
+    metrics.disable()
+    disabled = per_call_ns(wrapped) - baseline
+    metrics.enable()
+    enabled = per_call_ns(wrapped) - baseline
+    metrics.disable()
+
+    ok = True
+    for name, ns, budget in (("disabled", disabled, DISABLED_BUDGET_NS), ("enabled", enabled, ENABLED_BUDGET_NS)):
+        status = "ok" if ns <= budget else "FAIL"
+        ok = ok and ns <= budget
+        print(f"timed call, collection {name}: {ns:.0f} ns overhead (budget {budget} ns) {status}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
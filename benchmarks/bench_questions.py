@@ -0,0 +1,64 @@
+"""Average number of questions the adaptive planner asks per session.
+
+Plays SESSIONS seeded random sessions through the same planner the HTTP server
+uses: each yes/no question is answered "yes" at YES_RATE, the stage is picked
+at random, and NPK/pH readings are drawn across and beyond the target ranges.
+Reports the average count per rate and exits non-zero if one exceeds
+QUESTIONS_TARGET, the goal of fewer than 10 questions per session.
+
+The shipped catalog does not meet that target: the planner averages about 18.7
+questions at a 50% yes rate and 17.9 at 10%, so this benchmark currently
+fails. Every rule sits on a question of its own, and 13 of them (stage, NPK,
+pH, pests and nine single-question symptoms) cannot be ruled out by any other
+answer, so they are asked in every session. Getting under 10 needs catalog
+rules that share questions, or a planner that stops before every rule is
+settled.
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh"))
+
+SESSIONS = 2000
+YES_RATES = (0.5, 0.1)
+QUESTIONS_TARGET = 10.0  # the planner's goal; not met yet, see above
+
+
+def play(planner, questions, stages, rng, yes_rate):
+    answers = {}
+    asked = 0
+    while True:
+        position = planner.next_question(answers)
+        if position is None:
+            return asked
+        question = questions[position]
+        asked += 1
+        if question.input_type == "stage":
+            answers[question.id] = rng.choice(stages)
+        elif question.input_type == "npk_input":
+            answers[question.id] = [rng.uniform(0, 30) for _ in range(3)]
+        elif question.input_type == "ph_input":
+            answers[question.id] = [rng.uniform(5.0, 7.5), rng.uniform(5.0, 7.5)]
+        else:
+            answers[question.id] = "yes" if rng.random() < yes_rate else "no"
+
+
+def main():
+    from diagnosis import QUESTIONS, STAGES
+    from planner import QuestionPlanner
+
+    planner = QuestionPlanner()
+    ok = True
+    for yes_rate in YES_RATES:
+        rng = random.Random(1)
+        average = sum(play(planner, QUESTIONS, STAGES, rng, yes_rate) for _ in range(SESSIONS)) / SESSIONS
+        ok = ok and average < QUESTIONS_TARGET
+        print(f"yes rate {yes_rate:.0%}: {average:.1f} questions of {len(QUESTIONS)} on average "
+              f"(target under {QUESTIONS_TARGET:g}) {'ok' if average < QUESTIONS_TARGET else 'MISSED'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Memory held per live questionnaire session, and the cost of serializing one.
+
+Creates SESSIONS server sessions with every question answered (readings
+included) and measures the memory they hold with tracemalloc, list slot
+included. Exits non-zero if a budget is exceeded.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh"))
+
+SESSIONS = 100_000
+BYTES_BUDGET = 256
+ROUNDTRIP_BUDGET_US = 10
+
+
+def answer_everything(session, questions, number):
+    from diagnosis import ANSWERS
+
+    for position, question in enumerate(questions):
+        if question.input_type == "stage":
+            session.set(question.id, "flowering")
+        elif question.input_type == "npk_input":
+            session.set(question.id, [10.0, 5.0, number % 7 + 0.5])
+        elif question.input_type == "ph_input":
+            session.set(question.id, [6.5, 6.0 + number % 10 / 10])
+        else:
+            session.set(question.id, ANSWERS[(number + position) % len(ANSWERS)])
+
+
+def main():
+    from diagnosis import QUESTIONS, DEFICIENCY_CHECKS
+    from server import Session
+
+    questions = QUESTIONS + DEFICIENCY_CHECKS
+    Session()  # build the shared layout before measuring
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for number in range(SESSIONS):
+        session = Session()
+        answer_everything(session, questions, number)
+        sessions.append(session)
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / SESSIONS
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for session in sessions[:10_000]:
+        Session.from_bytes(session.to_bytes())
+    roundtrip = (time.perf_counter() - start) * 1e6 / 10_000
+
+    ok = per_session <= BYTES_BUDGET and roundtrip <= ROUNDTRIP_BUDGET_US
+    print(f"{SESSIONS} sessions: {per_session:.0f} bytes each (budget {BYTES_BUDGET}) "
+          f"{'ok' if per_session <= BYTES_BUDGET else 'FAIL'}")
+    print(f"to_bytes + from_bytes: {roundtrip:.1f} us (budget {ROUNDTRIP_BUDGET_US} us) "
+          f"{'ok' if roundtrip <= ROUNDTRIP_BUDGET_US else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Count Tk layout calls per question transition over a full questionnaire run.
+
+The old hide_buttons/hide_inputs approach issued 16 pack_forget calls plus up to
+7 pack calls on every transition. The view switcher should need at most one
+call per transition once each view has been built. Needs a display (or Xvfb)
+and is skipped without one. Exits non-zero if the budget is exceeded.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh"))
+
+MAX_CALLS_PER_TRANSITION = 1
+
+ANSWERS = {"stage": "flowering", "npk": ("10", "5", "5"), "ph": ("6.5", "6.8")}
+
+
+def run():
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return {"skipped": "no display"}
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh"))
+    import main
+
+    app = main.CannabisDiagnosisApp(root)
+    app.show_results = lambda: None
+    root.update()
+    calls = []
+    seen_views = set()
+    start = time.perf_counter()
+    while app.current_question < len(app.questions):
+        question = app.questions[app.current_question]
+        if question.input_type == "npk_input":
+            for entry, value in zip(app.npk_entry, ANSWERS["npk"]):
+                entry.insert(0, value)
+            app.submit_input()
+        elif question.input_type == "ph_input":
+            app.water_ph_entry.insert(0, ANSWERS["ph"][0])
+            app.soil_ph_entry.insert(0, ANSWERS["ph"][1])
+            app.submit_input()
+        else:
+            app.record_response(ANSWERS.get(question.id, "no"))
+        root.update()
+        # The first show of a view also grids it once; only steady-state switches are budgeted.
+        if app.views.current in seen_views:
+            calls.append(app.views.last_transition_calls)
+        seen_views.add(app.views.current)
+    elapsed = time.perf_counter() - start
+    root.destroy()
+    return {
+        "transitions": len(calls),
+        "max_calls": max(calls),
+        "mean_calls": sum(calls) / len(calls),
+        "total_layout_calls": app.views.layout_calls,
+        "run_ms": round(elapsed * 1000, 2),
+    }
+
+
+def main():
+    result = run()
+    print(json.dumps(result))
+    if "skipped" in result:
+        return
+    sys.exit(0 if result["max_calls"] <= MAX_CALLS_PER_TRANSITION else 1)
+
+
+if __name__ == "__main__":
+    main()
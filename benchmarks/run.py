@@ -0,0 +1,445 @@
+"""Benchmark suite: image pipeline, diagnosis logic, results window, email formatting and reports.
+
+Every case is timed ``--repeat`` times in this process and reported as median
+and best milliseconds. Cases that need Tk run against ``$DISPLAY``; without
+one the suite starts Xvfb itself if it is installed, and otherwise reports
+those cases as skipped rather than failing. App caches and data go to a
+temporary directory, so runs never touch the user's history or thumbnails.
+
+Timings only mean something against numbers from the same machine, so no
+baseline is checked in: record one before a change and compare after it.
+Comparisons use each case's best time scaled by a fixed calibration workload,
+so a machine that is busier or slower overall does not read as a regression::
+
+    python benchmarks/run.py                        # print a table
+    python benchmarks/run.py -o results.json        # also write the results as JSON
+    python benchmarks/run.py --save-baseline        # record this machine's numbers in benchmarks/baseline.json
+    python benchmarks/run.py --compare              # fail on cases slower than the recorded baseline
+    python benchmarks/run.py -k image.cold          # only cases whose name contains the text
+
+The startup and per-transition layout budgets live in bench_startup.py and
+bench_transitions.py.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.normpath(os.path.join(BENCH_DIR, os.pardir, "aghhhh"))
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+REPEAT = 15
+TOLERANCE = 0.5  # a case fails the comparison when its best time is this much slower than the baseline...
+NOISE_FLOOR_MS = 0.1  # ...and slower by more than this, so scheduler jitter on fast cases never fails a run
+CALIBRATION = "calibration"
+RESULT_COUNTS = (1, 5, 20, 50)
+ROOM_PLANTS = 500
+REPORT_PLANTS = 1000
+LOOP = 1000  # iterations for the cases too fast to time one call at a time
+
+# Fixed answer scripts for the questionnaire cases: question id -> answer, "no" for everything else.
+SCRIPTS = {
+    "healthy": {"stage": "vegetative"},
+    "pests": {"stage": "flowering", "pests": "yes", "spider_mites": "yes", "bud_rot": "yes",
+              "npk": ["5", "10", "10"], "ph": ["6.5", "6.6"], "humidity_high": "yes"},
+    "everything": {"stage": "seedling", "npk": ["30", "30", "30"], "ph": ["5.0", "7.5"], "_default": "yes"},
+}
+
+CASES = []
+
+
+def case(needs_display=False):
+    def register(function):
+        CASES.append((function, needs_display))
+        return function
+    return register
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def scripted_answer(script, question_id):
+    return script.get(question_id, script.get("_default", "no"))
+
+
+@case()
+def calibration(context):
+    """Fixed interpreter work (formatting, sorting, JSON) that the other cases are scaled by when comparing."""
+    start = time.perf_counter()
+    words = [f"{number * 7919 % 10007:05d}" for number in range(20000)]
+    json.loads(json.dumps(sorted(words)))
+    return {CALIBRATION: (time.perf_counter() - start) * 1000}
+
+
+@case()
+def image_decode(context):
+    """Draft decode, decode + resize + cache write (cold) and cache read (warm) of every file in images/."""
+    from assets import image_path
+    from thumbnails import ThumbnailCache, QUESTION_SIZE, draft
+
+    cache = ThumbnailCache(tempfile.mkdtemp(dir=context["tmp"]))
+    timings = {}
+    for name in sorted(os.listdir(os.path.join(APP_DIR, "images"))):
+        path = image_path(name)
+        timings[f"image.draft.{name}"] = timed(draft, path, QUESTION_SIZE)
+        timings[f"image.cold.{name}"] = timed(cache.read, path, QUESTION_SIZE)
+        timings[f"image.warm.{name}"] = timed(cache.read, path, QUESTION_SIZE)
+    return timings
+
+
+@case()
+def diagnosis_engine(context):
+    """evaluate_responses: one diagnose() call on a full set of answers, per call."""
+    from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, diagnose
+
+    timings = {}
+    for name, script in SCRIPTS.items():
+        answers = {question.id: scripted_answer(script, question.id) for question in QUESTIONS + DEFICIENCY_CHECKS}
+        answers["npk"], answers["ph"] = [10.0, 5.0, 5.0], [6.5, 6.8]
+        start = time.perf_counter()
+        for _ in range(LOOP):
+            diagnose(answers)
+        timings[f"diagnose.{name}"] = (time.perf_counter() - start) * 1000 / LOOP
+    return timings
+
+
+@case()
+def questionnaire_engine(context):
+    """A whole questionnaire through the headless session (planner, parsing, diagnosis), per run."""
+    from server import Session
+
+    def run(script):
+        session = Session()
+        while not session.done:
+            question = session.question()
+            if question["input"] == "npk_input":
+                answer = script.get("npk", ["10", "5", "5"])
+                session.answer({"n": answer[0], "p": answer[1], "k": answer[2]})
+            elif question["input"] == "ph_input":
+                answer = script.get("ph", ["6.5", "6.8"])
+                session.answer({"water_ph": answer[0], "soil_ph": answer[1]})
+            else:
+                session.answer({"answer": scripted_answer(script, question["id"])})
+        session.results()
+
+    return {f"questionnaire.engine.{name}": timed(run, script) for name, script in SCRIPTS.items()}
+
+
+def room_with_plants(count):
+    from diagnosis import QUESTIONS, DEFICIENCY_CHECKS, STAGES
+    from room import RoomSession
+
+    room = RoomSession("bench")
+    for number in range(count):
+        answers = {question.id: "yes" if (number + position) % 7 == 0 else "no"
+                   for position, question in enumerate(QUESTIONS + DEFICIENCY_CHECKS)}
+        answers.update(stage=STAGES[number % len(STAGES)], npk=[10.0, 5.0, 5.0], ph=[6.5, 6.0 + number % 10 / 10])
+        room.add_plant(f"plant-{number:03d}", answers)
+    return room
+
+
+@case()
+def room_session(context):
+    """Recording a room's worth of plants, and sorting the room report by each column."""
+    from room import SORT_COLUMNS
+
+    start = time.perf_counter()
+    room = room_with_plants(ROOM_PLANTS)
+    timings = {f"room.add.{ROOM_PLANTS}": (time.perf_counter() - start) * 1000}
+    for column in SORT_COLUMNS:
+        start = time.perf_counter()
+        for _ in range(LOOP // 10):
+            room.sorted_plants(column)
+        timings[f"room.sort.{column}.{ROOM_PLANTS}"] = (time.perf_counter() - start) * 1000 / (LOOP // 10)
+    return timings
+
+
+@case()
+def email_format(context):
+    """Building the plain and the HTML results email for N diagnoses, thumbnails already encoded."""
+    from diagnosis import RULES
+    from mailer import build_message, build_results_message, ImageParts
+    from report import PlantReport
+
+    image_parts = ImageParts()
+    for rule in RULES:
+        if rule.diagnosis.image:
+            image_parts.get(rule.diagnosis.image)
+    timings = {}
+    for count in RESULT_COUNTS:
+        diagnoses = [RULES[i % len(RULES)].diagnosis for i in range(count)]
+        body = "".join(f"{d.name}:\n{d.solution}\n\n" for d in diagnoses)
+        timings[f"email.format.{count}"] = timed(
+            build_message, "grower@example.com", "friend@example.com", "Cannabis Plant Diagnosis Results", body)
+        report = PlantReport("", "flowering", [10.0, 5.0, 5.0], [6.5, 6.2], diagnoses)
+        timings[f"email.html.{count}"] = timed(
+            build_results_message, "grower@example.com", "friend@example.com", "Cannabis Plant Diagnosis Results",
+            report, image_parts)
+    return timings
+
+
+@case()
+def report_export(context):
+    """Streaming an HTML and a PDF report of a thousand plants, thumbnails already encoded."""
+    from diagnosis import RULES
+    from report import EncodedImages, PlantReport, write_report
+
+    reports = [PlantReport(f"plant-{number:04d}", "flowering", [10.0, 5.0, 5.0], [6.5, 6.2],
+                           [RULES[(number + i) % len(RULES)].diagnosis for i in range(number % 5)])
+               for number in range(REPORT_PLANTS)]
+    images = EncodedImages()
+    timings = {}
+    for fmt in ("html", "pdf"):
+        path = os.path.join(context["tmp"], f"report.{fmt}")
+        write_report(path, reports[:1], fmt, images)  # encode the thumbnails outside the timing
+        timings[f"report.{fmt}.{REPORT_PLANTS}"] = timed(write_report, path, reports, fmt, images)
+    return timings
+
+
+@case(needs_display=True)
+def image_photo(context):
+    """load_image: cached PPM bytes to a Tk PhotoImage, for every file in images/."""
+    import tkinter as tk
+    from assets import image_path
+    from thumbnails import ThumbnailCache, QUESTION_SIZE
+
+    cache = ThumbnailCache(tempfile.mkdtemp(dir=context["tmp"]))
+    timings = {}
+    for name in sorted(os.listdir(os.path.join(APP_DIR, "images"))):
+        data = cache.read(image_path(name), QUESTION_SIZE)
+        timings[f"image.photo.{name}"] = timed(lambda: tk.PhotoImage(master=context["root"], data=data))
+    return timings
+
+
+@case(needs_display=True)
+def questionnaire_gui(context):
+    """A whole questionnaire through the Tk app, including rendering each question."""
+    import main
+
+    timings = {}
+    for name, script in SCRIPTS.items():
+        app = main.CannabisDiagnosisApp(context["root"])
+        app.show_results = lambda: None
+        context["root"].update()
+        start = time.perf_counter()
+        while app.current_question < len(app.questions):
+            question = app.questions[app.current_question]
+            if question.input_type == "npk_input":
+                for entry, value in zip(app.npk_entry, script.get("npk", ["10", "5", "5"])):
+                    entry.insert(0, value)
+                app.submit_input()
+            elif question.input_type == "ph_input":
+                water, soil = script.get("ph", ["6.5", "6.8"])
+                app.water_ph_entry.insert(0, water)
+                app.soil_ph_entry.insert(0, soil)
+                app.submit_input()
+            else:
+                app.record_response(scripted_answer(script, question.id))
+            context["root"].update()
+        timings[f"questionnaire.gui.{name}"] = (time.perf_counter() - start) * 1000
+        app.main_frame.destroy()
+        app.prefetcher.shutdown()
+        app.journal.close()
+    return timings
+
+
+@case(needs_display=True)
+def results_window(context):
+    """show_results: constructing and first-drawing the results window with N diagnoses."""
+    from diagnosis import RULES
+    from prefetch import ImagePrefetcher
+    from thumbnails import ThumbnailCache
+    from results import ResultsWindow
+
+    class App:
+        root = context["root"]
+        life_stage = "flowering"
+        prefetcher = ImagePrefetcher(ThumbnailCache(tempfile.mkdtemp(dir=context["tmp"])))
+
+        def get_outbox(self):
+            raise RuntimeError("not sending mail from a benchmark")
+
+    timings = {}
+    for count in RESULT_COUNTS:
+        app = App()
+        app.diagnoses = [RULES[i % len(RULES)].diagnosis for i in range(count)]
+        start = time.perf_counter()
+        window = ResultsWindow(app)
+        context["root"].update()
+        timings[f"results.window.{count}"] = (time.perf_counter() - start) * 1000
+        window.window.destroy()
+    App.prefetcher.shutdown()
+    return timings
+
+
+@case(needs_display=True)
+def room_report(context):
+    """The sortable room report: first draw with every plant, then one re-sort."""
+    from roomreport import RoomReportWindow
+
+    room = room_with_plants(ROOM_PLANTS)
+    start = time.perf_counter()
+    report = RoomReportWindow(context["root"], room)
+    context["root"].update()
+    timings = {f"room.report.{ROOM_PLANTS}": (time.perf_counter() - start) * 1000}
+    start = time.perf_counter()
+    report.sort("count")
+    context["root"].update()
+    timings[f"room.report.sort.{ROOM_PLANTS}"] = (time.perf_counter() - start) * 1000
+    report.window.destroy()
+    return timings
+
+
+def start_display():
+    """Return (display available, Xvfb process to stop or None)."""
+    if os.environ.get("DISPLAY"):
+        return True, None
+    if not shutil.which("Xvfb"):
+        return False, None
+    display = f":{90 + os.getpid() % 100}"
+    process = subprocess.Popen(["Xvfb", display, "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    return process.poll() is None, process
+
+
+def run_cases(repeat, pattern=None):
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(tmp, "cache")
+    os.environ["XDG_DATA_HOME"] = os.path.join(tmp, "data")
+    context = {"tmp": tmp, "root": None}
+    skipped = {}
+    xvfb = None
+    try:
+        if any(needs_display for _, needs_display in CASES):
+            available, xvfb = start_display()
+            if available:
+                import tkinter as tk
+
+                try:
+                    context["root"] = tk.Tk()
+                except tk.TclError:
+                    pass
+        functions = []
+        for function, needs_display in CASES:
+            if needs_display and context["root"] is None:
+                skipped[function.__name__] = "no display (set DISPLAY or install Xvfb)"
+            else:
+                functions.append(function)
+        samples = {}
+        # Whole rounds rather than each case repeated back to back, so the calibration samples are spread
+        # over the same stretch of time as everything else.
+        for _ in range(repeat):
+            for function in functions:
+                for name, ms in function(context).items():
+                    if pattern is None or pattern in name or name == CALIBRATION:
+                        samples.setdefault(name, []).append(ms)
+        if context["root"] is not None:
+            context["root"].destroy()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+        shutil.rmtree(tmp, ignore_errors=True)
+    cases = {name: {"median_ms": round(statistics.median(values), 4), "min_ms": round(min(values), 4),
+                    "runs": len(values)}
+             for name, values in sorted(samples.items())}
+    return {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+        "repeat": repeat,
+        "cases": cases,
+        "skipped": skipped,
+    }
+
+
+def speed_scale(results, baseline):
+    """How much slower this run's machine is than the baseline's, from the calibration case (1.0 if missing)."""
+    now, before = results["cases"].get(CALIBRATION), baseline["cases"].get(CALIBRATION)
+    if not now or not before or not before["min_ms"]:
+        return 1.0
+    return now["min_ms"] / before["min_ms"]
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return [(case, expected ms, current ms, ratio)] for every case slower than the baseline allows.
+
+    Best times are compared, since noise only ever adds time, after scaling the baseline by speed_scale().
+    """
+    scale = speed_scale(results, baseline)
+    regressions = []
+    for name, result in results["cases"].items():
+        reference = baseline["cases"].get(name)
+        if reference is None or name == CALIBRATION:
+            continue
+        expected, after = reference["min_ms"] * scale, result["min_ms"]
+        if after > expected * (1 + tolerance) and after - expected > NOISE_FLOOR_MS:
+            regressions.append((name, expected, after, after / expected if expected else float("inf")))
+    return regressions
+
+
+def print_table(results, baseline=None):
+    width = max((len(name) for name in results["cases"]), default=10)
+    for name, result in results["cases"].items():
+        line = f"{name:<{width}}  {result['median_ms']:10.3f} ms  (best {result['min_ms']:.3f})"
+        reference = (baseline or {}).get("cases", {}).get(name)
+        if reference:
+            line += f"  baseline best {reference['min_ms']:.3f}  x{result['min_ms'] / reference['min_ms']:.2f}"
+        print(line)
+    for name, reason in results["skipped"].items():
+        print(f"{name}: skipped, {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--compare", nargs="?", const=BASELINE, metavar="BASELINE",
+                        help=f"compare against a baseline file (default {os.path.relpath(BASELINE)})")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE, metavar="BASELINE")
+    args = parser.parse_args()
+
+    results = run_cases(args.repeat, args.pattern)
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            sys.exit(f"No baseline at {args.compare}; record one on this machine first with --save-baseline.")
+        if baseline.get("machine") != results["machine"]:
+            print("warning: the baseline was recorded on a different machine or Python; expect noise",
+                  file=sys.stderr)
+    print_table(results, baseline)
+    if baseline is not None:
+        print(f"calibration took x{speed_scale(results, baseline):.2f} its baseline time; baselines are scaled by that")
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=1, sort_keys=True)
+                f.write("\n")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, expected, after, ratio in regressions:
+            print(f"SLOWER: {name} expected {expected:.3f} -> {after:.3f} ms (x{ratio:.2f})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "aghhhh")
+sys.path.insert(0, APP_DIR)
+
+# The catalog cache, thumbnails and history go to a scratch directory, never the user's.
+_scratch = tempfile.mkdtemp(prefix="cannabis-diagnosis-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ["XDG_CACHE_HOME"] = os.path.join(_scratch, "cache")
+os.environ["XDG_DATA_HOME"] = os.path.join(_scratch, "data")
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from assets import IMAGE_DIR
+from leafcolor import analyse, confidences
+
+REFERENCE_PHOTOS = {
+    "yellowing_leaves": "yellowing_leaves.jpg",
+    "brown_spots": "brown_spots.jpg",
+    "purple_leaves": "purple_leaves.jpg",
+}
+
+
+@pytest.mark.parametrize("question_id", sorted(REFERENCE_PHOTOS))
+def test_reference_photo_scores_its_own_question_above_the_others(question_id):
+    scores = confidences(analyse(os.path.join(IMAGE_DIR, REFERENCE_PHOTOS[question_id])))
+    own = scores.pop(question_id)
+    assert own > 0
+    assert all(own > score for score in scores.values()), scores
+
+
+def test_green_leaves_score_no_symptoms():
+    scores = confidences(analyse(os.path.join(IMAGE_DIR, "spider_mites.jpg")))
+    assert max(scores.values()) < 0.1, scores
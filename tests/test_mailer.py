@@ -0,0 +1,155 @@
+import os
+import smtplib
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+import pytest
+
+from diagnosis import Diagnosis
+from mailer import FAILED, RETRYING, SENT, ImageParts, Outbox, SmtpSettings, build_results_message, is_permanent
+from report import PlantReport
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server to accept mail, with scripted refusals."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.connections = 0
+        self.messages = []
+        self.replies = {"RCPT": [], "DATA": []}  # replies to give, in order, before accepting again
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def reply(self, verb, default):
+        return self.replies[verb].pop(0) if self.replies[verb] else default
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.send("220 stand-in ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line[:4].decode("ascii", "replace").upper()
+            if verb in ("HELO", "EHLO"):
+                self.send("250 stand-in")
+            elif verb == "RCPT":
+                self.send(server.reply("RCPT", "250 ok"))
+            elif verb == "DATA":
+                self.send("354 go ahead")
+                data = b""
+                while not data.endswith(b"\r\n.\r\n"):
+                    chunk = self.rfile.readline()
+                    if not chunk:
+                        return
+                    data += chunk
+                reply = server.reply("DATA", "250 queued")
+                if reply.startswith("250"):
+                    server.messages.append(data)
+                self.send(reply)
+            elif verb == "QUIT":
+                self.send("221 bye")
+                return
+            else:
+                self.send("250 ok")
+
+    def send(self, reply):
+        self.wfile.write(reply.encode("ascii") + b"\r\n")
+
+
+@pytest.fixture
+def smtp():
+    server = SmtpStandIn()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outbox(smtp, tmp_path):
+    settings = SmtpSettings("127.0.0.1", smtp.server_address[1], "app@example.com", None, None, False, 5)
+    box = Outbox(settings, str(tmp_path / "outbox"), max_attempts=3, backoff=0.01)
+    yield box
+    box.stop(5)
+
+
+def wait_for(outbox, message_ids, states=(SENT, FAILED), timeout=10):
+    """Collect statuses until every message in ``message_ids`` reached one of ``states``."""
+    seen, deadline = [], time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        seen += outbox.poll_statuses()
+        if all(any(status[:2] in ((message_id, state) for state in states) for status in seen)
+               for message_id in message_ids):
+            return seen
+        time.sleep(0.01)
+    raise AssertionError(f"no final status: {seen}")
+
+
+def not_sure_report():
+    return PlantReport("plant-7", "flowering", "not_sure", "not_sure",
+                       [Diagnosis("Unlisted problem", "Check the plant again tomorrow.", None)])
+
+
+def test_results_message_for_not_sure_readings():
+    data = build_results_message("grower@example.com", "team@example.com", "Results", not_sure_report(),
+                                 ImageParts())
+    message = message_from_bytes(data)
+    assert message["To"] == "team@example.com"
+    parts = {part.get_content_type(): part.get_payload(decode=True).decode("utf-8")
+             for part in message.walk() if not part.is_multipart()}
+    assert "NPK: not sure" in parts["text/plain"]
+    assert "pH: not sure" in parts["text/html"]
+    assert "Unlisted problem" in parts["text/html"]
+
+
+def test_spooled_message_is_sent_and_removed(smtp, outbox):
+    message_id = outbox.send("grower@example.com", "Results", "No problems found.")
+    assert outbox.spooled() == [message_id]
+    outbox.start()
+    assert (message_id, SENT, "grower@example.com") in wait_for(outbox, [message_id])
+    assert outbox.spooled() == []
+    assert b"No problems found." in smtp.messages[0]
+
+
+def test_queued_messages_share_one_connection(smtp, outbox):
+    message_ids = [outbox.send(f"grower{number}@example.com", "Results", "body") for number in range(3)]
+    outbox.start()
+    wait_for(outbox, message_ids)
+    assert len(smtp.messages) == 3
+    assert smtp.connections == 1
+
+
+@pytest.mark.parametrize("verb, reply", [("DATA", "451 try again later"), ("RCPT", "450 mailbox busy")])
+def test_transient_failure_is_retried(smtp, outbox, verb, reply):
+    smtp.replies[verb].append(reply)
+    outbox.start()
+    message_id = outbox.send("grower@example.com", "Results", "body")
+    states = [state for sent_id, state, _ in wait_for(outbox, [message_id]) if sent_id == message_id]
+    assert RETRYING in states and states[-1] == SENT
+    assert len(smtp.messages) == 1
+
+
+def test_permanent_failure_moves_the_message_to_failed(smtp, outbox):
+    smtp.replies["RCPT"].append("550 no such user")
+    outbox.start()
+    message_id = outbox.send("nobody@example.com", "Results", "body")
+    states = [state for sent_id, state, _ in wait_for(outbox, [message_id]) if sent_id == message_id]
+    assert RETRYING not in states and states[-1] == FAILED
+    assert os.listdir(outbox.failed_dir) == [f"{message_id}.eml"]
+    assert outbox.spooled() == [] and smtp.messages == []
+
+
+def test_refused_recipients_are_classified_by_their_codes():
+    assert is_permanent(smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}))
+    assert not is_permanent(smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"mailbox busy")}))
+    assert not is_permanent(smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user"),
+                                                           "b@example.com": (451, b"try later")}))
@@ -0,0 +1,66 @@
+from diagnosis import QUESTIONS, diagnose
+from planner import QuestionPlanner
+
+
+def no_problems(question):
+    if question.id == "ph":
+        return [6.5, 6.5]
+    if question.id == "npk":
+        return [10.0, 5.0, 5.0]
+    return "no"
+
+
+def ask_all(planner, answer=no_problems, answers=None):
+    """Run the planner to the end, answering each question with answer(question); return the ids asked."""
+    answers, asked = dict(answers or {"stage": "vegetative"}), []
+    while True:
+        position = planner.next_question(answers)
+        if position is None:
+            return asked, answers
+        question = QUESTIONS[position]
+        asked.append(question.id)
+        answers[question.id] = answer(question)
+
+
+def test_gate_is_asked_before_its_follow_ups_and_they_are_skipped_on_no():
+    asked, _ = ask_all(QuestionPlanner())
+    assert asked[0] == "pests"
+    assert not {"whiteflies", "spider_mites", "aphids", "thrips"} & set(asked)
+
+
+def test_questions_that_change_no_rule_are_never_asked():
+    asked, _ = ask_all(QuestionPlanner())
+    assert "cannabis_nutrients" not in asked
+
+
+def test_gain_counts_rules_shared_between_questions():
+    planner = QuestionPlanner()
+    answers = {"stage": "vegetative"}
+    unsettled = planner.index.possible(answers) & ~planner.index.mask(answers)
+    ro_water = next(question for question in QUESTIONS if question.id == "ro_water")
+    drooping = next(question for question in QUESTIONS if question.id == "drooping")
+    # Cal-Mag risk is also set by coco coir, so RO water settles less than a symptom of its own.
+    assert 0 < planner.gain(ro_water, unsettled, answers) < planner.gain(drooping, unsettled, answers)
+
+
+def test_rare_symptoms_come_last():
+    planner = QuestionPlanner(priors={"drooping": 0.01})
+    asked, answers = ask_all(planner)
+    assert asked.index("drooping") > asked.index("yellowing_leaves")
+    assert diagnose(answers) == []
+
+
+def test_medium_is_asked_when_it_decides_how_the_ph_reading_reads():
+    # RO water already settles Cal-Mag risk, so only the pH targets depend on the coco coir answer:
+    # 5.8 is below the soil range in veg but inside the coco range.
+    asked, answers = ask_all(QuestionPlanner(),
+                             lambda question: "yes" if question.id == "coco_coir" else no_problems(question),
+                             {"stage": "vegetative", "ro_water": "yes", "ph": [5.8, 5.8]})
+    assert "coco_coir" in asked
+    assert "Nutrient Lockout (pH too low)" not in [diagnosis.name for diagnosis in diagnose(answers)]
+
+
+def test_medium_is_not_asked_for_a_reading_it_cannot_change():
+    # 6.2 is inside both the soil and the coco range in veg.
+    asked, _ = ask_all(QuestionPlanner(), answers={"stage": "vegetative", "ro_water": "yes", "ph": [6.2, 6.2]})
+    assert "coco_coir" not in asked
@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from assets import IMAGE_DIR
+from refindex import ReferenceIndex, image_features
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    return ReferenceIndex.build((IMAGE_DIR,), str(tmp_path_factory.mktemp("refindex")))
+
+
+def test_candidates_are_exactly_the_references_within_the_distance(index):
+    for path in index.paths[:5]:
+        image_hash = image_features(path)[0]
+        for max_distance in (3, 7, 11, 15):
+            rows, hamming = index.candidates(image_hash, max_distance)
+            expected = [row for row, other in enumerate(index.records["hash"])
+                        if bin(int(other) ^ image_hash).count("1") <= max_distance]
+            assert sorted(rows.tolist()) == expected
+            assert (hamming <= max_distance).all()
+
+
+def test_matching_a_photo_probes_without_scanning_every_reference(index):
+    path = os.path.join(IMAGE_DIR, "brown_spots.jpg")
+    distances = index.label_distances(path)
+    assert distances["brown_spots"] == 0
+    assert 0 < index.rows_scanned < len(index.records)
+
+
+def test_load_keeps_the_folders_the_index_was_built_from(tmp_path):
+    extra = tmp_path / "more-refs" / "nitrogen_deficiency"
+    extra.mkdir(parents=True)
+    shutil.copy(os.path.join(IMAGE_DIR, "nitrogen_deficiency.jpg"), extra / "01.jpg")
+    directory = str(tmp_path / "index")
+    built = ReferenceIndex.build((IMAGE_DIR, str(tmp_path / "more-refs")), directory)
+    meta = os.path.join(directory, "meta.json")
+    written = os.stat(meta).st_mtime_ns
+
+    loaded = ReferenceIndex.load(directory=directory)
+    assert loaded.paths == built.paths
+    assert os.stat(meta).st_mtime_ns == written
@@ -0,0 +1,20 @@
+import pytest
+
+from report import report_from_result, readings_text, write_report
+
+NOT_SURE_RESULT = {"id": "plant-7", "stage": "flowering", "npk": "not_sure", "ph": "not_sure",
+                   "diagnoses": ["Unlisted problem"]}
+
+
+def test_readings_text_shows_numbers_and_not_sure_answers():
+    measured = report_from_result(dict(NOT_SURE_RESULT, npk=[10.0, 5.0, 5.5], ph=[6.5, 6.2]))
+    assert readings_text(measured) == ["NPK: 10-5-5.5", "Water pH: 6.5, soil pH: 6.2"]
+    assert readings_text(report_from_result(NOT_SURE_RESULT)) == ["NPK: not sure", "pH: not sure"]
+
+
+@pytest.mark.parametrize("fmt", ["html", "pdf"])
+def test_report_with_not_sure_readings_is_written(tmp_path, fmt):
+    path = tmp_path / f"report.{fmt}"
+    assert write_report(str(path), [report_from_result(NOT_SURE_RESULT)]) == 1
+    data = path.read_bytes()
+    assert b"not sure" in data if fmt == "html" else data.startswith(b"%PDF")
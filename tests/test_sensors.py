@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from sensors import SensorHub, read_csv_log, synthetic_feed
+
+MIDNIGHT = 86400 * 20000  # the synthetic day/night cycle is at its mean: 25 °C, 55% RH
+
+
+def feed(hub, lines):
+    for line in lines:
+        hub.add_line(line)
+
+
+def test_an_hour_of_mild_readings_answers_every_climate_question_no():
+    hub = SensorHub()
+    feed(hub, synthetic_feed(1, start=MIDNIGHT, seconds=3600, seed=1))
+    assert hub.climate_answers(now=MIDNIGHT + 3600) == {
+        "temp_high": "no", "temp_low": "no", "humidity_high": "no", "humidity_low": "no"}
+
+
+def test_too_little_coverage_leaves_the_questions_open():
+    hub = SensorHub()
+    feed(hub, synthetic_feed(1, start=MIDNIGHT, seconds=20 * 60, seed=1))
+    assert hub.climate_answers(now=MIDNIGHT + 20 * 60) == {}
+
+
+def test_a_dropout_does_not_count_as_coverage():
+    hub = SensorHub()
+    lines = list(synthetic_feed(1, start=MIDNIGHT, seconds=3600, seed=1))
+    feed(hub, lines[:600] + lines[-600:])  # a 40 minute silence in the middle
+    assert hub.climate_answers(now=MIDNIGHT + 3600) == {}
+
+
+def test_a_per_minute_log_from_yesterday_is_judged_over_its_own_range(tmp_path):
+    start = datetime.now().replace(microsecond=0) - timedelta(days=1)
+    path = tmp_path / "grow-tent.csv"
+    rows = [f"{(start + timedelta(minutes=minute)).isoformat()},33.0,70" for minute in range(50)]
+    path.write_text("timestamp,temperature_c,humidity\n" + "\n".join(rows) + "\n", encoding="utf-8")
+
+    hub = SensorHub()
+    for reading in read_csv_log(str(path)):
+        hub.add(*reading, logged=True)
+    assert hub.climate_answers() == {
+        "temp_high": "yes", "temp_low": "no", "humidity_high": "yes", "humidity_low": "no"}
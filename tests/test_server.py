@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from server import DiagnosisServer
+
+
+def exchange(request):
+    """Send raw ``request`` bytes to a fresh server; return (status, payload) and whether it closed."""
+    async def run():
+        server = await asyncio.start_server(DiagnosisServer().handle_connection, "127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(request)
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            lines = head.decode("latin-1").split("\r\n")
+            headers = dict(line.lower().split(": ", 1) for line in lines[1:] if line)
+            body = await reader.readexactly(int(headers["content-length"]))
+            closed = await asyncio.wait_for(reader.read(1), 5) == b""
+            writer.close()
+            return int(lines[0].split()[1]), json.loads(body), closed
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_new_session():
+    status, payload, _ = exchange(b"POST /sessions HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert status == 201
+    assert payload["question"]["id"]
+
+
+def test_oversized_header_gets_431_and_the_connection_closes():
+    request = b"GET /sessions/x HTTP/1.1\r\nX-Padding: " + b"a" * 70_000 + b"\r\n\r\n"
+    status, payload, closed = exchange(request)
+    assert status == 431
+    assert payload == {"error": "Request Header Fields Too Large"}
+    assert closed
+
+
+def test_oversized_request_line_gets_400():
+    status, payload, closed = exchange(b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n")
+    assert status == 400
+    assert payload == {"error": "Request line too long."}
+    assert closed
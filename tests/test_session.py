@@ -0,0 +1,53 @@
+import tracemalloc
+
+import pytest
+
+from diagnosis import ANSWERS, DEFICIENCY_CHECKS, QUESTIONS
+from session import DiagnosisSession, SessionLayout
+
+BYTES_BUDGET = 256  # per session, as benchmarks/bench_sessions.py checks at scale
+
+
+def answered(number=0):
+    session = DiagnosisSession()
+    for position, question in enumerate(QUESTIONS + DEFICIENCY_CHECKS):
+        if question.input_type == "stage":
+            session.set(question.id, "flowering")
+        elif question.input_type == "npk_input":
+            session.set(question.id, [10.0, 5.0, number % 7 + 0.5])
+        elif question.input_type == "ph_input":
+            session.set(question.id, [6.5, 6.0 + number % 10 / 10])
+        else:
+            session.set(question.id, ANSWERS[(number + position) % len(ANSWERS)])
+    return session
+
+
+def test_answered_sessions_stay_within_the_byte_budget():
+    answered()  # build the shared layout before measuring
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sessions = [answered(number) for number in range(2000)]
+        per_session = (tracemalloc.get_traced_memory()[0] - before) / len(sessions)
+    finally:
+        tracemalloc.stop()
+    assert per_session <= BYTES_BUDGET
+
+
+def test_round_trip_keeps_answers_and_position():
+    session = answered(3)
+    session.current, session.deficiency_index = 7, 2
+    restored = DiagnosisSession.from_bytes(session.to_bytes())
+    assert restored.answers() == session.answers()
+    assert (restored.current, restored.deficiency_index) == (7, 2)
+
+
+def test_bytes_from_a_different_catalog_are_refused():
+    data = answered().to_bytes()
+    questions = QUESTIONS + DEFICIENCY_CHECKS
+    yes_no = [position for position, question in enumerate(questions) if question.input_type is None]
+    reordered = list(questions)
+    reordered[yes_no[0]], reordered[yes_no[1]] = reordered[yes_no[1]], reordered[yes_no[0]]
+    for layout in (SessionLayout(questions[:-1]), SessionLayout(reordered)):
+        with pytest.raises(ValueError):
+            DiagnosisSession.from_bytes(data, layout)